@@ -0,0 +1,115 @@
+"""
+Compare the sync read endpoints with their /api/async/ twins.
+
+    python benchmarks/async_reads.py --requests 2000 --concurrency 50 --db-latency 5
+
+Three runs over the same mix of list, detail, comment and activity reads:
+
+wsgi-sync   sync endpoints through the WSGI handler on a pool of --threads
+asgi-sync   sync endpoints through the ASGI handler (each view in a thread)
+asgi-async  /api/async/ endpoints through the ASGI handler
+
+--db-latency adds a sleep to every query to stand in for a networked
+database, which is where async views pay off; on a local SQLite file the
+async ORM's thread hops usually cost more than they save. --no-cache turns
+off the detail response cache so every read hits the database.
+"""
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import (
+    asgi_get, benchmark_database, create_user, print_table, query_latency, seed, summarize,
+    write_json, wsgi_get,
+)
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+
+
+def request_mix(ids, count, prefix):
+    rng = random.Random(42)
+    pages = max(1, len(ids) // 20)
+    urls = []
+    for _ in range(count):
+        pk = rng.choice(ids)
+        urls.append(rng.choice([
+            f'{prefix}/features/?page={rng.randint(1, min(pages, 5))}',
+            f'{prefix}/features/{pk}/',
+            f'{prefix}/features/{pk}/comments/',
+            f'{prefix}/features/{pk}/activities/',
+        ]))
+    return urls
+
+
+def run_wsgi(urls, headers, threads):
+    application = get_wsgi_application()
+
+    def fetch(url):
+        started = time.perf_counter()
+        status, _ = wsgi_get(application, url, headers)
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(fetch, urls))
+    return results, time.perf_counter() - started
+
+
+def run_asgi(urls, headers, concurrency):
+    application = get_asgi_application()
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(url):
+            async with semaphore:
+                started = time.perf_counter()
+                status, _ = await asgi_get(application, url, headers)
+                return time.perf_counter() - started, status
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(fetch(url) for url in urls))
+        return results, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--features', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50, help='in-flight requests for the ASGI runs')
+    parser.add_argument('--threads', type=int, default=8, help='worker threads for the WSGI run')
+    parser.add_argument('--db-latency', type=float, default=0, help='milliseconds added to every query')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.no_cache:
+        overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+    with benchmark_database(**overrides):
+        _, token = create_user()
+        ids = seed(features=args.features)
+        headers = {'Authorization': f'Bearer {token}'}
+
+        results = []
+        with query_latency(args.db_latency / 1000):
+            for name, runner, prefix in [
+                ('wsgi-sync', lambda urls: run_wsgi(urls, headers, args.threads), '/api'),
+                ('asgi-sync', lambda urls: run_asgi(urls, headers, args.concurrency), '/api'),
+                ('asgi-async', lambda urls: run_asgi(urls, headers, args.concurrency), '/api/async'),
+            ]:
+                timings, elapsed = runner(request_mix(ids, args.requests, prefix))
+                errors = sum(1 for _, status in timings if status != 200)
+                results.append(summarize(name, [latency for latency, _ in timings], elapsed, errors))
+
+    print_table(results)
+    write_json(args.json, {'options': vars(args), 'results': results})
+
+
+if __name__ == '__main__':
+    main()
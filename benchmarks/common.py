@@ -0,0 +1,246 @@
+"""
+Shared plumbing for the benchmark scripts in this directory.
+
+Benchmarks run the project in-process against a throwaway SQLite database
+(created next to the real one and removed afterwards), with throttling off
+and DEBUG query logging disabled, and drive the real WSGI / ASGI handlers
+so every request goes through the full middleware and view stack.
+"""
+import asyncio
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+
+@contextmanager
+def benchmark_database(**overrides):
+    """
+    A fresh, migrated database file for the duration of the block, with
+    throttling off and DEBUG off. `overrides` are extra settings.
+    """
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = str(Path(directory) / 'benchmark.sqlite3')
+        with override_settings(DEBUG=False, REST_FRAMEWORK=rest_framework, **overrides):
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                yield
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def wrap_new_connections(wrapper, dispatch_uid):
+    """
+    Install the execute wrapper `wrapper` on every connection opened during
+    the block, once each, and take it off them again afterwards.
+    """
+    wrapped = []
+
+    def install(sender, connection, **kwargs):
+        # Fires again each time a connection reconnects, and the list outlives that
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+            wrapped.append(connection)
+
+    connection_created.connect(install, dispatch_uid=dispatch_uid, weak=False)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(dispatch_uid=dispatch_uid)
+        for connection in wrapped:
+            if wrapper in connection.execute_wrappers:
+                connection.execute_wrappers.remove(wrapper)
+
+
+@contextmanager
+def query_latency(seconds):
+    """Sleep `seconds` before every query, standing in for a networked database."""
+    if not seconds:
+        yield
+        return
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    with wrap_new_connections(delay, 'benchmark_query_latency'):
+        yield
+
+
+@contextmanager
+def count_queries():
+    """
+    Count queries per thread for the duration of the block; yields the
+    thread-local counter, whose `count` the caller resets per request.
+    """
+    counter = threading.local()
+
+    def count(execute, sql, params, many, context):
+        counter.count = getattr(counter, 'count', 0) + 1
+        return execute(sql, params, many, context)
+
+    with wrap_new_connections(count, 'benchmark_count_queries'):
+        # Connections opened before the block don't get the wrapper: close them
+        connection.close()
+        yield counter
+
+
+def create_user(username='bench'):
+    user = User.objects.create_user(username=username, email=f'{username}@example.com', password='benchpass123')
+    return user, str(RefreshToken.for_user(user).access_token)
+
+
+def seed(features=500, comments=5, activities=5):
+    """Generate features with features.seeding (seed users included); returns their ids."""
+    from features import seeding
+    from features.models import Feature
+
+    seeding.seed(features, users=10, comments=comments, activities=activities)
+    return list(Feature.objects.order_by('pk').values_list('pk', flat=True))
+
+
+def split(url):
+    path, _, query = url.partition('?')
+    return path, query
+
+
+def wsgi_get(application, url, headers=None, method='GET', body=b''):
+    """Run one request through a WSGI application; returns (status, body)."""
+    path, query = split(url)
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'localhost',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    status = []
+    response = application(environ, lambda line, response_headers, exc_info=None: status.append(line))
+    try:
+        content = b''.join(response)
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return int(status[0].split()[0]), content
+
+
+async def asgi_get(application, url, headers=None, method='GET', body=b''):
+    """Run one request through an ASGI application; returns (status, body)."""
+    path, query = split(url)
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [
+            (b'host', b'localhost'),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ] + [
+            (name.lower().encode(), value.encode()) for name, value in (headers or {}).items()
+        ],
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 80),
+    }
+    received = False
+    disconnect = asyncio.Event()
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    status = None
+    chunks = []
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await application(scope, receive, send)
+    disconnect.set()
+    return status, b''.join(chunks)
+
+
+def summarize(name, latencies, elapsed, errors=0, **extra):
+    """Throughput and latency percentiles (ms) for one run."""
+    ordered = sorted(latencies)
+
+    def percentile(fraction):
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+    return {
+        'name': name,
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 2) if ordered else None,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        **extra,
+    }
+
+
+def print_table(results, columns=('name', 'requests', 'errors', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms')):
+    widths = {column: max(len(column), *(len(str(row.get(column))) for row in results)) for column in columns}
+    print('  '.join(column.ljust(widths[column]) for column in columns))
+    for row in results:
+        print('  '.join(str(row.get(column)).ljust(widths[column]) for column in columns))
+
+
+def write_json(path, payload):
+    if path:
+        Path(path).write_text(json.dumps(payload, indent=2, default=str))
+        print(f'Wrote {path}')
@@ -0,0 +1,107 @@
+"""
+Concurrent reads and writes against SQLite with and without the database
+profile's tuning.
+
+    python benchmarks/db_profiles.py --readers 8 --writers 2 --seconds 10
+
+For --seconds, --readers threads fetch feature lists and details while
+--writers threads post comments, all through the WSGI handler with the
+response cache off. Each profile gets a fresh database file:
+
+default          SQLite's own settings (rollback journal), a connection per request
+wal              settings.SQLITE_OPTIONS, a connection per request
+wal-persistent   settings.SQLITE_OPTIONS, connections kept for 60 s (WSGI only)
+
+Errors are mostly writes that gave up waiting for the lock.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from common import benchmark_database, create_user, print_table, seed, summarize, write_json, wsgi_get
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+
+PROFILES = [
+    ('default', {}, 0),
+    ('wal', settings.SQLITE_OPTIONS, 0),
+    ('wal-persistent', settings.SQLITE_OPTIONS, 60),
+]
+
+
+def run(ids, headers, readers, writers, seconds):
+    application = get_wsgi_application()
+    stop = threading.Event()
+    reads, writes = [], []
+    errors = {'read': 0, 'write': 0}
+    body = json.dumps({'content': 'Benchmark comment', 'tag': 'idea'}).encode()
+
+    def read(index):
+        rng = random.Random(index)
+        while not stop.is_set():
+            url = rng.choice([f'/api/features/?page={rng.randint(1, 5)}', f'/api/features/{rng.choice(ids)}/'])
+            started = time.perf_counter()
+            status, _ = wsgi_get(application, url, headers)
+            reads.append(time.perf_counter() - started)
+            errors['read'] += status != 200
+        connection.close()
+
+    def write(index):
+        rng = random.Random(1000 + index)
+        while not stop.is_set():
+            url = f'/api/features/{rng.choice(ids)}/comments/'
+            started = time.perf_counter()
+            status, _ = wsgi_get(application, url, headers, method='POST', body=body)
+            writes.append(time.perf_counter() - started)
+            errors['write'] += status != 201
+        connection.close()
+
+    threads = [threading.Thread(target=read, args=(index,)) for index in range(readers)]
+    threads += [threading.Thread(target=write, args=(index,)) for index in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return reads, writes, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--features', type=int, default=200)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    no_cache = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    # Every thread's connection is built from this same settings dict
+    saved = {key: connection.settings_dict[key] for key in ('CONN_MAX_AGE', 'OPTIONS')}
+    results = []
+    for name, options, max_age in PROFILES:
+        connection.settings_dict.update(CONN_MAX_AGE=max_age, OPTIONS=options)
+        try:
+            with benchmark_database(CACHES=no_cache):
+                _, token = create_user()
+                ids = seed(features=args.features)
+                connection.close()
+                reads, writes, errors, elapsed = run(
+                    ids, {'Authorization': f'Bearer {token}'}, args.readers, args.writers, args.seconds
+                )
+        finally:
+            connection.settings_dict.update(saved)
+        for kind, latencies in [('read', reads), ('write', writes)]:
+            results.append(summarize(f'{name} {kind}s', latencies, elapsed, errors[kind]))
+
+    print_table(results)
+    write_json(args.json, {'options': vars(args), 'results': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""
+HTTP load test over every endpoint in features/urls.py.
+
+    python benchmarks/load.py --features 5000 --requests 5000 --users 32
+    python benchmarks/load.py --existing --requests 20000 --users 64 --compare benchmarks/results/<earlier>.json
+
+By default the data comes from seed_features in a throwaway database.
+--existing runs against the configured database as it is (seed it first with
+``manage.py seed_features``); requests there write real rows.
+
+--users threads each act as a different seed user and send a weighted mix of
+reads and writes (see ENDPOINTS) through the WSGI handler, with throttling
+off. The report gives p50/p95/p99 latency, throughput and queries per
+request for each endpoint and overall, over the 2xx responses only; every
+other response is counted under errors, by status in the JSON file. The
+staff-only export runs as a load-staff user. Results go to
+benchmarks/results/load-<time>.json with the git commit and data size, and
+--compare shows how p95 and throughput moved against an earlier file.
+
+/api/stream/ is left out: it holds its connection open by design.
+"""
+import argparse
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import date, timedelta
+from pathlib import Path
+
+from common import ROOT, benchmark_database, count_queries, print_table, summarize, write_json, wsgi_get
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from features.models import STATUS_TRANSITIONS, Comment, Feature
+from features.seeding import OBJECTS, create_users
+
+SEED_PASSWORD = 'featureflow-seed'
+
+
+class Context:
+    """What the request builders pick from: ids, and features this run created."""
+
+    def __init__(self, feature_ids):
+        self.feature_ids = feature_ids
+        self.statuses = dict(Feature.objects.values_list('pk', 'status'))
+        self.created = deque()
+        self.lock = threading.Lock()
+        self.counter = 0
+
+    def next_number(self):
+        with self.lock:
+            self.counter += 1
+            return self.counter
+
+
+def feature_body(rng, number):
+    return {
+        'title': f'Load test feature {number}',
+        'business_problem': 'Created by benchmarks/load.py',
+        'expected_value': 'Value',
+        'affected_users': 'Users',
+        'complexity': rng.choice(['low', 'medium', 'high']),
+        'business_value': rng.randint(1, 10),
+        'effort': rng.randint(1, 10),
+        'risk': rng.randint(1, 10),
+    }
+
+
+def status_body(context, rng, pk):
+    current = context.statuses.get(pk, 'proposed')
+    return {'status': rng.choice(STATUS_TRANSITIONS[current]), 'justification': 'Load test'}
+
+
+def delete_feature(context, rng, user):
+    with context.lock:
+        pk = context.created.popleft() if context.created else None
+    if pk is None:
+        # Nothing of ours to delete yet
+        return 'POST', '/api/features/', feature_body(rng, context.next_number())
+    return 'DELETE', f'/api/features/{pk}/', None
+
+
+def change_status(context, rng, user):
+    pk = rng.choice(context.feature_ids)
+    return 'POST', f'/api/features/{pk}/change_status/', status_body(context, rng, pk)
+
+
+def register(context, rng, user):
+    number = context.next_number()
+    return 'POST', '/api/auth/register/', {
+        'username': f'load-{number}-{rng.randrange(10 ** 9)}',
+        'email': f'load-{number}@example.com',
+        'password': 'load-test-pass-123',
+        'password_confirm': 'load-test-pass-123',
+    }
+
+
+def recent_day():
+    return (date.today() - timedelta(days=2)).isoformat()
+
+
+# name: (weight, builder(context, rng, user) -> (method, url, body)); weights
+# follow a read-heavy product: lists and details dominate, writes are a few percent
+ENDPOINTS = {
+    'features-list': (20, lambda c, r, u: ('GET', f'/api/features/?page={r.randint(1, 5)}', None)),
+    'features-filtered': (6, lambda c, r, u: (
+        'GET', f'/api/features/?status={r.choice(list(STATUS_TRANSITIONS))}&ordering=-priority_score', None)),
+    'features-cursor': (4, lambda c, r, u: ('GET', '/api/features/?pagination=cursor&ordering=-last_activity_at', None)),
+    'feature-detail': (20, lambda c, r, u: ('GET', f'/api/features/{r.choice(c.feature_ids)}/', None)),
+    'feature-search': (4, lambda c, r, u: ('GET', f'/api/features/search/?q={r.choice(OBJECTS).split()[0]}', None)),
+    'feature-stats': (2, lambda c, r, u: ('GET', '/api/features/stats/', None)),
+    'feature-changes': (2, lambda c, r, u: ('GET', '/api/features/changes/?limit=100', None)),
+    'feature-export': (1, lambda c, r, u: ('GET', f'/api/features/export/?created_after={recent_day()}', None)),
+    'comments-list': (8, lambda c, r, u: ('GET', f'/api/features/{r.choice(c.feature_ids)}/comments/', None)),
+    'activities-list': (6, lambda c, r, u: ('GET', f'/api/features/{r.choice(c.feature_ids)}/activities/', None)),
+    'status-changes-list': (3, lambda c, r, u: (
+        'GET', f'/api/features/{r.choice(c.feature_ids)}/status_changes/', None)),
+    'async-features-list': (3, lambda c, r, u: ('GET', f'/api/async/features/?page={r.randint(1, 5)}', None)),
+    'async-feature-detail': (3, lambda c, r, u: ('GET', f'/api/async/features/{r.choice(c.feature_ids)}/', None)),
+    'async-comments-list': (2, lambda c, r, u: (
+        'GET', f'/api/async/features/{r.choice(c.feature_ids)}/comments/', None)),
+    'async-activities-list': (2, lambda c, r, u: (
+        'GET', f'/api/async/features/{r.choice(c.feature_ids)}/activities/', None)),
+    'auth-me': (3, lambda c, r, u: ('GET', '/api/auth/me/', None)),
+    'feature-create': (2, lambda c, r, u: ('POST', '/api/features/', feature_body(r, c.next_number()))),
+    'feature-update': (2, lambda c, r, u: (
+        'PATCH', f'/api/features/{r.choice(c.feature_ids)}/', {'business_value': r.randint(1, 10)})),
+    'feature-delete': (1, delete_feature),
+    'feature-change-status': (1, change_status),
+    'comment-create': (3, lambda c, r, u: (
+        'POST', f'/api/features/{r.choice(c.feature_ids)}/comments/',
+        {'content': 'Load test comment', 'tag': r.choice([tag for tag, _ in Comment.TAG_CHOICES])})),
+    'bulk-create': (1, lambda c, r, u: (
+        'POST', '/api/features/bulk/', {'items': [feature_body(r, c.next_number()) for _ in range(5)]})),
+    'bulk-update': (1, lambda c, r, u: ('PATCH', '/api/features/bulk/', {
+        'items': [{'id': pk, 'effort': r.randint(1, 10)} for pk in r.sample(c.feature_ids, 5)]})),
+    'bulk-status': (1, lambda c, r, u: ('POST', '/api/features/bulk/status/', {
+        'items': [{'id': pk, **status_body(c, r, pk)} for pk in r.sample(c.feature_ids, 5)]})),
+    'auth-login': (1, lambda c, r, u: ('POST', '/api/auth/login/', {'username': u.username, 'password': SEED_PASSWORD})),
+    'async-auth-login': (1, lambda c, r, u: (
+        'POST', '/api/async/auth/login/', {'username': u.username, 'password': SEED_PASSWORD})),
+    'auth-refresh': (1, lambda c, r, u: ('POST', '/api/auth/refresh/', {'refresh': str(RefreshToken.for_user(u))})),
+    'auth-register': (1, register),
+}
+
+# Sent with a staff user's token rather than the virtual user's
+STAFF_ENDPOINTS = {'feature-export'}
+
+# Their responses carry the features' new statuses, for status_body
+STATUS_ENDPOINTS = {'feature-change-status', 'bulk-status'}
+
+
+def run(context, users, staff, requests, queries):
+    application = get_wsgi_application()
+    names = list(ENDPOINTS)
+    weights = [ENDPOINTS[name][0] for name in names]
+    timings = defaultdict(list)
+    per_user = requests // len(users)
+
+    def work(index, user):
+        rng = random.Random(index)
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+        staff_headers = {'Authorization': f'Bearer {RefreshToken.for_user(staff).access_token}'}
+        for name in rng.choices(names, weights, k=per_user):
+            method, url, body = ENDPOINTS[name][1](context, rng, user)
+            queries.count = 0
+            started = time.perf_counter()
+            status, content = wsgi_get(
+                application, url, staff_headers if name in STAFF_ENDPOINTS else headers,
+                method=method, body=json.dumps(body).encode() if body else b''
+            )
+            timings[name].append((time.perf_counter() - started, status, queries.count))
+            if method == 'POST' and url == '/api/features/' and status == 201:
+                with context.lock:
+                    context.created.append(json.loads(content)['id'])
+            elif name in STATUS_ENDPOINTS and status == 200:
+                data = json.loads(content)
+                with context.lock:
+                    for row in data.get('results', [data]):
+                        context.statuses[row['id']] = row['status']
+        connection.close()
+
+    threads = [threading.Thread(target=work, args=(index, user)) for index, user in enumerate(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, time.perf_counter() - started
+
+
+def summarize_rows(name, rows, elapsed):
+    """
+    Latencies, throughput and queries of the 2xx responses; every other
+    response counts as an error, with its status in `statuses`.
+    """
+    ok = [(latency, count) for latency, status, count in rows if 200 <= status < 300]
+    statuses = Counter(str(status) for _, status, _ in rows if not 200 <= status < 300)
+    return summarize(
+        name, [latency for latency, _ in ok], elapsed,
+        errors=sum(statuses.values()),
+        statuses=dict(sorted(statuses.items())),
+        queries=round(sum(count for _, count in ok) / len(ok), 1) if ok else None,
+    )
+
+
+def report(timings, elapsed):
+    results = [summarize_rows(name, timings[name], elapsed) for name in sorted(timings)]
+    everything = [row for rows in timings.values() for row in rows]
+    results.append(summarize_rows('all', everything, elapsed))
+    return results
+
+
+def compare(results, path):
+    earlier = {row['name']: row for row in json.loads(Path(path).read_text())['results']}
+    rows = []
+    for row in results:
+        before = earlier.get(row['name'])
+        if not before or not before['p95_ms'] or not before['throughput']:
+            continue
+        rows.append({
+            'name': row['name'],
+            'p95_before': before['p95_ms'],
+            'p95_now': row['p95_ms'],
+            'p95_change': f"{(row['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%",
+            'throughput_change': f"{(row['throughput'] / before['throughput'] - 1) * 100:+.0f}%",
+        })
+    print(f'\nAgainst {path}:')
+    print_table(rows, columns=('name', 'p95_before', 'p95_now', 'p95_change', 'throughput_change'))
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_test(args):
+    if args.existing:
+        # Logins need seed_features to have used the default password
+        users = list(User.objects.filter(username__startswith='seed-user-').order_by('pk')[:args.users])
+    else:
+        users = create_users(args.users, SEED_PASSWORD)
+    if not users:
+        raise SystemExit('No seed users: run manage.py seed_features first')
+    feature_ids = list(Feature.objects.order_by('?').values_list('pk', flat=True)[:10000])
+    if len(feature_ids) < 5:
+        raise SystemExit('Need at least 5 features')
+    # The export is staff only
+    staff, _ = User.objects.get_or_create(username='load-staff', defaults={'is_staff': True})
+    if not staff.is_staff:
+        raise SystemExit('User load-staff exists without staff status')
+    context = Context(feature_ids)
+    with count_queries() as queries:
+        timings, elapsed = run(context, users, staff, args.requests, queries)
+    data = {'features': Feature.objects.count(), 'comments': Comment.objects.count()}
+    return report(timings, elapsed), data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--features', type=int, default=2000, help='features to seed (ignored with --existing)')
+    parser.add_argument('--comments', type=float, default=5)
+    parser.add_argument('--activities', type=float, default=10)
+    parser.add_argument('--existing', action='store_true', help='use the configured database as it is')
+    parser.add_argument('--users', type=int, default=16, help='concurrent virtual users (threads)')
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--json', help='results file (default: benchmarks/results/load-<time>.json)')
+    parser.add_argument('--compare', help='an earlier results file to compare against')
+    args = parser.parse_args()
+
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}
+    if args.existing:
+        with override_settings(DEBUG=False, REST_FRAMEWORK=rest_framework):
+            results, data = load_test(args)
+    else:
+        with benchmark_database():
+            call_command(
+                'seed_features', features=args.features, users=args.users, comments=args.comments,
+                activities=args.activities, password=SEED_PASSWORD, verbosity=0,
+            )
+            results, data = load_test(args)
+
+    print_table(results, columns=('name', 'requests', 'errors', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'queries'))
+    path = args.json or str(ROOT / 'benchmarks' / 'results' / time.strftime('load-%Y%m%d-%H%M%S.json'))
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    write_json(path, {
+        'options': vars(args),
+        'environment': {
+            'git_commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'database': connection.vendor,
+            'data': data,
+        },
+        'results': results,
+    })
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
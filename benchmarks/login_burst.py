@@ -0,0 +1,97 @@
+"""
+Login throughput against the latency of reads served at the same time.
+
+    python benchmarks/login_burst.py --logins 40 --login-concurrency 20 --readers 4
+
+Everything runs through the ASGI handler. Readers fetch --read-path in a loop
+while a burst of --logins goes to the sync login (/api/auth/login/, hashed
+on the thread that runs every sync view) and then to the async one
+(/api/async/auth/login/, hashed on the PASSWORD_HASHING pool). An idle run
+with no logins gives the baseline read latency. Logins turned away because
+the pool is full are counted as 503s.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from common import asgi_get, benchmark_database, create_user, print_table, seed, summarize, write_json
+from django.core.asgi import get_asgi_application
+
+
+async def burst(application, login_path, args, headers):
+    stop = asyncio.Event()
+    reads = []
+    body = json.dumps({'username': 'bench', 'password': 'benchpass123'}).encode()
+
+    async def reader():
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asgi_get(application, args.read_path, headers)
+            reads.append(time.perf_counter() - started)
+
+    semaphore = asyncio.Semaphore(args.login_concurrency)
+
+    async def login():
+        async with semaphore:
+            started = time.perf_counter()
+            status, _ = await asgi_get(application, login_path, method='POST', body=body)
+            return status, time.perf_counter() - started
+
+    readers = [asyncio.create_task(reader()) for _ in range(args.readers)]
+    started = time.perf_counter()
+    if login_path:
+        logins = await asyncio.gather(*(login() for _ in range(args.logins)))
+    else:
+        await asyncio.sleep(args.idle_seconds)
+        logins = []
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*readers)
+    return logins, reads, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=40)
+    parser.add_argument('--login-concurrency', type=int, default=20)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--read-path', default='/api/features/')
+    parser.add_argument('--idle-seconds', type=float, default=2.0)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    results = []
+    with benchmark_database():
+        _, token = create_user()
+        seed(features=100)
+        headers = {'Authorization': f'Bearer {token}'}
+        application = get_asgi_application()
+        for name, login_path in [
+            ('idle', None),
+            ('sync-login', '/api/auth/login/'),
+            ('async-login', '/api/async/auth/login/'),
+        ]:
+            logins, reads, elapsed = asyncio.run(burst(application, login_path, args, headers))
+            succeeded = [latency for status, latency in logins if status == 200]
+            read_stats = summarize(name, reads, elapsed)
+            results.append({
+                'name': name,
+                'logins': len(succeeded),
+                'busy_503': sum(1 for status, _ in logins if status == 503),
+                'logins_per_second': round(len(succeeded) / elapsed, 1) if logins else None,
+                'reads': len(reads),
+                'read_p50_ms': read_stats['p50_ms'],
+                'read_p95_ms': read_stats['p95_ms'],
+                'read_p99_ms': read_stats['p99_ms'],
+                'seconds': round(elapsed, 3),
+            })
+
+    print_table(results, columns=(
+        'name', 'logins', 'busy_503', 'logins_per_second', 'reads', 'read_p50_ms', 'read_p95_ms', 'read_p99_ms',
+    ))
+    write_json(args.json, {'options': vars(args), 'results': results})
+
+
+if __name__ == '__main__':
+    main()
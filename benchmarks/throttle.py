@@ -0,0 +1,85 @@
+"""
+Throttle checks per second: DRF's UserRateThrottle against the GCRA
+throttle on the cache and database stores.
+
+    python benchmarks/throttle.py --checks 20000 --keys 100 --rate 1000/minute --threads 4
+
+Each check is one allow_request() call for a random user out of --keys. DRF
+keeps a timestamp per allowed request in the last period, so its cost grows
+with --rate; GCRA keeps one number per key.
+"""
+import argparse
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from common import benchmark_database, print_table, write_json
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework import throttling as drf_throttling
+
+from features import throttling
+
+
+def throttle_class(base, rate):
+    return type(f'Bench{base.__name__}', (base,), {'rate': rate})
+
+
+def run(throttle_cls, checks, keys, threads):
+    users = [SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=pk)) for pk in range(keys)]
+    per_thread = checks // threads
+    allowed = [0] * threads
+
+    def work(index):
+        rng = random.Random(index)
+        throttle = throttle_cls()
+        for _ in range(per_thread):
+            allowed[index] += throttle.allow_request(rng.choice(users), None)
+        connection.close()
+
+    workers = [threading.Thread(target=work, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'checks': per_thread * threads,
+        'allowed': sum(allowed),
+        'seconds': round(elapsed, 3),
+        'checks_per_second': round(per_thread * threads / elapsed),
+        'us_per_check': round(elapsed / (per_thread * threads) * 1e6 * threads, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=100)
+    parser.add_argument('--rate', default='1000/minute')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    runs = [
+        ('drf-history', drf_throttling.UserRateThrottle, 'cache'),
+        ('gcra-cache', throttling.UserRateThrottle, 'cache'),
+        ('gcra-database', throttling.UserRateThrottle, 'database'),
+    ]
+    results = []
+    with benchmark_database():
+        for name, base, store in runs:
+            cache.clear()
+            with override_settings(THROTTLE_STORE={'BACKEND': store}):
+                result = run(throttle_class(base, args.rate), args.checks, args.keys, args.threads)
+            results.append({'name': name, **result})
+
+    print_table(results, columns=('name', 'checks', 'allowed', 'checks_per_second', 'us_per_check'))
+    write_json(args.json, {'options': vars(args), 'results': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -26,6 +26,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its total covers the other middleware too
+    'features.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -63,11 +65,147 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'django_project.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Database profile: 'sqlite' (default) or 'postgres'. The event stream and
+# the async views need ASGI, where Django's persistent connections leak (one
+# per thread), so connections close after each request by default. Under
+# WSGI, DATABASE_CONN_MAX_AGE keeps them for that many seconds; on Postgres
+# under ASGI, use DATABASE_POOL instead (needs psycopg[pool]).
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 0))
+
+# Run on every new SQLite connection; SQLITE_TUNING=off leaves SQLite's defaults
+SQLITE_OPTIONS = {
+    'init_command': ';'.join([
+        # Readers see the last committed state while a writer works, instead
+        # of waiting for it. Stored in the database file, so it sticks.
+        'PRAGMA journal_mode=WAL',
+        # Sync the WAL at checkpoints rather than on every commit. Safe from
+        # corruption; a power cut can lose the last few commits.
+        'PRAGMA synchronous=NORMAL',
+        # Read from memory-mapped pages and a 64 MB page cache (negative: KiB)
+        'PRAGMA mmap_size=268435456',
+        'PRAGMA cache_size=-65536',
+    ]),
+    # Seconds a writer waits for the lock before "database is locked"
+    'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)) / 1000,
+    # Take the write lock when a transaction begins, where the timeout
+    # applies: upgrading a read lock mid-transaction fails at once
+    'transaction_mode': 'IMMEDIATE',
+}
+if os.environ.get('SQLITE_TUNING', 'on').lower() in ('off', 'false', '0', 'no'):
+    SQLITE_OPTIONS = {}
+
+if DATABASE_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'featureflow'),
+            'USER': os.environ.get('POSTGRES_USER', 'featureflow'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
+    if os.environ.get('DATABASE_POOL', '').lower() in ('true', '1', 'yes'):
+        # The pool owns the connections; Django refuses persistent ones with it
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+        }
+elif DATABASE_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': SQLITE_OPTIONS,
+        }
+    }
+else:
+    raise ValueError(f"Unknown DATABASE_PROFILE {DATABASE_PROFILE!r}; choose 'sqlite' or 'postgres'")
+
+# Read replicas (comma-separated SQLite files, or Postgres hosts), used for
+# safe requests to the feature, comment and activity endpoints. A user's
+# reads stay on the primary for REPLICA_STICKY_SECONDS after they write.
+# See features/routing.py.
+DATABASE_REPLICAS = []
+for index, location in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1):
+    alias = f'replica{index}'
+    location_setting = 'HOST' if DATABASE_PROFILE == 'postgres' else 'NAME'
+    # Tests run against the primary's test database
+    DATABASES[alias] = {**DATABASES['default'], location_setting: location.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['features.routing.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+# Feature reads are cached in the default cache (per-process locmem unless
+# configured); point this at a shared backend when running several workers
+FEATURE_CACHE_ALIAS = 'default'
+FEATURE_CACHE_TIMEOUT = int(os.environ.get('FEATURE_CACHE_TIMEOUT', 300))
+
+# Seconds an authenticated user's row is cached between requests (0 disables);
+# see features/authentication.py
+JWT_USER_CACHE_TIMEOUT = int(os.environ.get('JWT_USER_CACHE_TIMEOUT', 60))
+
+# Activity log delivery: 'sync' (in the writing transaction), 'after_response'
+# (one batch per request, after the response is sent) or 'background'
+# (batched by a writer thread). See features/activity.py for the guarantees.
+ACTIVITY_LOG = {
+    'DELIVERY': os.environ.get('ACTIVITY_LOG_DELIVERY', 'sync'),
+    'BATCH_SIZE': int(os.environ.get('ACTIVITY_LOG_BATCH_SIZE', 500)),
+    'FLUSH_INTERVAL': float(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL', 1.0)),
+}
+
+# Change feed (/api/features/changes/): tombstones of deleted features older
+# than this are removed by `manage.py prune_feature_tombstones`, and older
+# tokens must sync again from scratch. See features/changes.py.
+CHANGE_FEED = {
+    'TOMBSTONE_RETENTION_DAYS': int(os.environ.get('TOMBSTONE_RETENTION_DAYS', 90)),
+}
+
+# Live activity streams (/api/stream/): 'local' publishes in the writing
+# process only; 'database' polls the activity table so every worker's
+# streams see every write. See features/events.py.
+EVENT_STREAM = {
+    'BACKEND': os.environ.get('EVENT_STREAM_BACKEND', 'local'),
+    'POLL_INTERVAL': float(os.environ.get('EVENT_STREAM_POLL_INTERVAL', 1.0)),
+    'KEEPALIVE': 15,
+    'QUEUE_SIZE': 100,
+    # Seconds a ticket from /api/stream/ticket/ stays valid
+    'TICKET_TTL': 30,
+}
+
+# Request timings (Server-Timing header, /api/metrics/ histograms) and the
+# slow-request log; see features/metrics.py. /api/metrics/ is for staff
+# users' JWTs, or for "Authorization: Bearer <token>" once METRICS_TOKEN is
+# set (for scrapers).
+METRICS = {
+    'ENABLED': os.environ.get('METRICS_ENABLED', 'True').lower() in ('true', '1', 'yes'),
+    'TOKEN': os.environ.get('METRICS_TOKEN', ''),
+    'SLOW_REQUEST_MS': float(os.environ.get('METRICS_SLOW_REQUEST_MS', 0)),
+    'SLOW_REQUEST_QUERIES': 10,
+}
+
+# Password hashing pool for /api/async/auth/: WORKERS hash at once, and
+# requests beyond MAX_PENDING running or queued get a 503. See
+# features/hashing.py.
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', 4)),
+    'MAX_PENDING': int(os.environ.get('PASSWORD_HASHING_MAX_PENDING', 32)),
+}
+
+# Throttle state (rates are in REST_FRAMEWORK below): 'database' keeps it in
+# a table every worker shares (prune it with `manage.py prune_throttle_buckets`),
+# 'cache' in the CACHE_ALIAS cache, which must be shared with several workers.
+# See features/throttling.py.
+THROTTLE_STORE = {
+    'BACKEND': os.environ.get('THROTTLE_STORE', 'database'),
+    'CACHE_ALIAS': os.environ.get('THROTTLE_CACHE_ALIAS', 'default'),
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -79,15 +217,15 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'features.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     # SECURITY: Rate limiting to prevent brute force attacks
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'features.throttling.AnonRateThrottle',
+        'features.throttling.UserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '20/minute',
@@ -0,0 +1,189 @@
+"""
+Buffered, batched writer for the activity log.
+
+Delivery is set by ``settings.ACTIVITY_LOG['DELIVERY']``:
+
+``sync`` (default)
+    Written in the caller's transaction, so an entry exists exactly when the
+    change it records does. Entries logged inside ``activity_log.batch()`` are
+    written together with one ``bulk_create`` when the block exits.
+
+``after_response``
+    Queued when the transaction commits (rolled-back writes are never logged)
+    and written with one ``bulk_create`` per request after the response has
+    been sent, or as soon as ``BATCH_SIZE`` entries are waiting. Entries are
+    lost if the worker dies before the request finishes.
+
+``background``
+    Queued on commit and written by a background thread whenever
+    ``BATCH_SIZE`` entries are waiting or ``FLUSH_INTERVAL`` seconds have
+    passed. Nothing is written on the request path; up to one interval of
+    entries is lost if the process is killed. The queue is flushed at
+    interpreter exit; servers that skip atexit (e.g. a gunicorn worker_exit
+    hook) should call ``activity_log.shutdown()``.
+
+Outside requests (management commands, the shell) call ``activity_log.flush()``
+once done when not using ``sync``.
+"""
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .cache import invalidate_feature
+from .models import Activity
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_MODES = ('sync', 'after_response', 'background')
+
+# Sent after entries are inserted, in their transaction, with `activities`
+# (saved, with ids)
+activities_written = Signal()
+
+
+class ActivityWriter:
+    def __init__(self, delivery='sync', batch_size=500, flush_interval=1.0):
+        if delivery not in DELIVERY_MODES:
+            raise ValueError(f'Unknown activity delivery {delivery!r}; choose from {DELIVERY_MODES}')
+        self.delivery = delivery
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._queue = []
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    @classmethod
+    def from_settings(cls):
+        options = getattr(settings, 'ACTIVITY_LOG', {})
+        return cls(
+            delivery=options.get('DELIVERY', 'sync'),
+            batch_size=options.get('BATCH_SIZE', 500),
+            flush_interval=options.get('FLUSH_INTERVAL', 1.0),
+        )
+
+    def log(self, feature, user, action, description):
+        entry = Activity(
+            feature=feature, user=user, action=action, description=description,
+            created_at=timezone.now()
+        )
+        if self.delivery == 'sync':
+            pending = getattr(self._local, 'batch', None)
+            if pending is None:
+                self.write([entry])
+            else:
+                pending.append(entry)
+        elif self.delivery == 'after_response':
+            transaction.on_commit(lambda: self._hold(entry))
+        else:
+            transaction.on_commit(lambda: self._enqueue(entry))
+        return entry
+
+    @contextmanager
+    def batch(self):
+        """Collect sync entries logged in the block into one bulk_create."""
+        if self.delivery != 'sync' or getattr(self._local, 'batch', None) is not None:
+            yield
+            return
+        self._local.batch = []
+        try:
+            yield
+            entries = self._local.batch
+        finally:
+            self._local.batch = None
+        self.write(entries)
+
+    def write(self, entries):
+        if not entries:
+            return
+        # Receivers (e.g. the features' last_activity_at) write in the same transaction
+        with transaction.atomic(savepoint=False):
+            Activity.objects.bulk_create(entries, batch_size=self.batch_size)
+            for feature_id in {entry.feature_id for entry in entries}:
+                invalidate_feature(feature_id)
+            activities_written.send(sender=Activity, activities=entries)
+
+    def flush(self):
+        """Write everything this thread holds and everything queued."""
+        held = getattr(self._local, 'held', None)
+        self._local.held = []
+        self.write(held)
+        with self._lock:
+            queued, self._queue = self._queue, []
+        self.write(queued)
+
+    def shutdown(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    # after_response: per-thread list, flushed when the request finishes
+
+    def _hold(self, entry):
+        held = getattr(self._local, 'held', None)
+        if held is None:
+            held = self._local.held = []
+        held.append(entry)
+        if len(held) >= self.batch_size:
+            self._local.held = []
+            self.write(held)
+
+    def flush_request(self, **kwargs):
+        held = getattr(self._local, 'held', None)
+        if held:
+            self._local.held = []
+            try:
+                self.write(held)
+            except Exception:
+                logger.exception('Dropped %d activity log entries', len(held))
+
+    # background: process-wide queue drained by a daemon thread
+
+    def _enqueue(self, entry):
+        with self._lock:
+            self._queue.append(entry)
+            size = len(self._queue)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='activity-writer', daemon=True)
+                self._thread.start()
+        if size >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopping:
+                # shutdown() drains what is left from the calling thread
+                return
+            with self._lock:
+                entries, self._queue = self._queue, []
+            if not entries:
+                continue
+            try:
+                self.write(entries)
+            except Exception:
+                logger.exception('Dropped %d activity log entries', len(entries))
+            finally:
+                # This thread owns its own connection; don't hold it open idle
+                connection.close()
+
+
+activity_log = ActivityWriter.from_settings()
+request_finished.connect(activity_log.flush_request, dispatch_uid='activity_log_flush_request')
+atexit.register(activity_log.shutdown)
+
+
+def log_activity(feature, user, action, description):
+    return activity_log.log(feature, user, action, description)
@@ -1,5 +1,24 @@
 from django.contrib import admin
+from .cache import invalidate_feature
 from .models import Feature, Comment, StatusChange, Activity
+from .search import matching_features
+
+
+class InvalidateFeatureOnDeleteMixin:
+    """
+    Drops the cached reads of the parent features on delete, for models
+    without delete signals (see signals.invalidate_parent_feature_cache).
+    """
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_feature(obj.feature_id)
+
+    def delete_queryset(self, request, queryset):
+        feature_ids = set(queryset.values_list('feature_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for feature_id in feature_ids:
+            invalidate_feature(feature_id)
 
 
 @admin.register(Feature)
@@ -7,6 +26,12 @@ class FeatureAdmin(admin.ModelAdmin):
     list_display = ['title', 'status', 'complexity', 'priority_score', 'created_by', 'created_at']
     list_filter = ['status', 'complexity', 'created_at']
     search_fields = ['title', 'business_problem', 'expected_value']
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains scans over TextFields
+        if not search_term:
+            return queryset, False
+        return queryset.filter(matching_features(search_term)), False
 
 
 @admin.register(Comment)
@@ -16,12 +41,12 @@ class CommentAdmin(admin.ModelAdmin):
 
 
 @admin.register(StatusChange)
-class StatusChangeAdmin(admin.ModelAdmin):
+class StatusChangeAdmin(InvalidateFeatureOnDeleteMixin, admin.ModelAdmin):
     list_display = ['feature', 'from_status', 'to_status', 'changed_by', 'created_at']
     list_filter = ['from_status', 'to_status', 'created_at']
 
 
 @admin.register(Activity)
-class ActivityAdmin(admin.ModelAdmin):
+class ActivityAdmin(InvalidateFeatureOnDeleteMixin, admin.ModelAdmin):
     list_display = ['feature', 'user', 'action', 'created_at']
     list_filter = ['action', 'created_at']
@@ -0,0 +1,179 @@
+"""
+Async versions of the hot read endpoints, and of login and register, served
+under /api/async/.
+
+Each one drives the matching DRF view: the same authentication,
+permissions, throttling, filters, sparse fieldsets, pagination and
+serializers, so the JSON is identical to the sync endpoint's. Only the
+database round-trips change, going through Django's async ORM, so under ASGI
+a slow query parks a coroutine instead of holding a worker thread.
+Serialization is sync CPU work and runs in a thread too, so a large page
+doesn't stall the event loop and the event streams sharing it.
+
+DRF's request checks (JWT user lookup, throttle counters) are sync code and
+run in one sync_to_async call per request. Detail responses share the
+versioned response cache; conditional GET (ETag / 304) is only on the sync
+endpoints.
+
+Login and register hash passwords on the bounded pool in hashing.py and
+answer 503 when it is full. Login runs authenticate() there, so it goes
+through AUTHENTICATION_BACKENDS and then simplejwt's USER_AUTHENTICATION_RULE
+and UPDATE_LAST_LOGIN, like /api/auth/login/.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import update_last_login
+from django.db import connection
+from django.http import Http404
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, MethodNotAllowed
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.serializers import TokenObtainSerializer
+from rest_framework_simplejwt import settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenViewBase
+
+from .cache import feature_scope, get_cache, get_timeout, response_key
+from .hashing import pool
+from .routing import primary
+from .serializers import LoginSerializer, RegisterSerializer, UserSerializer
+from .throttling import AuthRateThrottle
+from .views import ActivityViewSet, CommentViewSet, FeatureViewSet
+
+
+async def dispatch(viewset_class, action, handler, request, **kwargs):
+    """Run `handler(view, request)` the way DRF's dispatch() would run an action."""
+    view = viewset_class(action_map={'get': action}, args=(), kwargs=kwargs)
+    return await run_view(view, handler, request, ['GET'], **kwargs)
+
+
+async def run_view(view, handler, request, methods, **kwargs):
+    view.args, view.kwargs = (), kwargs
+    request = view.initialize_request(request, **kwargs)
+    view.request = request
+    view.headers = view.default_response_headers
+    try:
+        if request.method not in methods:
+            raise MethodNotAllowed(request.method)
+        await sync_to_async(view.initial)(request, **kwargs)
+        response = await handler(view, request)
+    except Exception as exc:
+        response = view.handle_exception(exc)
+    # Django renders the response (in a thread) once the view returns
+    return view.finalize_response(request, response, **kwargs)
+
+
+async def serialize(serializer):
+    """serializer.data, computed off the event loop."""
+    return await sync_to_async(lambda: serializer.data)()
+
+
+async def list_rows(view, request):
+    queryset = view.filter_queryset(view.get_queryset())
+    page = await view.paginator.apaginate_queryset(queryset, request, view=view)
+    if page is not None:
+        return view.get_paginated_response(await serialize(view.get_serializer(page, many=True)))
+    rows = [row async for row in queryset]
+    return Response(await serialize(view.get_serializer(rows, many=True)))
+
+
+async def retrieve_feature(view, request):
+    cache = get_cache()
+    key = await sync_to_async(response_key)(feature_scope(view.kwargs['pk']), request)
+    data = await cache.aget(key)
+    if data is not None:
+        return Response(data)
+    with primary():
+        feature = await view.filter_queryset(view.get_queryset()).filter(pk=view.kwargs['pk']).afirst()
+    if feature is None:
+        raise Http404('No Feature matches the given query.')
+    view.check_object_permissions(request, feature)
+    data = await serialize(view.get_serializer(feature))
+    await cache.aset(key, data, get_timeout())
+    return Response(data)
+
+
+async def feature_list(request):
+    return await dispatch(FeatureViewSet, 'list', list_rows, request)
+
+
+async def feature_detail(request, pk):
+    return await dispatch(FeatureViewSet, 'retrieve', retrieve_feature, request, pk=pk)
+
+
+async def comment_list(request, feature_pk):
+    return await dispatch(CommentViewSet, 'list', list_rows, request, feature_pk=feature_pk)
+
+
+async def activity_list(request, feature_pk):
+    return await dispatch(ActivityViewSet, 'list', list_rows, request, feature_pk=feature_pk)
+
+
+class LoginView(TokenViewBase):
+    """Request checks and error responses of simplejwt's TokenObtainPairView."""
+
+
+class RegisterView(APIView):
+    """Request checks of views.register."""
+    permission_classes = [AllowAny]
+    throttle_classes = [AuthRateThrottle]
+
+
+def authenticate_user(request, username, password):
+    """authenticate() for the pool's threads, closing their connection afterwards."""
+    try:
+        return authenticate(request, username=username, password=password)
+    finally:
+        connection.close()
+
+
+async def obtain_tokens(view, request):
+    serializer = LoginSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    # Every AUTHENTICATION_BACKENDS entry, as TokenObtainSerializer does; the
+    # default ModelBackend hashes even for a missing user, so timing matches
+    user = await pool.run(
+        authenticate_user, request._request,
+        serializer.validated_data['username'], serializer.validated_data['password']
+    )
+    if not jwt_settings.api_settings.USER_AUTHENTICATION_RULE(user):
+        raise AuthenticationFailed(
+            TokenObtainSerializer.default_error_messages['no_active_account'],
+            code='no_active_account'
+        )
+    refresh = RefreshToken.for_user(user)
+    if jwt_settings.api_settings.UPDATE_LAST_LOGIN:
+        await sync_to_async(update_last_login)(None, user)
+    return Response({'refresh': str(refresh), 'access': str(refresh.access_token)})
+
+
+async def create_account(view, request):
+    serializer = RegisterSerializer(data=request.data)
+    # Validation checks the username against the database
+    if not await sync_to_async(serializer.is_valid)():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    password_hash = await pool.run(make_password, serializer.validated_data['password'])
+    user = await sync_to_async(serializer.save)(password_hash=password_hash)
+    refresh = RefreshToken.for_user(user)
+    return Response({
+        'user': UserSerializer(user).data,
+        'tokens': {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }
+    }, status=status.HTTP_201_CREATED)
+
+
+# Token endpoints, exempt from CSRF like DRF's APIView.as_view()
+@csrf_exempt
+async def login(request):
+    return await run_view(LoginView(), obtain_tokens, request, ['POST'])
+
+
+@csrf_exempt
+async def register(request):
+    return await run_view(RegisterView(), create_account, request, ['POST'])
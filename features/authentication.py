@@ -0,0 +1,124 @@
+"""
+JWT authentication that keeps recently seen users in the cache.
+
+simplejwt's JWTAuthentication loads the user row on every request. Here the
+parts authentication needs (id, username, is_active and a digest of the
+password hash) are cached for ``JWT_USER_CACHE_TIMEOUT`` seconds under the
+feature cache alias, so a client making a run of calls costs one user query
+per timeout rather than one per call. The active and revoked-token checks
+still run on every request, against the cached entry. The feature cache may
+be shared with other services, so the hash itself and the rest of the row
+stay out of it: on a cache hit they are deferred fields, loaded from the
+database by whatever reads them (``is_staff`` for admin-only views, ``email``
+for /api/auth/me/).
+
+Saving or deleting a user drops its entry (see signals.py). Writes that skip
+the model's save(), such as ``User.objects.update()``, are seen once the
+entry expires.
+
+EventSource can't send an Authorization header, so the event stream takes a
+ticket in its URL instead: signed, good for ``EVENT_STREAM['TICKET_TTL']``
+seconds and one stream, and useless anywhere else, so a copy in an access log
+is worth nothing.
+"""
+import secrets
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import metrics
+from .cache import get_cache
+
+
+def user_key(user_id):
+    return f'featureflow:jwt-user:{user_id}'
+
+
+def get_timeout():
+    return getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 60)
+
+
+def get_ticket_ttl():
+    return getattr(settings, 'EVENT_STREAM', {}).get('TICKET_TTL', 30)
+
+
+def invalidate_user(user_id):
+    # Again on commit, in case a request cached the row from before the write
+    def delete():
+        get_cache().delete(user_key(user_id))
+    delete()
+    transaction.on_commit(delete)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        with metrics.timed('auth'):
+            return super().authenticate(request)
+
+    def cached_fields(self):
+        """Attnames of the user fields kept in the cache; the rest load on access."""
+        names = {self.user_model._meta.pk.name, self.user_model.USERNAME_FIELD, 'is_active'}
+        # In field order, which from_db() expects
+        return [field.attname for field in self.user_model._meta.concrete_fields if field.name in names]
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        cache = get_cache()
+        key = user_key(user_id)
+        entry = cache.get(key) if get_timeout() else None
+        if entry is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            password_digest = get_md5_hash_password(user.password)
+            if get_timeout():
+                values = [getattr(user, field) for field in self.cached_fields()]
+                cache.set(key, (values, password_digest), get_timeout())
+        else:
+            values, password_digest = entry
+            user = self.user_model.from_db(DEFAULT_DB_ALIAS, self.cached_fields(), values)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_digest:
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
+
+
+STREAM_TICKET_SALT = 'featureflow.stream-ticket'
+
+
+def issue_stream_ticket(user, expires_at):
+    """A stream ticket for `user`; the stream it opens ends at `expires_at` (epoch seconds)."""
+    payload = {'user': user.pk, 'exp': expires_at, 'nonce': secrets.token_urlsafe(12)}
+    return signing.dumps(payload, salt=STREAM_TICKET_SALT)
+
+
+def redeem_stream_ticket(ticket):
+    """(user, expires_at) for a valid ticket not used before; None otherwise."""
+    try:
+        payload = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=get_ticket_ttl())
+    except signing.BadSignature:
+        return None
+    # Single use, across workers as far as the feature cache is shared
+    if not get_cache().add(f'featureflow:stream-ticket:{payload["nonce"]}', True, get_ticket_ttl()):
+        return None
+    user = get_user_model().objects.filter(pk=payload['user']).first()
+    if user is None or not user.is_active:
+        return None
+    return user, payload['exp']
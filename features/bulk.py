@@ -0,0 +1,249 @@
+"""
+Bulk create, partial update, status change and delete for features.
+
+Every item is validated before anything is written, and nothing is written
+unless all of them pass: errors come back as a list aligned with the request
+items, with ``{}`` for the valid ones. Writes run in one transaction with one
+statement per table: ``bulk_create`` / ``bulk_update`` for features, status
+moves grouped into one conditional UPDATE per transition, and a single batch
+for status changes and activities. Those skip post_save, so the search index
+and response cache are updated here too.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from . import search, signals
+from .activity import activity_log, log_activity
+from .cache import invalidate_feature, invalidate_stats
+from .filters import MAX_ID
+from .models import ChangeSequence, Comment, Feature, FeatureTombstone, StatusChange, STATUS_TRANSITIONS
+from .serializers import FeatureListSerializer
+
+MAX_ITEMS = 500
+
+
+class BulkConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Features changed concurrently.'
+    default_code = 'conflict'
+
+
+def get_items(data, key='items'):
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValidationError({key: ['A non-empty list is required.']})
+    if len(items) > MAX_ITEMS:
+        raise ValidationError({key: [f'At most {MAX_ITEMS} items per request.']})
+    return items
+
+
+def resolve(items):
+    """
+    Load the features the items refer to by `id`, in one query. Returns the
+    feature per item (None where it failed) and the aligned errors.
+    """
+    ids = []
+    errors = []
+    seen = set()
+    for item in items:
+        pk = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(item, dict):
+            error = {'non_field_errors': ['Expected an object.']}
+        elif isinstance(pk, bool) or not isinstance(pk, int) or not 1 <= pk <= MAX_ID:
+            error = {'id': ['A feature id is required.']}
+        elif pk in seen:
+            error = {'id': ['Duplicate feature id.']}
+        else:
+            error = {}
+            seen.add(pk)
+        ids.append(pk if not error else None)
+        errors.append(error)
+    found = Feature.objects.select_related('created_by').in_bulk(seen)
+    features = []
+    for pk, error in zip(ids, errors):
+        if not error and pk not in found:
+            error['id'] = ['Not found.']
+        features.append(found.get(pk))
+    return features, errors
+
+
+def check(errors, key='items'):
+    if any(errors):
+        raise ValidationError({key: errors})
+
+
+def create_features(items, user):
+    """Create features from `items`; returns their ids in request order."""
+    serializers = [FeatureListSerializer(data=item) for item in items]
+    check([{} if serializer.is_valid() else serializer.errors for serializer in serializers])
+    features = [Feature(created_by=user, **serializer.validated_data) for serializer in serializers]
+    with transaction.atomic():
+        change_seq = ChangeSequence.next()
+        for feature in features:
+            feature.change_seq = change_seq
+        Feature.objects.bulk_create(features)
+        search.index_features(features)
+        with activity_log.batch():
+            for feature in features:
+                log_activity(
+                    feature=feature,
+                    user=user,
+                    action='created',
+                    description=f'Created feature: {feature.title}'
+                )
+        invalidate_stats()
+    return [feature.pk for feature in features]
+
+
+def update_features(items, user):
+    """Apply partial updates keyed by `id`; returns the ids in request order."""
+    features, errors = resolve(items)
+    fields = set()
+    for item, feature, error in zip(items, features, errors):
+        if error:
+            continue
+        data = {name: value for name, value in item.items() if name != 'id'}
+        if 'status' in data:
+            # A status move needs a justification and a StatusChange row
+            error['status'] = ['Use /api/features/bulk/status/ to change status.']
+            continue
+        serializer = FeatureListSerializer(feature, data=data, partial=True)
+        if not serializer.is_valid():
+            error.update(serializer.errors)
+            continue
+        for name, value in serializer.validated_data.items():
+            setattr(feature, name, value)
+        fields |= set(serializer.validated_data)
+    check(errors)
+
+    # bulk_update() skips auto_now and Feature.save()
+    now = timezone.now()
+    with transaction.atomic():
+        change_seq = ChangeSequence.next()
+        for feature in features:
+            feature.updated_at = now
+            feature.change_seq = change_seq
+        Feature.objects.bulk_update(features, [*fields, 'updated_at', 'change_seq'])
+        if fields & set(search.FEATURE_TEXT_FIELDS):
+            search.index_features(features)
+        with activity_log.batch():
+            for feature in features:
+                log_activity(
+                    feature=feature,
+                    user=user,
+                    action='updated',
+                    description=f'Updated feature: {feature.title}'
+                )
+        for feature in features:
+            invalidate_feature(feature.pk)
+        invalidate_stats()
+    return [feature.pk for feature in features]
+
+
+def change_statuses(items, user):
+    """
+    Move features to new statuses, under the same rules as change_status.
+    Returns {id, status, updated_at} per item.
+    """
+    features, errors = resolve(items)
+    valid_statuses = [choice[0] for choice in Feature.STATUS_CHOICES]
+    conflicts = 0
+    for item, feature, error in zip(items, features, errors):
+        if error:
+            continue
+        new_status = item.get('status')
+        if not new_status or not item.get('justification'):
+            error['non_field_errors'] = ['Both status and justification are required.']
+        elif new_status not in valid_statuses:
+            error['status'] = [f'Invalid status. Must be one of: {valid_statuses}']
+        elif new_status not in STATUS_TRANSITIONS.get(feature.status, []) and new_status != feature.status:
+            allowed = STATUS_TRANSITIONS.get(feature.status, [])
+            error['status'] = [f'Cannot transition from "{feature.status}" to "{new_status}". Allowed: {allowed}']
+        elif item.get('from_status') and item['from_status'] != feature.status:
+            error['from_status'] = [
+                f'Status changed concurrently: expected "{item["from_status"]}", found "{feature.status}"'
+            ]
+            conflicts += 1
+    # Stale from_status alone is a 409, like change_status; anything else a 400
+    if conflicts and conflicts == sum(1 for error in errors if error):
+        raise BulkConflict({'items': errors})
+    check(errors)
+
+    # One conditional UPDATE per transition; a short count means someone moved
+    # a feature after we read it, so everything is rolled back
+    moves = defaultdict(list)
+    for item, feature in zip(items, features):
+        moves[feature.status, item['status']].append(feature.pk)
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            change_seq = ChangeSequence.next()
+            for (old_status, new_status), pks in moves.items():
+                updated = Feature.objects.filter(pk__in=pks, status=old_status).update(
+                    status=new_status, updated_at=now, change_seq=change_seq
+                )
+                if updated != len(pks):
+                    raise BulkConflict
+            StatusChange.objects.bulk_create([
+                StatusChange(
+                    feature=feature,
+                    changed_by=user,
+                    from_status=feature.status,
+                    to_status=item['status'],
+                    justification=item['justification']
+                )
+                for item, feature in zip(items, features)
+            ])
+            with activity_log.batch():
+                for item, feature in zip(items, features):
+                    log_activity(
+                        feature=feature,
+                        user=user,
+                        action='status_changed',
+                        description=f'Changed status from {feature.status} to {item["status"]}: {item["justification"]}'
+                    )
+            for feature in features:
+                invalidate_feature(feature.pk)
+            invalidate_stats()
+    except BulkConflict:
+        current = dict(Feature.objects.filter(pk__in=[f.pk for f in features]).values_list('pk', 'status'))
+        raise BulkConflict({'items': [
+            {} if current.get(feature.pk) == feature.status else
+            {'from_status': [f'Status changed concurrently: expected "{feature.status}", found "{current.get(feature.pk)}"']}
+            for feature in features
+        ]})
+    return [
+        {'id': feature.pk, 'status': item['status'], 'updated_at': now}
+        for item, feature in zip(items, features)
+    ]
+
+
+def delete_features(ids):
+    """Delete features (and their comments, status changes and activities)."""
+    features, errors = resolve([{'id': pk} for pk in ids])
+    for error in errors:
+        # Report against the list entry rather than a made-up `id` key
+        if 'id' in error:
+            error['non_field_errors'] = error.pop('id')
+    check(errors, key='ids')
+
+    ids = [feature.pk for feature in features]
+    with transaction.atomic():
+        change_seq = ChangeSequence.next()
+        FeatureTombstone.objects.bulk_create(
+            [FeatureTombstone(feature_id=pk, change_seq=change_seq) for pk in ids]
+        )
+        comment_ids = list(Comment.objects.filter(feature__in=ids).values_list('pk', flat=True))
+        # The cascade would otherwise unindex and invalidate row by row
+        with signals.suspended():
+            Feature.objects.filter(pk__in=ids).delete()
+        search.remove_features(ids)
+        search.remove_comments(comment_ids)
+        for pk in ids:
+            invalidate_feature(pk)
+        invalidate_stats()
+    return ids
@@ -0,0 +1,97 @@
+"""
+Versioned response cache for feature reads, on Django's cache framework.
+
+Each feature has a version token in the cache. Cached responses are keyed by
+it, so a write only has to replace the token: old entries are never read
+again and simply expire. Tokens are random rather than counters, so an evicted
+token can never be re-issued and resurrect stale entries.
+
+Writes bump the version twice: immediately, so nobody reads an entry from
+before the write, and again on commit, to drop anything a concurrent reader
+cached from the pre-commit snapshot.
+
+Use a shared backend (file, database, memcached, redis) when running several
+worker processes; a locmem cache is private to its process, so only that
+process sees the bump.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .routing import primary
+
+
+def get_cache():
+    return caches[getattr(settings, 'FEATURE_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'FEATURE_CACHE_TIMEOUT', 300)
+
+
+def version_key(scope):
+    return f'featureflow:version:{scope}'
+
+
+def get_version(scope):
+    cache = get_cache()
+    key = version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope):
+    def bump():
+        get_cache().set(version_key(scope), uuid.uuid4().hex, None)
+    bump()
+    transaction.on_commit(bump)
+
+
+def feature_scope(feature_id):
+    return f'feature:{feature_id}'
+
+
+def invalidate_feature(feature_id):
+    bump_version(feature_scope(feature_id))
+
+
+# Aggregates over every feature (see stats.py)
+STATS_SCOPE = 'stats'
+
+
+def invalidate_stats():
+    bump_version(STATS_SCOPE)
+
+
+def response_key(scope, request):
+    """Cache key for a response: scope version plus everything shaping the body."""
+    variant = '|'.join([request.build_absolute_uri(), request.META.get('HTTP_ACCEPT', '')])
+    digest = hashlib.md5(variant.encode(), usedforsecurity=False).hexdigest()
+    return f'featureflow:response:{scope}:{get_version(scope)}:{digest}'
+
+
+class CachedRetrieveMixin:
+    """
+    Serves retrieve() from the response cache, keyed by the feature version.
+    Only the serialized data is cached; rendering still follows the request.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = response_key(feature_scope(self.kwargs['pk']), request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        # From the primary: this body is served to everyone until the next write
+        with primary():
+            response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, get_timeout())
+        return response
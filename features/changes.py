@@ -0,0 +1,122 @@
+"""
+Change feed for keeping a local copy of the features in sync.
+
+Every feature write stamps the row with the next ``ChangeSequence`` value and
+every delete leaves a ``FeatureTombstone`` stamped the same way. A client
+walks both in (change_seq, id) order from the position in its ``since``
+token: rows past it were created or updated, tombstones past it deleted.
+Only values that can no longer be undercut by a commit are served (see
+``ChangeSequence``), so the token from one page is a safe starting point for
+the next poll. Several rows can share a value (bulk writes take one per
+statement), hence the id in the position.
+
+Tombstones are kept for ``CHANGE_FEED['TOMBSTONE_RETENTION_DAYS']``;
+``prune_tombstones`` (the ``prune_feature_tombstones`` command, run it
+periodically) deletes older ones and remembers how far it got. A token from
+before that point may have missed deletes, so the client syncs from scratch.
+"""
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import ChangeSequence, Feature, FeatureTombstone
+
+# ChangeSequence row holding the change_seq every pruned tombstone is below
+PRUNED = 'tombstones-pruned'
+
+
+def get_retention_days():
+    return getattr(settings, 'CHANGE_FEED', {}).get('TOMBSTONE_RETENTION_DAYS', 90)
+
+
+def encode_token(position):
+    payload = json.dumps(list(position), separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Return the (change_seq, id) position in `token`; raises ValueError."""
+    if not token:
+        return 0, 0
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        change_seq, pk = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError(f'Invalid token {token!r}')
+    if not isinstance(change_seq, int) or not isinstance(pk, int):
+        raise ValueError(f'Invalid token {token!r}')
+    return change_seq, pk
+
+
+def changes_since(position, limit, features=None):
+    """
+    Return (features, deleted ids, next position, has_more) for the first
+    `limit` changes after `position`. `features` is the queryset rows come from.
+    """
+    change_seq, pk = position
+    features = Feature.objects.all() if features is None else features
+    # Read before the rows: everything under it has committed by then
+    visible_below = ChangeSequence.visible_below()
+    settled = Q() if visible_below is None else Q(change_seq__lt=visible_below)
+    updated = list(
+        features.filter(settled, Q(change_seq__gt=change_seq) | Q(change_seq=change_seq, pk__gt=pk))
+        .order_by('change_seq', 'pk')[:limit + 1]
+    )
+    deleted = list(
+        FeatureTombstone.objects
+        .filter(settled, Q(change_seq__gt=change_seq) | Q(change_seq=change_seq, feature_id__gt=pk))
+        .order_by('change_seq', 'feature_id')
+        .values_list('change_seq', 'feature_id')[:limit + 1]
+    )
+
+    # Merge both runs by position and keep the first `limit`
+    changes = sorted(
+        [((row.change_seq, row.pk), row) for row in updated]
+        + [(tombstone, None) for tombstone in deleted],
+        key=lambda change: change[0],
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    next_position = changes[-1][0] if changes else position
+    return (
+        [row for _, row in changes if row is not None],
+        [key[1] for key, row in changes if row is None],
+        next_position,
+        has_more,
+    )
+
+
+def requires_resync(position):
+    """Whether deletes after `position` may have been pruned already."""
+    change_seq, _ = position
+    if not change_seq:
+        return False
+    pruned = ChangeSequence.objects.filter(name=PRUNED).values_list('value', flat=True).first()
+    return pruned is not None and change_seq < pruned
+
+
+def prune_tombstones(days=None):
+    """Delete tombstones older than `days` (default: the retention); returns how many."""
+    days = get_retention_days() if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    with transaction.atomic():
+        pruned = (
+            FeatureTombstone.objects.filter(deleted_at__lt=cutoff)
+            .aggregate(change_seq=Max('change_seq'))['change_seq']
+        )
+        if pruned is None:
+            return 0
+        # Everything below it, so a token at or past it can't have missed any
+        # (the newest old delete stays until the next run)
+        deleted, _ = FeatureTombstone.objects.filter(change_seq__lt=pruned).delete()
+        marker, _ = ChangeSequence.objects.select_for_update().get_or_create(name=PRUNED)
+        if pruned > marker.value:
+            marker.value = pruned
+            marker.save(update_fields=['value'])
+    return deleted
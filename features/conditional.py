@@ -0,0 +1,62 @@
+"""
+Conditional GET (ETag / Last-Modified) for read endpoints.
+
+Validators come from one small aggregate query (latest updated_at, newest
+activity id, row counts, ...) instead of the serialized body, so a matching
+If-None-Match is answered with a 304 before any serialization happens.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(request, *parts):
+    """
+    Weak ETag over the validator parts and everything else that shapes the
+    body: the full path (filters, fields, page) and the negotiated format.
+    """
+    key = '|'.join(str(part) for part in (request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), *parts))
+    return 'W/"%s"' % hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+class ConditionalReadMixin:
+    """
+    Adds ETag / Last-Modified to list and retrieve and short-circuits them
+    with 304 Not Modified. Views implement get_list_validators() and
+    get_object_validators(), each returning (etag_parts, last_modified) or
+    None to skip conditional handling.
+    """
+
+    def get_list_validators(self, request):
+        return None
+
+    def get_object_validators(self, request):
+        return None
+
+    def conditional(self, request, validators, handler, *args, **kwargs):
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        parts, last_modified = validators
+        etag = make_etag(request, *parts)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        elif response.status_code != 304:
+            return response
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(timestamp)
+        # Browsers revalidate on every navigation and reuse the body on 304
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization', 'Accept'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, self.get_list_validators(request), super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, self.get_object_validators(request), super().retrieve, *args, **kwargs)
@@ -0,0 +1,135 @@
+"""
+Denormalized per-feature counters: ``comment_count``, one count per comment
+tag and ``last_activity_at``.
+
+They are moved with ``F()`` updates in the transaction that writes the
+comment or activity (see the handlers in signals.py), so lists can show and
+sort by them without joining. Each update also takes a new change sequence
+value, since the counters are part of what the change feed serves.
+
+Rows written around the ORM's save/delete (``bulk_create``, ``update()``,
+raw SQL) leave the counters behind; ``rebuild()`` recomputes them, as does
+``python manage.py repair_feature_counters``.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, DateTimeField, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .cache import invalidate_feature
+from .models import Activity, ChangeSequence, Comment, Feature
+
+TAG_FIELDS = {tag: f'{tag}_comment_count' for tag, _ in Comment.TAG_CHOICES}
+
+COUNTER_FIELDS = ['comment_count', *TAG_FIELDS.values(), 'last_activity_at']
+
+
+def comments_changed(removed=(), added=()):
+    """
+    Count comments that went away and ones that appeared, each given as
+    (feature id, tag) pairs; a retagged comment is in both.
+    """
+    deltas = defaultdict(Counter)
+    for feature_id, tag in removed:
+        deltas[feature_id][tag] -= 1
+    for feature_id, tag in added:
+        deltas[feature_id][tag] += 1
+    updates = {}
+    for feature_id, tags in deltas.items():
+        changes = {TAG_FIELDS[tag]: F(TAG_FIELDS[tag]) + delta for tag, delta in tags.items() if delta}
+        total = sum(tags.values())
+        if total:
+            changes['comment_count'] = F('comment_count') + total
+        if changes:
+            updates[feature_id] = changes
+    if not updates:
+        return
+    with transaction.atomic(savepoint=False):
+        change_seq = ChangeSequence.next()
+        for feature_id, changes in updates.items():
+            Feature.objects.filter(pk=feature_id).update(**changes, change_seq=change_seq)
+
+
+def activities_written(activities, batch_size=500):
+    """Move last_activity_at forward to the newest of `activities` per feature."""
+    newest = {}
+    for activity in activities:
+        if activity.feature_id not in newest or activity.created_at > newest[activity.feature_id]:
+            newest[activity.feature_id] = activity.created_at
+    if not newest:
+        return
+    items = list(newest.items())
+    with transaction.atomic(savepoint=False):
+        change_seq = ChangeSequence.next()
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            created_at = Case(
+                *[When(pk=feature_id, then=Value(value)) for feature_id, value in batch],
+                output_field=DateTimeField(),
+            )
+            # Greatest: a writer that flushes late never moves it backwards
+            Feature.objects.filter(pk__in=[feature_id for feature_id, _ in batch]).update(
+                last_activity_at=Greatest(F('last_activity_at'), created_at),
+                change_seq=change_seq,
+            )
+
+
+def expected_counters():
+    """Expressions for the true counter values of the outer feature row."""
+    comments = Comment.objects.filter(feature=OuterRef('pk')).order_by().values('feature')
+
+    def count(**filters):
+        counted = comments.filter(**filters).annotate(count=Count('pk')).values('count')
+        return Coalesce(Subquery(counted), 0)
+
+    newest_activity = (
+        Activity.objects.filter(feature=OuterRef('pk'))
+        .order_by('-created_at').values('created_at')[:1]
+    )
+    return {
+        'comment_count': count(),
+        **{field: count(tag=tag) for tag, field in TAG_FIELDS.items()},
+        # Features without activities count as active when created
+        'last_activity_at': Coalesce(Subquery(newest_activity), F('created_at')),
+    }
+
+
+def rebuild(ids=None, batch_size=1000):
+    """
+    Recompute the counters of features `ids` (all of them by default) and
+    return how many were wrong. Only those are written, so features that
+    were right keep their place in the change feed.
+    """
+    if ids is not None:
+        ids = list(ids)
+        return sum(rebuild_batch(ids[start:start + batch_size]) for start in range(0, len(ids), batch_size))
+    repaired = 0
+    last = 0
+    while True:
+        batch = list(Feature.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return repaired
+        repaired += rebuild_batch(batch)
+        last = batch[-1]
+
+
+def rebuild_batch(ids):
+    expected = expected_counters()
+    drifted = Q()
+    for field in COUNTER_FIELDS:
+        drifted |= ~Q(**{field: F(f'expected_{field}')})
+    stale = list(
+        Feature.objects.filter(pk__in=ids)
+        .annotate(**{f'expected_{field}': value for field, value in expected.items()})
+        .filter(drifted)
+        .values_list('pk', flat=True)
+    )
+    if not stale:
+        return 0
+    with transaction.atomic():
+        change_seq = ChangeSequence.next()
+        Feature.objects.filter(pk__in=stale).update(**expected_counters(), change_seq=change_seq)
+    for pk in stale:
+        invalidate_feature(pk)
+    return len(stale)
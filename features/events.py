@@ -0,0 +1,226 @@
+"""
+Live activity events for Server-Sent Events streams.
+
+Subscribers are asyncio queues owned by the event loop serving their stream;
+publishers run in ordinary request threads and hand events over with
+``call_soon_threadsafe``, so one coroutine per open stream is all it costs.
+Each event is rendered to its SSE frame once, when published.
+
+``settings.EVENT_STREAM['BACKEND']`` picks where events come from:
+
+``local`` (default)
+    Activities are published by the process that writes them, once their
+    transaction commits. Streams only see writes made by their own process,
+    which is enough for a single worker.
+
+``database``
+    Every process polls the activity table once per ``POLL_INTERVAL`` while it
+    has subscribers and publishes what is new, so streams see writes from all
+    workers for one small query per process instead of one per client.
+
+A subscriber that falls ``QUEUE_SIZE`` events behind is disconnected; the
+browser reconnects with ``Last-Event-ID`` and the stream replays what it
+missed from the database.
+"""
+import asyncio
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Activity
+from .serializers import ActivitySerializer
+
+# Subscribers to every feature
+ALL = None
+
+# Put on a subscriber's queue when it fell too far behind
+OVERFLOW = object()
+
+
+def render(activities):
+    """(feature id, (activity id, SSE frame)) per activity."""
+    data = ActivitySerializer(activities, many=True).data
+    return [
+        (row['feature'], (row['id'], f'id: {row["id"]}\nevent: activity\ndata: {json.dumps(row)}\n\n'))
+        for row in data
+    ]
+
+
+class Subscription:
+    def __init__(self, broker, feature_id, queue_size):
+        self.broker = broker
+        self.feature_id = feature_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on the subscriber's loop
+        if self.overflowed:
+            return
+        if self.queue.full():
+            # Drop everything undelivered so the client's Last-Event-ID is
+            # the last event it really saw, and the replay picks up from there
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+            self.overflowed = True
+            self.broker.unsubscribe(self)
+        else:
+            self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """The next (activity id, frame), None on timeout, or OVERFLOW."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._topics = {}
+
+    def subscribe(self, feature_id=ALL):
+        subscription = Subscription(self, feature_id, self.queue_size)
+        with self._lock:
+            self._topics.setdefault(feature_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._topics.get(subscription.feature_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._topics.pop(subscription.feature_id, None)
+
+    def publish(self, events):
+        """Deliver rendered events to their subscribers; safe from any thread."""
+        with self._lock:
+            targets = [
+                (subscription, event)
+                for feature_id, event in events
+                for topic in (feature_id, ALL)
+                for subscription in self._topics.get(topic, ())
+            ]
+        for subscription, event in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has closed
+                self.unsubscribe(subscription)
+
+    def activities_written(self, activities):
+        if not self._topics:
+            return
+        events = render(activities)
+        transaction.on_commit(lambda: self.publish(events))
+
+
+class DatabaseBroker(LocalBroker):
+    def __init__(self, queue_size=100, poll_interval=1.0, batch_size=500):
+        super().__init__(queue_size)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._pollers = {}
+
+    def subscribe(self, feature_id=ALL):
+        subscription = super().subscribe(feature_id)
+        # One poller per event loop, running while the loop has subscribers
+        loop = subscription.loop
+        if loop not in self._pollers or self._pollers[loop].done():
+            self._pollers[loop] = loop.create_task(self.poll(loop))
+        return subscription
+
+    def activities_written(self, activities):
+        # Every process, including this one, picks them up by polling
+        pass
+
+    def has_subscribers(self, loop):
+        with self._lock:
+            return any(s.loop is loop for subscribers in self._topics.values() for s in subscribers)
+
+    async def poll(self, loop):
+        # Ids that commit out of order with a gap longer than the interval
+        # can be passed over; clients resume by id, so they are too
+        last_id = (await Activity.objects.aaggregate(last=Max('pk')))['last'] or 0
+        while self.has_subscribers(loop):
+            await asyncio.sleep(self.poll_interval)
+            queryset = Activity.objects.select_related('user').filter(pk__gt=last_id).order_by('pk')
+            activities = [activity async for activity in queryset[:self.batch_size]]
+            if activities:
+                last_id = activities[-1].pk
+                self.publish(render(activities))
+
+
+BACKENDS = {
+    'local': LocalBroker,
+    'database': DatabaseBroker,
+}
+
+
+def get_broker():
+    options = getattr(settings, 'EVENT_STREAM', {})
+    backend = options.get('BACKEND', 'local')
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown event stream backend {backend!r}; choose from {list(BACKENDS)}')
+    if backend == 'database':
+        return DatabaseBroker(
+            queue_size=options.get('QUEUE_SIZE', 100),
+            poll_interval=options.get('POLL_INTERVAL', 1.0),
+        )
+    return LocalBroker(queue_size=options.get('QUEUE_SIZE', 100))
+
+
+broker = get_broker()
+
+
+async def stream(subscription, last_event_id=None, keepalive=15, replay_limit=500, expires_at=None):
+    """
+    SSE body for a subscription: activities after `last_event_id` from the
+    database first, `replay_limit` per query, then live ones, with a comment
+    line every `keepalive` seconds so proxies keep the connection open. Ends
+    at `expires_at` (epoch seconds), when the client's credentials run out.
+    """
+    try:
+        yield 'retry: 3000\n\n'
+        replayed = 0
+        if last_event_id is not None:
+            # Subscribed before reading, so nothing falls between the two;
+            # live events the replay already covered are skipped below
+            queryset = Activity.objects.select_related('user').filter(pk__gt=last_event_id).order_by('pk')
+            if subscription.feature_id is not ALL:
+                queryset = queryset.filter(feature_id=subscription.feature_id)
+            # Page through all of them: the client's Last-Event-ID moves past
+            # whatever is sent, so anything skipped here is lost for good
+            replayed = last_event_id
+            while True:
+                missed = [activity async for activity in queryset.filter(pk__gt=replayed)[:replay_limit]]
+                for _, (activity_id, frame) in render(missed):
+                    replayed = activity_id
+                    yield frame
+                if len(missed) < replay_limit:
+                    break
+        while True:
+            timeout = keepalive
+            if expires_at is not None:
+                timeout = min(keepalive, expires_at - time.time())
+                if timeout <= 0:
+                    return
+            event = await subscription.get(timeout)
+            if event is None:
+                if expires_at is not None and time.time() >= expires_at:
+                    return
+                yield ': keepalive\n\n'
+            elif event is OVERFLOW:
+                return
+            elif event[0] > replayed:
+                yield event[1]
+    finally:
+        subscription.broker.unsubscribe(subscription)
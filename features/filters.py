@@ -0,0 +1,131 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .models import Feature
+from .search import matching_features
+
+# Largest value a 64-bit signed integer column (and SQLite bind) accepts
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_id(raw):
+    """
+    Parse a non-negative integer id from a query parameter or header, or
+    return None. Only ASCII digits are accepted and values must fit the
+    database's 64-bit integer columns.
+    """
+    if not raw or not (raw.isascii() and raw.isdecimal()):
+        return None
+    value = int(raw)
+    return value if value <= MAX_ID else None
+
+
+def parse_choices(request, param, choices):
+    """Parse a comma-separated list of choice values, rejecting unknown ones."""
+    raw = request.query_params.get(param)
+    if not raw:
+        return None
+    values = [value for value in raw.split(',') if value]
+    valid = [choice[0] for choice in choices]
+    invalid = [value for value in values if value not in valid]
+    if invalid:
+        raise ValidationError({param: f'Invalid value(s) {invalid}. Must be one of: {valid}'})
+    return values
+
+
+def parse_bound(request, param, end_of_day=False):
+    """
+    Parse an ISO date or datetime query parameter into an aware datetime.
+
+    Bare dates become midnight (of the following day when end_of_day is set)
+    so the comparison stays on the raw column and can use its index.
+    """
+    raw = request.query_params.get(param)
+    if not raw:
+        return None
+    try:
+        day = parse_date(raw)
+        if day is not None:
+            if end_of_day:
+                day += timedelta(days=1)
+            value = datetime.combine(day, time.min)
+        else:
+            value = parse_datetime(raw)
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({param: 'Must be an ISO 8601 date or datetime.'})
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+class FeatureFilter(BaseFilterBackend):
+    """
+    Query-parameter filters for the features endpoint, applied in SQL.
+
+    Supported: status, complexity (comma-separated), created_by (user id),
+    created_after / created_before (ISO date or datetime, a bare
+    created_before date is inclusive), min_priority and search. search
+    matches feature text and comments through the full-text index (see
+    search.py), or the creator's exact username, rather than scanning the
+    text columns. Ordering is handled by StableOrderingFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        statuses = parse_choices(request, 'status', Feature.STATUS_CHOICES)
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+
+        complexities = parse_choices(request, 'complexity', Feature.COMPLEXITY_CHOICES)
+        if complexities:
+            queryset = queryset.filter(complexity__in=complexities)
+
+        created_by = request.query_params.get('created_by')
+        if created_by:
+            user_id = parse_id(created_by)
+            if user_id is None:
+                raise ValidationError({'created_by': 'Must be a user id.'})
+            queryset = queryset.filter(created_by_id=user_id)
+
+        created_after = parse_bound(request, 'created_after')
+        if created_after:
+            queryset = queryset.filter(created_at__gte=created_after)
+
+        created_before = parse_bound(request, 'created_before', end_of_day=True)
+        if created_before:
+            queryset = queryset.filter(created_at__lt=created_before)
+
+        min_priority = request.query_params.get('min_priority')
+        if min_priority not in (None, ''):
+            try:
+                min_priority = float(min_priority)
+            except ValueError:
+                raise ValidationError({'min_priority': 'Must be a number.'})
+            queryset = queryset.filter(priority_score__gte=min_priority)
+
+        text = request.query_params.get('search', '').strip()
+        if text:
+            queryset = queryset.filter(matching_features(text) | Q(created_by__username=text))
+        return queryset
+
+
+class StableOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter that breaks ties on id so pages never overlap,
+    matching the trailing id column on our composite indexes.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        ordering = list(ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
@@ -0,0 +1,61 @@
+"""
+Bounded thread pool for password hashing in async views.
+
+PBKDF2 is deliberately slow (hundreds of milliseconds at Django's default
+iterations) and holds the thread running it. Async login and register hand
+it to this pool instead, so the event loop and the thread that runs sync
+views stay free for other requests while a burst of logins is hashed.
+
+``settings.PASSWORD_HASHING`` sizes it: ``WORKERS`` threads hash at once and
+at most ``MAX_PENDING`` jobs (running or queued) are accepted. Beyond that
+``run()`` raises ``HashingBusy`` right away, so the client gets a 503 rather
+than a queue that grows without bound.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins in progress, try again shortly.'
+    default_code = 'hashing_busy'
+    # Sent as Retry-After
+    wait = 1
+
+
+class HashingPool:
+    def __init__(self, workers=4, max_pending=32):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        options = getattr(settings, 'PASSWORD_HASHING', {})
+        return cls(workers=options.get('WORKERS', 4), max_pending=options.get('MAX_PENDING', 32))
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hashing')
+            return self._executor
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` on the pool; raises HashingBusy when it is full."""
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        future = self.executor.submit(fn, *args)
+        # Freed when the job ends, even if the request awaiting it is cancelled
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+
+pool = HashingPool.from_settings()
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from features import transfer
+
+
+class Command(BaseCommand):
+    help = 'Stream features with their comments, status changes and activities as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-', help='File to write, or - for stdout')
+        parser.add_argument('--format', choices=list(transfer.FORMATS),
+                            help='Defaults to csv for .csv files, else ndjson')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['output']
+        output_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        chunks = transfer.render(transfer.export_records(chunk_size=options['chunk_size']), output_format)
+
+        if path == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        count = -1 if output_format == 'csv' else 0  # CSV starts with a header
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            for chunk in chunks:
+                output.write(chunk)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f'Exported {count} records to {path}'))
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from features import transfer
+
+
+class Command(BaseCommand):
+    help = 'Import an NDJSON or CSV export, giving every row a new id and remapping references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='File to read, or - for stdin')
+        parser.add_argument('--format', choices=list(transfer.FORMATS),
+                            help='Defaults to csv for .csv files, else ndjson')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['input']
+        input_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        importer = transfer.Importer(batch_size=options['batch_size'])
+
+        source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            # All or nothing: a bad record rolls back everything before it
+            with transaction.atomic():
+                counts = importer.run(transfer.parse(source, input_format))
+        except transfer.TransferError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        summary = ', '.join(f'{count} {record_type}' for record_type, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Imported {summary}'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from features import changes
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed tombstones older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Keep this many days (default: CHANGE_FEED['TOMBSTONE_RETENTION_DAYS'])")
+
+    def handle(self, *args, **options):
+        pruned = changes.prune_tombstones(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} tombstones'))
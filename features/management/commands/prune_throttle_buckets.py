@@ -0,0 +1,13 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from features.throttling import DatabaseThrottleStore
+
+
+class Command(BaseCommand):
+    help = 'Delete rate limit buckets that have refilled, left behind by idle clients'
+
+    def handle(self, *args, **options):
+        pruned = DatabaseThrottleStore().prune(time.time())
+        self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} throttle buckets'))
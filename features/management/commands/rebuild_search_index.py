@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from features import search
+from features.models import Comment, Feature
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for features and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        if backend is None:
+            raise CommandError('The default database has no full-text search backend')
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            backend.clear()
+            features = Feature.objects.only(*search.FEATURE_TEXT_FIELDS).order_by()
+            feature_count = self.index(backend, features, search.feature_document, batch_size)
+            comments = Comment.objects.only('feature_id', 'content').order_by()
+            comment_count = self.index(backend, comments, search.comment_document, batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {feature_count} features and {comment_count} comments'
+        ))
+
+    def index(self, backend, queryset, to_document, batch_size):
+        count = 0
+        batch = []
+        for obj in queryset.iterator(chunk_size=batch_size):
+            batch.append(to_document(obj))
+            if len(batch) >= batch_size:
+                backend.upsert(batch)
+                count += len(batch)
+                batch = []
+        backend.upsert(batch)
+        return count + len(batch)
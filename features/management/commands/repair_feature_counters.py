@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from features import counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the comment counters and last activity time of every feature'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        repaired = counters.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Repaired counters on {repaired} features'))
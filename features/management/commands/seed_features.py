@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from features import seeding
+
+
+class Command(BaseCommand):
+    help = 'Generate realistic features, comments, status histories and activities for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--features', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=50,
+                            help='Seed users (seed-user-N) that create and discuss the features')
+        parser.add_argument('--comments', type=float, default=5, help='Mean comments per feature')
+        parser.add_argument('--activities', type=float, default=10, help='Mean activities per feature')
+        parser.add_argument('--days', type=int, default=365, help='Spread timestamps over this many days')
+        parser.add_argument('--password', default='featureflow-seed', help='Password of every seed user')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--no-search-index', action='store_true',
+                            help='Skip the search index (rebuild it later with rebuild_search_index)')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        started = time.monotonic()
+
+        def progress(totals):
+            self.stdout.write(f"{totals['features']}/{options['features']} features", ending='\r')
+            self.stdout.flush()
+
+        totals = seeding.seed(
+            options['features'],
+            users=options['users'],
+            comments=options['comments'],
+            activities=options['activities'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            password=options['password'],
+            index_search=not options['no_search_index'],
+            progress=progress if options['verbosity'] else None,
+        )
+        summary = ', '.join(f'{count} {name.replace("_", " ")}' for name, count in totals.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary} in {time.monotonic() - started:.1f}s'))
@@ -0,0 +1,265 @@
+"""
+Per-request timings, a Server-Timing header and Prometheus histograms.
+
+``MetricsMiddleware`` gives each request a ``RequestMetrics`` through a
+context variable, which async views' thread hops carry along. Three things
+fill it in:
+
+* every database connection runs queries through ``record_query`` (installed
+  by the ``connection_created`` handler in signals.py): SQL count and time;
+* ``TimedSerializerMixin`` on the API serializers: time in to_representation;
+* ``CachedJWTAuthentication.authenticate``: time spent authenticating.
+
+Serialization and auth times leave out the SQL run inside them, so ``db``,
+``serialize`` and ``auth`` never overlap. The response carries them as
+``Server-Timing: auth;dur=.., db;dur=..;desc="N queries", serialize;dur=..,
+total;dur=..`` (milliseconds), and they are added to per-endpoint
+histograms served by ``/api/metrics/`` in the Prometheus text format.
+Endpoints are URL names, so ids don't multiply the series. Each process
+keeps its own histograms; scrape every worker.
+
+``settings.METRICS``: ``ENABLED`` (the middleware removes itself when off),
+``TOKEN`` (bearer token /api/metrics/ requires; without one it is for
+staff users only),
+``SLOW_REQUEST_MS`` (log requests slower than this to the ``features.metrics``
+logger with their slowest queries; 0 turns it off) and
+``SLOW_REQUEST_QUERIES`` (how many of those queries).
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('featureflow_request_metrics', default=None)
+
+# Statements kept per request for the slow-request log
+MAX_RECORDED_QUERIES = 200
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def get_options():
+    return getattr(settings, 'METRICS', {})
+
+
+class RequestMetrics:
+    def __init__(self, keep_queries=False):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.timings = {'auth': 0.0, 'serialize': 0.0}
+        self.active = set()
+        self.queries = [] if keep_queries else None
+
+    def add_query(self, sql, duration):
+        self.sql_count += 1
+        self.sql_time += duration
+        if self.queries is not None and len(self.queries) < MAX_RECORDED_QUERIES:
+            self.queries.append((duration, sql))
+
+    def server_timing(self, total):
+        return ', '.join([
+            f"auth;dur={self.timings['auth'] * 1000:.2f}",
+            f'db;dur={self.sql_time * 1000:.2f};desc="{self.sql_count} queries"',
+            f"serialize;dur={self.timings['serialize'] * 1000:.2f}",
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper: adds the query to the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+@contextmanager
+def timed(name):
+    """Add the block's time, less its SQL, to the current request's `name`."""
+    metrics = _current.get()
+    # Nested blocks (a serializer inside a serializer) count once
+    if metrics is None or name in metrics.active:
+        yield
+        return
+    metrics.active.add(name)
+    started, sql_before = time.perf_counter(), metrics.sql_time
+    try:
+        yield
+    finally:
+        metrics.active.discard(name)
+        elapsed = time.perf_counter() - started - (metrics.sql_time - sql_before)
+        metrics.timings[name] += max(0.0, elapsed)
+
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # Labels -> [count per bucket (not cumulative)..., +Inf count, sum]
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip([*self.buckets, '+Inf'], series):
+                cumulative += count
+                bucket_labels = format_labels([*labels, ('le', bound)])
+                lines.append(f'{self.name}_bucket{{{bucket_labels}}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{format_labels(labels)}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{format_labels(labels)}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.series = {}
+
+    def increment(self, labels):
+        self.series[labels] = self.series.get(labels, 0) + 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{format_labels(labels)}}} {value}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = Counter('featureflow_requests_total', 'Requests by endpoint and status code.')
+            self.histograms = {
+                'total': Histogram('featureflow_request_duration_seconds', 'Time to produce the response.',
+                                   DURATION_BUCKETS),
+                'db': Histogram('featureflow_request_db_seconds', 'Time in SQL queries per request.',
+                                DURATION_BUCKETS),
+                'serialize': Histogram('featureflow_request_serialize_seconds',
+                                       'Time in serializers per request, less their SQL.', DURATION_BUCKETS),
+                'auth': Histogram('featureflow_request_auth_seconds',
+                                  'Time authenticating per request, less its SQL.', DURATION_BUCKETS),
+                'queries': Histogram('featureflow_request_db_queries', 'SQL queries per request.', QUERY_BUCKETS),
+            }
+
+    def observe(self, method, endpoint, status, metrics, total):
+        labels = (('method', method), ('endpoint', endpoint))
+        with self.lock:
+            self.requests.increment((*labels, ('status', str(status))))
+            self.histograms['total'].observe(labels, total)
+            self.histograms['db'].observe(labels, metrics.sql_time)
+            self.histograms['serialize'].observe(labels, metrics.timings['serialize'])
+            self.histograms['auth'].observe(labels, metrics.timings['auth'])
+            self.histograms['queries'].observe(labels, metrics.sql_count)
+
+    def render(self):
+        with self.lock:
+            lines = self.requests.render()
+            for histogram in self.histograms.values():
+                lines.extend(histogram.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_options().get('ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def start(self):
+        metrics = RequestMetrics(keep_queries=bool(get_options().get('SLOW_REQUEST_MS')))
+        return metrics, _current.set(metrics)
+
+    def finish(self, request, response, metrics):
+        # Streaming bodies are produced later and aren't included
+        total = time.perf_counter() - metrics.started
+        response['Server-Timing'] = metrics.server_timing(total)
+        endpoint = endpoint_name(request)
+        registry.observe(request.method, endpoint, response.status_code, metrics, total)
+        slow_ms = get_options().get('SLOW_REQUEST_MS')
+        if slow_ms and total * 1000 >= slow_ms:
+            self.log_slow_request(request, endpoint, metrics, total)
+        return response
+
+    def log_slow_request(self, request, endpoint, metrics, total):
+        slowest = sorted(metrics.queries, key=lambda query: query[0], reverse=True)
+        slowest = slowest[:get_options().get('SLOW_REQUEST_QUERIES', 10)]
+        logger.warning(
+            'Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms, serialize %.1f ms, auth %.1f ms%s',
+            request.method, request.get_full_path(), endpoint, total * 1000,
+            metrics.sql_count, metrics.sql_time * 1000,
+            metrics.timings['serialize'] * 1000, metrics.timings['auth'] * 1000,
+            ''.join(f'\n  {duration * 1000:.1f} ms: {sql}' for duration, sql in slowest),
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:18
+
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('features', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feature',
+            name='priority_score',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('business_value'), '*', models.Value(2)), '-', models.F('effort')), '-', models.F('risk')), '/', models.Value(2.0)), output_field=models.FloatField()),
+        ),
+        migrations.AddIndex(
+            model_name='feature',
+            index=models.Index(fields=['-priority_score', '-id'], name='feature_priority_idx'),
+        ),
+    ]
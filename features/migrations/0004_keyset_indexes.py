@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('features', '0003_feature_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['feature', '-created_at', '-id'], name='activity_feature_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['feature', 'created_at', 'id'], name='comment_feature_created_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Full-text index tables are vendor specific and not modelled by the ORM;
+# see features/search.py for the code that reads and writes them.
+CREATE_SQL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS features_searchdocument USING fts5("
+        "feature_id UNINDEXED, title, body, tokenize='porter unicode61')",
+    ],
+    'postgresql': [
+        'CREATE TABLE IF NOT EXISTS features_searchdocument ('
+        'id bigint PRIMARY KEY, feature_id bigint NOT NULL, document tsvector NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS features_searchdocument_document_idx '
+        'ON features_searchdocument USING GIN (document)',
+        'CREATE INDEX IF NOT EXISTS features_searchdocument_feature_idx '
+        'ON features_searchdocument (feature_id)',
+    ],
+}
+
+
+def create_search_index(apps, schema_editor):
+    for sql in CREATE_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SQL:
+        schema_editor.execute('DROP TABLE IF EXISTS features_searchdocument')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('features', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
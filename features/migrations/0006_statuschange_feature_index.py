@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('features', '0005_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='statuschange',
+            index=models.Index(fields=['feature', '-created_at', '-id'], name='statuschange_feature_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:21
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+TAGS = ['question', 'idea', 'risk', 'agreement']
+
+
+def fill_counters(apps, schema_editor):
+    Feature = apps.get_model('features', 'Feature')
+    Comment = apps.get_model('features', 'Comment')
+    Activity = apps.get_model('features', 'Activity')
+    comments = Comment.objects.filter(feature=OuterRef('pk')).order_by().values('feature')
+
+    def count(**filters):
+        return Coalesce(Subquery(comments.filter(**filters).annotate(count=Count('pk')).values('count')), 0)
+
+    newest_activity = Activity.objects.filter(feature=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+    Feature.objects.update(
+        comment_count=count(),
+        last_activity_at=Coalesce(Subquery(newest_activity), F('created_at')),
+        **{f'{tag}_comment_count': count(tag=tag) for tag in TAGS},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('features', '0007_change_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feature',
+            name='agreement_comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='feature',
+            name='comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='feature',
+            name='idea_comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='feature',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='feature',
+            name='question_comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='feature',
+            name='risk_comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='feature',
+            index=models.Index(fields=['-comment_count', '-id'], name='feature_comment_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feature',
+            index=models.Index(fields=['-last_activity_at', '-id'], name='feature_last_activity_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('features', '0009_throttle_bucket'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='featuretombstone',
+            name='feature_id',
+            field=models.BigIntegerField(unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='featuretombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ),
+    ]
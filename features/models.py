@@ -1,8 +1,18 @@
-from django.db import models
+from django.db import connections, models, router, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+STATUS_TRANSITIONS = {
+    'proposed': ['under_discussion', 'approved'],
+    'under_discussion': ['proposed', 'approved', 'in_progress'],
+    'approved': ['in_progress', 'under_discussion'],
+    'in_progress': ['done', 'approved'],
+    'done': ['in_progress'],  # Allow reopening
+}
+
+
 class Feature(models.Model):
     COMPLEXITY_CHOICES = [
         ('low', 'Low'),
@@ -42,15 +52,50 @@ class Feature(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
-    @property
-    def priority_score(self):
-        return round((self.business_value * 2 - self.effort - self.risk) / 2, 1)
+    # Stored by the database so the API can filter and sort on it with an index
+    priority_score = models.GeneratedField(
+        expression=(models.F('business_value') * 2 - models.F('effort') - models.F('risk')) / 2.0,
+        output_field=models.FloatField(),
+        db_persist=True,
+    )
+    
+    # Position in the change feed (see ChangeSequence); every write takes a new one
+    change_seq = models.BigIntegerField(default=0, editable=False)
+    
+    # Denormalized from comments and activities (see counters.py)
+    comment_count = models.IntegerField(default=0, editable=False)
+    question_comment_count = models.IntegerField(default=0, editable=False)
+    idea_comment_count = models.IntegerField(default=0, editable=False)
+    risk_comment_count = models.IntegerField(default=0, editable=False)
+    agreement_comment_count = models.IntegerField(default=0, editable=False)
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        # Each list filter leads a composite index that also serves the
+        # default ordering, so filtered pages are an index range scan
+        indexes = [
+            models.Index(fields=['-priority_score', '-id'], name='feature_priority_idx'),
+            models.Index(fields=['-created_at', '-id'], name='feature_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='feature_status_created_idx'),
+            models.Index(fields=['complexity', '-created_at', '-id'], name='feature_complexity_created_idx'),
+            models.Index(fields=['created_by', '-created_at', '-id'], name='feature_creator_created_idx'),
+            models.Index(fields=['updated_at'], name='feature_updated_idx'),
+            models.Index(fields=['change_seq', 'id'], name='feature_change_seq_idx'),
+            models.Index(fields=['-comment_count', '-id'], name='feature_comment_count_idx'),
+            models.Index(fields=['-last_activity_at', '-id'], name='feature_last_activity_idx'),
+        ]
     
     def __str__(self):
         return self.title
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.change_seq = ChangeSequence.next()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'change_seq'}
+            super().save(*args, **kwargs)
 
 
 class Comment(models.Model):
@@ -69,9 +114,17 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['feature', 'created_at', 'id'], name='comment_feature_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.tag}: {self.content[:50]}"
+    
+    def save(self, *args, **kwargs):
+        # The signal handlers move the feature's counters; keep them in step
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 
 class StatusChange(models.Model):
@@ -84,6 +137,9 @@ class StatusChange(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['feature', '-created_at', '-id'], name='statuschange_feature_idx'),
+        ]
     
     def __str__(self):
         return f"{self.feature.title}: {self.from_status} -> {self.to_status}"
@@ -101,11 +157,100 @@ class Activity(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     description = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: queued entries keep the time they were logged
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Activities'
+        indexes = [
+            models.Index(fields=['feature', '-created_at', '-id'], name='activity_feature_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} {self.action} on {self.feature.title}"
+
+
+class ChangeSequence(models.Model):
+    """
+    Counter behind Feature.change_seq and FeatureTombstone.change_seq.
+    
+    A client that has seen N must never miss a change numbered at or below N
+    that commits later. On SQLite, which runs one writer at a time anyway,
+    taking a value locks this row until the transaction ends, so values are
+    handed out in commit order. On PostgreSQL that row would serialize every
+    writer, so the value is the transaction id instead (plus the counter's
+    last value, so it stays above the numbers handed out before), which takes
+    no lock; the feed then only shows values below the oldest transaction
+    still running (see visible_below). Either way, take it before touching
+    feature rows, and inside the transaction that writes them.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    
+    @classmethod
+    def next(cls, name='feature'):
+        connection = connections[router.db_for_write(cls)]
+        if connection.vendor == 'postgresql':
+            return cls.transaction_value(connection, 'pg_current_xact_id()', name)
+        if not cls.objects.filter(name=name).update(value=models.F('value') + 1):
+            cls.objects.get_or_create(name=name)
+            cls.objects.filter(name=name).update(value=models.F('value') + 1)
+        return cls.objects.filter(name=name).values_list('value', flat=True).get()
+    
+    @classmethod
+    def visible_below(cls, name='feature'):
+        """
+        Values below this belong to finished transactions, so no row or
+        tombstone can still appear under it; None when that holds for every
+        value handed out.
+        """
+        connection = connections[router.db_for_read(cls)]
+        if connection.vendor == 'postgresql':
+            return cls.transaction_value(connection, 'pg_snapshot_xmin(pg_current_snapshot())', name)
+        return None
+    
+    @classmethod
+    def transaction_value(cls, connection, xid, name):
+        # xid8 (PostgreSQL 13+) counts from the cluster's start and never wraps
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {xid}::text::bigint + COALESCE('
+                f'(SELECT value FROM {connection.ops.quote_name(cls._meta.db_table)} WHERE name = %s), 0)',
+                [name]
+            )
+            return cursor.fetchone()[0]
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class FeatureTombstone(models.Model):
+    """Marks a deleted feature in the change feed (see changes.prune_tombstones)."""
+    feature_id = models.BigIntegerField(unique=True)
+    change_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['change_seq', 'feature_id'], name='tombstone_change_seq_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Deleted feature {self.feature_id}"
+
+
+class ThrottleBucket(models.Model):
+    """Rate limit state for one throttle key (see throttling.DatabaseThrottleStore)."""
+    key = models.CharField(max_length=255, primary_key=True)
+    # Theoretical arrival time, in epoch seconds
+    tat = models.FloatField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['tat'], name='throttle_tat_idx'),
+        ]
+    
+    def __str__(self):
+        return self.key
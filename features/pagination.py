@@ -0,0 +1,245 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework import pagination
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .filters import MAX_ID
+
+
+def cursor_url(url, position, reverse=False):
+    """
+    Return `url` with a keyset cursor for `position`, the sort-key values of
+    the last row seen. With reverse set the cursor walks backwards from it.
+    """
+    values = [
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in position
+    ]
+    payload = json.dumps({'p': values, 'r': int(reverse)}, separators=(',', ':'), default=str)
+    token = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+    return replace_query_param(url, KeysetPagination.cursor_query_param, token)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over the queryset's ordering, e.g. (created_at, id).
+
+    Each page is fetched with a WHERE clause on the last row's sort key rather
+    than an OFFSET, so page N costs the same as page 1, and no COUNT(*) is run.
+    Cursors are opaque base64 tokens; an id tiebreak is always appended so the
+    key is unique.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        """The queryset for the page the request's cursor points at, plus one row."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset)
+        self.fields = [self.get_field(queryset.model, name.lstrip('-')) for name in self.ordering]
+
+        position, reverse = self.decode_cursor(request)
+        self.cursor_given = position is not None
+        self.reverse = reverse
+
+        ordering = [self.flip(name) for name in self.ordering] if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        self.has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if not all(isinstance(name, str) for name in ordering):
+            raise NotFound('Keyset pagination requires ordering on model fields')
+        if not ordering or ordering[-1].lstrip('-') not in ('id', 'pk'):
+            last_descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append('-id' if last_descending else 'id')
+        return [name.replace('pk', 'id') if name.lstrip('-') == 'pk' else name for name in ordering]
+
+    def get_field(self, model, name):
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise NotFound('Keyset pagination requires ordering on model fields')
+
+    @staticmethod
+    def flip(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def seek_filter(self, ordering, position):
+        """
+        Rows strictly after `position` in `ordering`. The leading column also
+        gets a plain range bound so the database can seek its index.
+        """
+        condition = Q()
+        equal = Q()
+        for name, value in zip(ordering, position):
+            column = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{column}__{lookup}': value})
+            equal &= Q(**{column: value})
+        leading = ordering[0]
+        bound = 'lte' if leading.startswith('-') else 'gte'
+        return Q(**{f'{leading.lstrip("-")}__{bound}': position[0]}) & condition
+
+    def position_of(self, obj):
+        return [getattr(obj, field.attname) for field in self.fields]
+
+    def encode_cursor(self, position, reverse):
+        return cursor_url(self.base_url, position, reverse)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            values = payload['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            # Generated columns convert through their output field
+            position = [
+                (field.output_field if field.generated else field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+            # Sort keys are non-null columns, and seek_filter cannot compare to NULL
+            if None in position:
+                raise ValueError
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, OverflowError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.page or (not self.reverse and not self.has_more):
+            return None
+        return self.encode_cursor(self.position_of(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.page:
+            return None
+        if (self.reverse and not self.has_more) or (not self.reverse and not self.cursor_given):
+            return None
+        return self.encode_cursor(self.position_of(self.page[0]), reverse=True)
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """DRF's page-number pagination, plus an async variant for async views."""
+
+    def page_queryset(self, queryset, request):
+        """
+        The queryset for the page the request asks for, or None for a page
+        number that is not one. Only ?page=last counts the rows first.
+        """
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return queryset
+        page_number = request.query_params.get(self.page_query_param) or 1
+        if page_number in self.last_page_strings:
+            page_number = self.django_paginator_class(queryset, page_size).num_pages
+        try:
+            page_number = int(page_number)
+        except ValueError:
+            return None
+        bottom = (page_number - 1) * page_size
+        # OFFSET is a 64-bit integer; no page starts beyond the largest id anyway
+        if page_number < 1 or bottom > MAX_ID:
+            return None
+        return queryset[bottom:bottom + page_size]
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        # count is a cached property: fill it in with an async COUNT so the
+        # paginator itself never queries
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [row async for row in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+
+class OptionalCursorPagination(BasePagination):
+    """
+    Page-number pagination by default; switches to keyset pagination when the
+    client passes ?pagination=cursor or follows a cursor link.
+    """
+    mode_query_param = 'pagination'
+    page_number_class = PageNumberPagination
+    keyset_class = KeysetPagination
+
+    def wants_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.get_delegate(request).paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return await self.get_delegate(request).apaginate_queryset(queryset, request, view)
+
+    def get_delegate(self, request):
+        delegate_class = self.keyset_class if self.wants_cursor(request) else self.page_number_class
+        self.delegate = delegate_class()
+        return self.delegate
+
+    def get_paginated_response(self, data):
+        return self.delegate.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view)
@@ -0,0 +1,102 @@
+"""
+Read replicas for the feature, comment and activity endpoints.
+
+``settings.DATABASE_REPLICAS`` lists database aliases that replicate
+``default``. ``ReplicaReadMixin`` picks one of them for each safe request to
+its viewsets, and ``ReplicaRouter`` sends that request's reads there. Every
+other read and every write goes to ``default``.
+
+Replicas lag behind, so after a user writes through those viewsets their
+reads stay on the primary for ``REPLICA_STICKY_SECONDS`` and they always see
+their own changes. The marker lives in the feature cache; with several
+worker processes, that has to be a shared cache (see cache.py).
+
+Whatever goes into the shared response cache is read with ``primary()``:
+a body from a lagging replica would be stored under the new version and
+outlive the write that bumped it.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+# Alias the current request reads from; None means the primary
+_read_alias = ContextVar('featureflow_read_alias', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def get_cache():
+    # cache.get_cache(), which can't be imported here: cache.py imports this module
+    return caches[getattr(settings, 'FEATURE_CACHE_ALIAS', 'default')]
+
+
+def sticky_key(user_id):
+    return f'featureflow:primary:{user_id}'
+
+
+def stick_to_primary(user):
+    """Keep `user`'s reads on the primary for the sticky window."""
+    if user.is_authenticated and get_replicas():
+        get_cache().set(sticky_key(user.pk), True, get_sticky_seconds())
+
+
+def is_sticky(user):
+    return user.is_authenticated and bool(get_cache().get(sticky_key(user.pk)))
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block."""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Not the instance's own alias, which is a replica when it was read there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Serves safe requests from a replica unless the user wrote recently, and
+    starts that window on every other request.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication and throttling read the primary
+        super().initial(request, *args, **kwargs)
+        replicas = get_replicas()
+        if request.method in SAFE_METHODS and replicas and not is_sticky(request.user):
+            # One replica for the whole request, so counts match their pages
+            _read_alias.set(random.choice(replicas))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Not reset with a token: async views run initial() in another context
+        _read_alias.set(None)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            stick_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,205 @@
+"""
+Full-text search index over feature text and comments.
+
+Every feature and every comment is one document in ``features_searchdocument``
+(created by migration 0005).
+Document ids are derived from the source row (features are even, comments odd)
+so writes and deletes are single-row lookups. SQLite uses an FTS5 virtual table
+ranked with bm25; Postgres uses a tsvector column with a GIN index ranked with
+ts_rank. Results are grouped per feature, best-ranked first.
+"""
+import re
+
+from django.db import connection as default_connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Feature
+
+TABLE = 'features_searchdocument'
+
+FEATURE_TEXT_FIELDS = ('title', 'business_problem', 'expected_value', 'affected_users')
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def feature_doc_id(feature_id):
+    return feature_id * 2
+
+
+def comment_doc_id(comment_id):
+    return comment_id * 2 + 1
+
+
+def feature_document(feature):
+    body = '\n'.join([feature.business_problem, feature.expected_value, feature.affected_users])
+    return feature_doc_id(feature.pk), feature.pk, feature.title, body
+
+
+def comment_document(comment):
+    return comment_doc_id(comment.pk), comment.feature_id, '', comment.content
+
+
+class SQLiteSearchBackend:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def upsert(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        with self.connection.cursor() as cursor:
+            # FTS5 has no upsert; replace each rowid
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(doc[0],) for doc in documents])
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, feature_id, title, body) VALUES (%s, %s, %s, %s)',
+                documents,
+            )
+
+    def delete(self, doc_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(doc_id,) for doc_id in doc_ids])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+
+    def build_query(self, text):
+        # Quote every token so user input can never be parsed as FTS syntax.
+        # Terms are matched whole (after stemming): prefix terms expand to
+        # every indexed word sharing the prefix and are far slower.
+        tokens = TOKEN_RE.findall(text)
+        return ' '.join('"{}"'.format(token.replace('"', '""')) for token in tokens)
+
+    def search(self, text, limit):
+        query = self.build_query(text)
+        if not query:
+            return []
+        with self.connection.cursor() as cursor:
+            # bm25 is lower-is-better; title hits weigh ten times body hits.
+            # bm25 cannot run inside an aggregate, and LIMIT -1 OFFSET 0 stops
+            # SQLite flattening the subquery into the GROUP BY.
+            cursor.execute(
+                'SELECT feature_id, MIN(score) AS best FROM ('
+                f'SELECT feature_id, bm25({TABLE}, 0.0, 10.0, 1.0) AS score '
+                f'FROM {TABLE} WHERE {TABLE} MATCH %s LIMIT -1 OFFSET 0'
+                ') GROUP BY feature_id ORDER BY best LIMIT %s',
+                [query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def match_sql(self, query):
+        return f'SELECT feature_id FROM {TABLE} WHERE {TABLE} MATCH %s', [query]
+
+
+class PostgresSearchBackend:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def upsert(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (id, feature_id, document) VALUES (%s, %s, '
+                "setweight(to_tsvector('english', %s), 'A') || setweight(to_tsvector('english', %s), 'B')) "
+                'ON CONFLICT (id) DO UPDATE SET feature_id = EXCLUDED.feature_id, document = EXCLUDED.document',
+                documents,
+            )
+
+    def delete(self, doc_ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE id = ANY(%s)', [list(doc_ids)])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {TABLE}')
+
+    def build_query(self, text):
+        return ' '.join(TOKEN_RE.findall(text))
+
+    def search(self, text, limit):
+        query = self.build_query(text)
+        if not query:
+            return []
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT feature_id, MAX(ts_rank(document, query)) AS score "
+                f"FROM {TABLE}, plainto_tsquery('english', %s) query WHERE document @@ query "
+                'GROUP BY feature_id ORDER BY score DESC LIMIT %s',
+                [query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def match_sql(self, query):
+        return f"SELECT feature_id FROM {TABLE} WHERE document @@ plainto_tsquery('english', %s)", [query]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(connection=None):
+    """Return the search backend for a connection, or None if unsupported."""
+    connection = connection or default_connection
+    backend_class = BACKENDS.get(connection.vendor)
+    return backend_class(connection) if backend_class else None
+
+
+def index_features(features):
+    backend = get_backend()
+    if backend:
+        backend.upsert(feature_document(feature) for feature in features)
+
+
+def index_comments(comments):
+    backend = get_backend()
+    if backend:
+        backend.upsert(comment_document(comment) for comment in comments)
+
+
+def remove_features(feature_ids):
+    backend = get_backend()
+    if backend:
+        backend.delete(feature_doc_id(pk) for pk in feature_ids)
+
+
+def remove_comments(comment_ids):
+    backend = get_backend()
+    if backend:
+        backend.delete(comment_doc_id(pk) for pk in comment_ids)
+
+
+def search_features(text, limit=20):
+    """
+    Return feature ids matching `text`, best match first. Falls back to an
+    icontains scan on databases without a full-text backend.
+    """
+    backend = get_backend()
+    if backend:
+        return backend.search(text, limit)
+    return list(Feature.objects.filter(scan_condition(text)).distinct().values_list('pk', flat=True)[:limit])
+
+
+def scan_condition(text):
+    condition = Q()
+    for field in FEATURE_TEXT_FIELDS:
+        condition |= Q(**{f'{field}__icontains': text})
+    return condition | Q(comments__content__icontains=text)
+
+
+def matching_features(text):
+    """
+    A filter for every feature matching `text`, unranked and unlimited, as a
+    subquery so the database applies it alongside the queryset's own.
+    """
+    backend = get_backend()
+    if backend is None:
+        return Q(pk__in=Feature.objects.filter(scan_condition(text)).values('pk'))
+    query = backend.build_query(text)
+    if not query:
+        return Q(pk__in=[])
+    return Q(pk__in=RawSQL(*backend.match_sql(query)))
@@ -0,0 +1,211 @@
+"""
+Synthetic data at a chosen scale, for load testing (``manage.py
+seed_features``).
+
+Features are generated in batches, each with its comments, status history
+and activities, and each batch is written with ``bulk_create`` in its own
+transaction, so memory stays flat however many rows are asked for. The data
+is shaped like real use rather than uniform:
+
+* statuses come from a random walk over ``STATUS_TRANSITIONS`` starting at
+  ``proposed``, and every step is recorded as a ``StatusChange``;
+* comment counts are skewed, so a few features carry most of the discussion;
+* timestamps spread over the last ``days`` days, in order within a feature;
+* activities are the ones the API would have logged (created, commented,
+  status_changed), topped up with ``updated`` entries towards the requested
+  mean; a feature whose history alone is longer keeps all of it.
+
+Counters and ``last_activity_at`` are computed while generating, and the
+search index is updated per batch, so the result needs no repair afterwards.
+The same ``seed`` gives the same data.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import search
+from .cache import invalidate_stats
+from .counters import TAG_FIELDS
+from .models import STATUS_TRANSITIONS, Activity, ChangeSequence, Comment, Feature, StatusChange
+
+VERBS = ['Add', 'Improve', 'Support', 'Automate', 'Redesign', 'Speed up', 'Simplify', 'Audit']
+OBJECTS = [
+    'bulk export', 'invoice reminders', 'SSO login', 'dashboard filters', 'mobile onboarding',
+    'usage reports', 'webhook retries', 'role permissions', 'search suggestions', 'CSV import',
+    'billing history', 'team invitations', 'audit trail', 'notification settings', 'API keys',
+]
+AUDIENCES = ['admins', 'new customers', 'finance teams', 'support agents', 'enterprise accounts', 'mobile users']
+COMMENTS = {
+    'question': ['How does this interact with {object}?', 'Do we know how many {audience} asked for this?'],
+    'idea': ['We could ship a first cut behind a flag.', 'Reusing the {object} screen would save a sprint.'],
+    'risk': ['This touches {object}, which has no tests.', 'Migrating existing data for {audience} could be slow.'],
+    'agreement': ['+1, {audience} keep asking for this.', 'Agreed, this should go before {object}.'],
+}
+COMPLEXITY_WEIGHTS = {'low': 3, 'medium': 5, 'high': 2}
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """Let bulk_create keep the created_at/updated_at values it is given."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def create_users(count, password):
+    """Get or create `count` seed users sharing one password; returns them."""
+    usernames = [f'seed-user-{index}' for index in range(count)]
+    existing = {user.username: user for user in User.objects.filter(username__in=usernames)}
+    # One hash for all of them: PBKDF2 per user would dominate small runs
+    password_hash = make_password(password)
+    User.objects.bulk_create([
+        User(username=username, email=f'{username}@example.com', password=password_hash)
+        for username in usernames if username not in existing
+    ])
+    return list(User.objects.filter(username__in=usernames).order_by('pk'))
+
+
+class Generator:
+    def __init__(self, users, comments=5, activities=10, days=365, seed=0):
+        self.users = users
+        self.comments = comments
+        self.activities = activities
+        self.days = days
+        self.rng = random.Random(seed)
+        self.now = timezone.now()
+
+    def timestamp_after(self, start):
+        remaining = max(1.0, (self.now - start).total_seconds())
+        # Mostly soon after, sometimes much later
+        return start + timedelta(seconds=remaining * self.rng.random() ** 3)
+
+    def comment_count(self):
+        # Exponential: a long tail of busy features around the requested mean
+        return int(self.rng.expovariate(1 / self.comments)) if self.comments else 0
+
+    def feature(self):
+        """One feature and its children, not saved; children lack feature ids."""
+        rng = self.rng
+        verb, obj, audience = rng.choice(VERBS), rng.choice(OBJECTS), rng.choice(AUDIENCES)
+        creator = rng.choice(self.users)
+        created_at = self.now - timedelta(seconds=rng.random() * self.days * 86400)
+        feature = Feature(
+            title=f'{verb} {obj} for {audience}',
+            business_problem=f'{audience.capitalize()} lose time because {obj} is manual or missing. ' * 2,
+            expected_value=f'Fewer support tickets about {obj} and faster workflows for {audience}.',
+            affected_users=audience.capitalize(),
+            complexity=rng.choices(list(COMPLEXITY_WEIGHTS), weights=list(COMPLEXITY_WEIGHTS.values()))[0],
+            business_value=rng.randint(1, 10),
+            effort=rng.randint(1, 10),
+            risk=rng.randint(1, 10),
+            created_by=creator,
+            created_at=created_at,
+        )
+        activities = [Activity(user=creator, action='created', created_at=created_at,
+                               description=f'Created feature: {feature.title}')]
+
+        status_changes = []
+        status, when = 'proposed', created_at
+        for _ in range(rng.choice([0, 0, 1, 1, 2, 3, 4, 5])):
+            to_status = rng.choice(STATUS_TRANSITIONS[status])
+            when = self.timestamp_after(when)
+            user = rng.choice(self.users)
+            justification = f'Moved after review with {rng.choice(AUDIENCES)}.'
+            status_changes.append(StatusChange(
+                changed_by=user, from_status=status, to_status=to_status,
+                justification=justification, created_at=when,
+            ))
+            activities.append(Activity(
+                user=user, action='status_changed', created_at=when,
+                description=f'Changed status from {status} to {to_status}: {justification}',
+            ))
+            status = to_status
+        feature.status = status
+
+        comments = []
+        for _ in range(self.comment_count()):
+            tag = rng.choice(list(TAG_FIELDS))
+            content = rng.choice(COMMENTS[tag]).format(object=obj, audience=audience)
+            author = rng.choice(self.users)
+            comment_at = self.timestamp_after(created_at)
+            comments.append(Comment(author=author, tag=tag, content=content, created_at=comment_at))
+            activities.append(Activity(
+                user=author, action='commented', created_at=comment_at,
+                description=f'Added {tag} comment: {content[:100]}',
+            ))
+            feature.comment_count += 1
+            setattr(feature, TAG_FIELDS[tag], getattr(feature, TAG_FIELDS[tag]) + 1)
+
+        wanted = int(rng.expovariate(1 / self.activities)) if self.activities else 0
+        for _ in range(wanted - len(activities)):
+            activities.append(Activity(
+                user=rng.choice(self.users), action='updated', created_at=self.timestamp_after(created_at),
+                description=f'Updated feature: {feature.title}',
+            ))
+
+        feature.last_activity_at = max(activity.created_at for activity in activities)
+        feature.updated_at = max([created_at, *(change.created_at for change in status_changes)])
+        return feature, comments, status_changes, activities
+
+    def write_batch(self, size, index_search=True):
+        """Generate and save `size` features with their children; returns row counts."""
+        generated = [self.feature() for _ in range(size)]
+        with transaction.atomic(), historical_timestamps(Feature, Comment, StatusChange, Activity):
+            change_seq = ChangeSequence.next()
+            features = [feature for feature, *_ in generated]
+            for feature in features:
+                feature.change_seq = change_seq
+            Feature.objects.bulk_create(features)
+            children = {Comment: [], StatusChange: [], Activity: []}
+            for feature, comments, status_changes, activities in generated:
+                for model, rows in [(Comment, comments), (StatusChange, status_changes), (Activity, activities)]:
+                    for row in rows:
+                        row.feature_id = feature.pk
+                    children[model].extend(rows)
+            for model, rows in children.items():
+                model.objects.bulk_create(rows, batch_size=2000)
+            if index_search:
+                search.index_features(features)
+                search.index_comments(children[Comment])
+        return {
+            'features': len(features),
+            'comments': len(children[Comment]),
+            'status_changes': len(children[StatusChange]),
+            'activities': len(children[Activity]),
+        }
+
+
+def seed(features, users=50, comments=5, activities=10, days=365, batch_size=1000, seed=0,
+         password='featureflow-seed', index_search=True, progress=None):
+    """
+    Generate `features` features (with `comments` comments and `activities`
+    activities each on average) for `users` seed users; returns row counts.
+    `progress(totals)` is called after every batch.
+    """
+    if batch_size < 1:
+        raise ValueError('batch_size must be at least 1')
+    generator = Generator(create_users(users, password), comments, activities, days, seed)
+    totals = {'features': 0, 'comments': 0, 'status_changes': 0, 'activities': 0}
+    while totals['features'] < features:
+        counts = generator.write_batch(min(batch_size, features - totals['features']), index_search)
+        for key, count in counts.items():
+            totals[key] += count
+        if progress:
+            progress(totals)
+    if totals['features']:
+        invalidate_stats()
+    return totals
@@ -1,9 +1,27 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from django.contrib.auth.models import User
+from .metrics import TimedSerializerMixin
 from .models import Feature, Comment, StatusChange, Activity
+from .pagination import cursor_url
 
 
-class UserSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Drops every field not in the `fields` serializer context, when the view
+    sets one (see FeatureViewSet.get_sparse_fields).
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.context.get('fields')
+        if selected is not None:
+            for name in list(self.fields):
+                if name not in selected:
+                    self.fields.pop(name)
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email']
@@ -24,6 +42,16 @@ class RegisterSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password_confirm')
+        password_hash = validated_data.pop('password_hash', None)
+        if password_hash is not None:
+            # Already hashed off-thread (see async_views.register)
+            user = User(
+                username=User.normalize_username(validated_data['username']),
+                email=User.objects.normalize_email(validated_data['email']),
+                password=password_hash
+            )
+            user.save()
+            return user
         user = User.objects.create_user(
             username=validated_data['username'],
             email=validated_data['email'],
@@ -32,7 +60,12 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class LoginSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(write_only=True, trim_whitespace=False)
+
+
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     author_id = serializers.IntegerField(write_only=True, required=False)
     
@@ -42,7 +75,7 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'author', 'feature']
 
 
-class StatusChangeSerializer(serializers.ModelSerializer):
+class StatusChangeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     changed_by = UserSerializer(read_only=True)
     
     class Meta:
@@ -51,7 +84,7 @@ class StatusChangeSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'changed_by', 'from_status']
 
 
-class ActivitySerializer(serializers.ModelSerializer):
+class ActivitySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
@@ -60,29 +93,47 @@ class ActivitySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class FeatureListSerializer(serializers.ModelSerializer):
+class FeatureListSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
     priority_score = serializers.FloatField(read_only=True)
-    comment_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Feature
         fields = [
             'id', 'title', 'business_problem', 'expected_value', 'affected_users',
             'complexity', 'status', 'business_value', 'effort', 'risk',
-            'priority_score', 'created_by', 'created_at', 'updated_at', 'comment_count'
+            'priority_score', 'created_by', 'created_at', 'updated_at', 'comment_count',
+            'question_comment_count', 'idea_comment_count', 'risk_comment_count',
+            'agreement_comment_count', 'last_activity_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'priority_score']
-    
-    def get_comment_count(self, obj):
-        return obj.comments.count()
 
 
-class FeatureDetailSerializer(serializers.ModelSerializer):
+# Collections embedded in the feature detail: serializer, related user field,
+# the route that pages through the rest, and whether that route lists oldest first
+DETAIL_COLLECTIONS = {
+    'comments': (CommentSerializer, 'author', 'feature-comments', True),
+    'status_changes': (StatusChangeSerializer, 'changed_by', 'feature-status-changes', False),
+    'activities': (ActivitySerializer, 'user', 'feature-activities', False),
+}
+
+
+class FeatureDetailSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Embeds the latest `embed_limit` rows of each collection named in the
+    `expand` context (all of them by default). `more` holds a cursor link per
+    collection to page through the older rows, or null when none are left.
+    
+    Views prefetch the newest `embed_limit + 1` rows into `recent_<name>`;
+    without that prefetch each collection costs one query.
+    """
+    embed_limit = 20
+    
     created_by = UserSerializer(read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
-    status_changes = StatusChangeSerializer(many=True, read_only=True)
-    activities = ActivitySerializer(many=True, read_only=True)
+    comments = serializers.SerializerMethodField()
+    status_changes = serializers.SerializerMethodField()
+    activities = serializers.SerializerMethodField()
+    more = serializers.SerializerMethodField()
     priority_score = serializers.FloatField(read_only=True)
     
     class Meta:
@@ -90,7 +141,62 @@ class FeatureDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'business_problem', 'expected_value', 'affected_users',
             'complexity', 'status', 'business_value', 'effort', 'risk',
-            'priority_score', 'created_by', 'created_at', 'updated_at',
-            'comments', 'status_changes', 'activities'
+            'priority_score', 'created_by', 'created_at', 'updated_at', 'comment_count',
+            'question_comment_count', 'idea_comment_count', 'risk_comment_count',
+            'agreement_comment_count', 'last_activity_at',
+            'comments', 'status_changes', 'activities', 'more'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'priority_score']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in DETAIL_COLLECTIONS:
+            if name not in self.expanded:
+                self.fields.pop(name, None)
+    
+    @property
+    def expanded(self):
+        expand = self.context.get('expand')
+        return list(DETAIL_COLLECTIONS) if expand is None else expand
+    
+    def recent(self, obj, name):
+        """Newest embed_limit + 1 rows of a collection, newest first."""
+        rows = getattr(obj, f'recent_{name}', None)
+        if rows is None:
+            user_field = DETAIL_COLLECTIONS[name][1]
+            rows = list(
+                getattr(obj, name).select_related(user_field)
+                .order_by('-created_at', '-id')[:self.embed_limit + 1]
+            )
+        return rows
+    
+    def embed(self, obj, name):
+        serializer_class, _, _, oldest_first = DETAIL_COLLECTIONS[name]
+        rows = self.recent(obj, name)[:self.embed_limit]
+        if oldest_first:
+            rows = rows[::-1]
+        return serializer_class(rows, many=True, context=self.context).data
+    
+    def get_comments(self, obj):
+        return self.embed(obj, 'comments')
+    
+    def get_status_changes(self, obj):
+        return self.embed(obj, 'status_changes')
+    
+    def get_activities(self, obj):
+        return self.embed(obj, 'activities')
+    
+    def get_more(self, obj):
+        request = self.context.get('request')
+        more = {}
+        for name in self.expanded:
+            _, _, route, oldest_first = DETAIL_COLLECTIONS[name]
+            rows = self.recent(obj, name)
+            if len(rows) <= self.embed_limit:
+                more[name] = None
+                continue
+            oldest = rows[self.embed_limit - 1]
+            url = reverse(route, kwargs={'feature_pk': obj.pk}, request=request)
+            # Routes listing oldest first reach older rows by walking backwards
+            more[name] = cursor_url(url, [oldest.created_at, oldest.pk], reverse=oldest_first)
+        return more
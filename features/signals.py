@@ -0,0 +1,158 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import counters, events, metrics, search
+from .activity import activities_written
+from .authentication import invalidate_user
+from .cache import invalidate_feature, invalidate_stats
+from .models import Activity, ChangeSequence, Comment, Feature, FeatureTombstone, StatusChange
+
+_state = threading.local()
+
+
+@contextmanager
+def suspended():
+    """
+    Skip the per-row index and cache upkeep below inside the block, for bulk
+    writes that update the index and cache themselves.
+    """
+    previous = getattr(_state, 'suspended', False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def unless_suspended(handler):
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        if not getattr(_state, 'suspended', False):
+            handler(*args, **kwargs)
+    return wrapper
+
+
+@receiver(post_save, sender=Feature)
+@unless_suspended
+def index_feature(sender, instance, update_fields=None, **kwargs):
+    # Status-only and other non-text saves leave the document unchanged
+    if update_fields is not None and not set(update_fields) & set(search.FEATURE_TEXT_FIELDS):
+        return
+    search.index_features([instance])
+
+
+def deleted_with_feature(origin):
+    return isinstance(origin, Feature) or getattr(origin, 'model', None) is Feature
+
+
+@receiver(pre_delete, sender=Feature)
+@unless_suspended
+def unindex_feature(sender, instance, **kwargs):
+    # Its comments' documents too, in one go rather than row by row below
+    search.remove_comments(Comment.objects.filter(feature_id=instance.pk).values_list('pk', flat=True))
+    search.remove_features([instance.pk])
+
+
+@receiver(pre_delete, sender=Feature)
+@unless_suspended
+def tombstone_feature(sender, instance, **kwargs):
+    # pre_delete runs inside the delete's transaction, before the row is
+    # locked, so the sequence is taken first as everywhere else
+    FeatureTombstone.objects.create(feature_id=instance.pk, change_seq=ChangeSequence.next())
+
+
+@receiver(post_save, sender=Comment)
+@unless_suspended
+def index_comment(sender, instance, **kwargs):
+    search.index_comments([instance])
+
+
+@receiver(post_delete, sender=Comment)
+@unless_suspended
+def unindex_comment(sender, instance, origin=None, **kwargs):
+    if not deleted_with_feature(origin):
+        search.remove_comments([instance.pk])
+
+
+@receiver(pre_save, sender=Comment)
+def remember_counted_comment(sender, instance, **kwargs):
+    # An edit can retag the comment; note what the counters have it as
+    instance._counted = None
+    if not instance._state.adding:
+        instance._counted = Comment.objects.filter(pk=instance.pk).values_list('feature_id', 'tag').first()
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, **kwargs):
+    current = (instance.feature_id, instance.tag)
+    previous = getattr(instance, '_counted', None)
+    if previous != current:
+        counters.comments_changed(removed=[previous] if previous else [], added=[current])
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, origin=None, **kwargs):
+    # Comments deleted along with their feature leave nothing to count
+    if deleted_with_feature(origin):
+        return
+    counters.comments_changed(removed=[(instance.feature_id, instance.tag)])
+
+
+@receiver([post_save, post_delete], sender=Feature)
+@unless_suspended
+def invalidate_feature_cache(sender, instance, **kwargs):
+    invalidate_feature(instance.pk)
+    invalidate_stats()
+
+
+# Deletes only on comments, which need per-row upkeep anyway: any delete
+# receiver on a model stops Django fast-deleting it in a feature's cascade.
+# Status changes and activities are only deleted with their feature, their
+# user (below) or in the admin, which invalidates for itself
+@receiver([post_save, post_delete], sender=Comment)
+@receiver(post_save, sender=StatusChange)
+@receiver(post_save, sender=Activity)
+@unless_suspended
+def invalidate_parent_feature_cache(sender, instance, origin=None, **kwargs):
+    # The feature's own delete invalidates it once
+    if not deleted_with_feature(origin):
+        invalidate_feature(instance.feature_id)
+
+
+@receiver(pre_delete, sender=User)
+def invalidate_features_of_user(sender, instance, **kwargs):
+    # Their status changes and activities go in the cascade without signals
+    feature_ids = (
+        StatusChange.objects.filter(changed_by=instance).order_by().values_list('feature_id', flat=True)
+        .union(Activity.objects.filter(user=instance).order_by().values_list('feature_id', flat=True))
+    )
+    for feature_id in feature_ids:
+        invalidate_feature(feature_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(activities_written)
+def track_last_activity(sender, activities, **kwargs):
+    counters.activities_written(activities)
+
+
+@receiver(activities_written)
+def publish_activities(sender, activities, **kwargs):
+    events.broker.activities_written(activities)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Fires again each time the wrapper reconnects, and the list outlives that
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.record_query)
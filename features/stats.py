@@ -0,0 +1,53 @@
+"""
+Dashboard aggregates over every feature: counts by status, complexity and
+creator, and the average priority score.
+
+All of it comes from one GROUP BY (status, complexity, creator) query whose
+few rows are folded in Python, and is cached under a global version that
+every feature write bumps (see cache.invalidate_stats).
+"""
+from django.db.models import Count, Sum
+
+from .cache import STATS_SCOPE, get_cache, get_timeout, get_version
+from .models import Feature
+from .routing import primary
+
+
+def compute_stats():
+    rows = (
+        Feature.objects.order_by()
+        .values('status', 'complexity', 'created_by', 'created_by__username')
+        .annotate(count=Count('pk'), priority=Sum('priority_score'))
+    )
+    by_status = {value: 0 for value, _ in Feature.STATUS_CHOICES}
+    by_complexity = {value: 0 for value, _ in Feature.COMPLEXITY_CHOICES}
+    by_creator = {}
+    total = 0
+    priority = 0.0
+    for row in rows:
+        total += row['count']
+        priority += row['priority']
+        by_status[row['status']] = by_status.get(row['status'], 0) + row['count']
+        by_complexity[row['complexity']] = by_complexity.get(row['complexity'], 0) + row['count']
+        creator = by_creator.setdefault(
+            row['created_by'], {'id': row['created_by'], 'username': row['created_by__username'], 'count': 0}
+        )
+        creator['count'] += row['count']
+    return {
+        'total': total,
+        'average_priority': round(priority / total, 2) if total else None,
+        'by_status': by_status,
+        'by_complexity': by_complexity,
+        'by_creator': sorted(by_creator.values(), key=lambda creator: (-creator['count'], creator['username'])),
+    }
+
+
+def get_stats():
+    cache = get_cache()
+    key = f'featureflow:stats:{get_version(STATS_SCOPE)}'
+    stats = cache.get(key)
+    if stats is None:
+        with primary():
+            stats = compute_stats()
+        cache.set(key, stats, get_timeout())
+    return stats
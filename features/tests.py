@@ -1,8 +1,40 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.core.management import call_command, CommandError
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.db import connection, connections, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import Feature, Comment, StatusChange, Activity
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import counters, events, metrics, routing, search
+from . import transfer
+from .activity import ActivityWriter, log_activity
+from .admin import FeatureAdmin
+from .authentication import user_key
+from .hashing import HashingBusy, HashingPool
+from .models import (
+    Feature, Comment, StatusChange, Activity, ChangeSequence, FeatureTombstone, ThrottleBucket, STATUS_TRANSITIONS
+)
+from .serializers import FeatureDetailSerializer
+from .throttling import CacheThrottleStore, DatabaseThrottleStore, get_store as get_throttle_store
+from .views import FeatureViewSet
 
 
 class FeatureModelTests(TestCase):
@@ -530,3 +562,2281 @@ class EdgeCaseTests(APITestCase):
             'password_confirm': 'different123'
         })
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QueryCountTests(APITestCase):
+    """Ensure read endpoints run a fixed number of queries regardless of row count"""
+    
+    def setUp(self):
+        # Login throttle counters live in the cache; start each test clean
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        # Load the authenticated user into the cache so every count below sees it
+        self.client.get('/api/auth/me/')
+
+    def create_features(self, count):
+        features = []
+        for i in range(count):
+            author = User.objects.create_user(username=f'author{Feature.objects.count()}')
+            feature = Feature.objects.create(
+                title=f'Feature {i}',
+                business_problem='Problem',
+                expected_value='Value',
+                affected_users='Users',
+                created_by=author
+            )
+            Comment.objects.create(feature=feature, author=author, content='Comment', tag='idea')
+            StatusChange.objects.create(
+                feature=feature, changed_by=author, from_status='proposed',
+                to_status='approved', justification='Approved'
+            )
+            Activity.objects.create(feature=feature, user=author, action='created', description='Created')
+            features.append(feature)
+        return features
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context)
+
+    def test_feature_list_query_count_is_constant(self):
+        self.create_features(2)
+        small = self.count_queries('/api/features/')
+        self.create_features(8)
+        large = self.count_queries('/api/features/')
+        self.assertEqual(small, large)
+
+    def test_feature_list_reports_comment_count(self):
+        feature = self.create_features(1)[0]
+        Comment.objects.create(feature=feature, author=self.user, content='Another', tag='risk')
+        response = self.client.get('/api/features/')
+        self.assertEqual(response.data['results'][0]['comment_count'], 2)
+
+    def test_feature_detail_query_count_is_constant(self):
+        feature = self.create_features(1)[0]
+        small = self.count_queries(f'/api/features/{feature.id}/')
+        for i in range(5):
+            author = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(feature=feature, author=author, content='More', tag='question')
+            Activity.objects.create(feature=feature, user=author, action='commented', description='More')
+        large = self.count_queries(f'/api/features/{feature.id}/')
+        self.assertEqual(small, large)
+
+    def test_comment_and_activity_list_query_count_is_constant(self):
+        feature = self.create_features(1)[0]
+        comments_small = self.count_queries(f'/api/features/{feature.id}/comments/')
+        activities_small = self.count_queries(f'/api/features/{feature.id}/activities/')
+        for i in range(5):
+            author = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(feature=feature, author=author, content='More', tag='question')
+            Activity.objects.create(feature=feature, user=author, action='commented', description='More')
+        self.assertEqual(comments_small, self.count_queries(f'/api/features/{feature.id}/comments/'))
+        self.assertEqual(activities_small, self.count_queries(f'/api/features/{feature.id}/activities/'))
+
+
+class PriorityScoreTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        for title, value in [('Low', 2), ('High', 10), ('Mid', 6)]:
+            Feature.objects.create(
+                title=title,
+                business_problem='Problem',
+                expected_value='Value',
+                affected_users='Users',
+                business_value=value,
+                effort=2,
+                risk=2,
+                created_by=self.user
+            )
+
+    def test_priority_score_is_stored(self):
+        self.assertEqual(
+            list(Feature.objects.order_by('-priority_score').values_list('priority_score', flat=True)),
+            [8.0, 4.0, 0.0]
+        )
+
+    def test_priority_score_updates_on_save(self):
+        feature = Feature.objects.get(title='Low')
+        feature.business_value = 9
+        feature.save()
+        feature.refresh_from_db()
+        self.assertEqual(feature.priority_score, 7.0)
+
+    def test_patch_returns_recomputed_priority_score(self):
+        feature = Feature.objects.get(title='Low')
+        response = self.client.patch(f'/api/features/{feature.id}/', {'business_value': 10, 'risk': 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['priority_score'], 7.0)
+
+    def test_order_by_priority(self):
+        response = self.client.get('/api/features/', {'ordering': '-priority_score'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([f['title'] for f in response.data['results']], ['High', 'Mid', 'Low'])
+
+    def test_min_priority_filter(self):
+        response = self.client.get('/api/features/', {'min_priority': '4'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({f['title'] for f in response.data['results']}, {'High', 'Mid'})
+
+    def test_min_priority_must_be_numeric(self):
+        response = self.client.get('/api/features/', {'min_priority': 'high'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FeatureFilterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.search = Feature.objects.create(
+            title='Search page',
+            business_problem='Users cannot find anything',
+            expected_value='Value',
+            affected_users='Users',
+            complexity='high',
+            created_by=self.user
+        )
+        self.export = Feature.objects.create(
+            title='CSV export',
+            business_problem='Reports are manual',
+            expected_value='Value',
+            affected_users='Users',
+            complexity='low',
+            status='approved',
+            created_by=self.other
+        )
+
+    def titles(self, params):
+        response = self.client.get('/api/features/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [f['title'] for f in response.data['results']]
+
+    def test_filter_by_status(self):
+        self.assertEqual(self.titles({'status': 'approved'}), ['CSV export'])
+        self.assertEqual(len(self.titles({'status': 'approved,proposed'})), 2)
+
+    def test_filter_by_complexity_and_creator(self):
+        self.assertEqual(self.titles({'complexity': 'high'}), ['Search page'])
+        self.assertEqual(self.titles({'created_by': self.other.id}), ['CSV export'])
+
+    def test_filter_by_date_range(self):
+        Feature.objects.filter(pk=self.export.pk).update(created_at='2024-01-15T12:00:00Z')
+        self.assertEqual(self.titles({'created_before': '2024-01-15'}), ['CSV export'])
+        self.assertEqual(self.titles({'created_after': '2024-01-16'}), ['Search page'])
+
+    def test_search(self):
+        self.assertEqual(self.titles({'search': 'manual'}), ['CSV export'])
+        self.assertEqual(self.titles({'search': 'testuser'}), ['Search page'])
+
+    def test_search_uses_full_text_index(self):
+        Comment.objects.create(feature=self.search, author=self.user, content='Needs fuzzy matching', tag='idea')
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.titles({'search': 'fuzzy'}), ['Search page'])
+        self.assertFalse(any('LIKE' in query['sql'] for query in context.captured_queries))
+
+    def test_ordering(self):
+        self.assertEqual(self.titles({'ordering': 'created_at'}), ['Search page', 'CSV export'])
+        self.assertEqual(self.titles({'ordering': '-created_at'}), ['CSV export', 'Search page'])
+
+    def test_invalid_filter_values_rejected(self):
+        for params in [{'status': 'shipped'}, {'created_by': 'bob'}, {'created_after': 'yesterday'},
+                       {'created_by': '\u00b2'}, {'created_by': '99999999999999999999'}]:
+            response = self.client.get('/api/features/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        Feature.objects.bulk_create([
+            Feature(
+                title=f'Feature {i}',
+                business_problem='Problem',
+                expected_value='Value',
+                affected_users='Users',
+                business_value=i % 10 + 1,
+                created_by=self.user
+            )
+            for i in range(25)
+        ])
+        # bulk_create gives every row the same created_at, exercising the id tiebreak
+        self.expected = list(Feature.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def ids(self, response):
+        return [f['id'] for f in response.data['results']]
+
+    def test_walks_all_pages_without_count(self):
+        with CaptureQueriesContext(connection) as context:
+            first = self.client.get('/api/features/', {'pagination': 'cursor'})
+        self.assertNotIn('count', first.data)
+        self.assertFalse(any('COUNT(*)' in q['sql'] for q in context.captured_queries))
+        self.assertIsNone(first.data['previous'])
+        self.assertEqual(self.ids(first), self.expected[:20])
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual(self.ids(second), self.expected[20:])
+        self.assertIsNone(second.data['next'])
+
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(self.ids(back), self.expected[:20])
+
+    def test_cursor_follows_requested_ordering(self):
+        expected = list(Feature.objects.order_by('-priority_score', '-id').values_list('id', flat=True))
+        first = self.client.get('/api/features/', {'pagination': 'cursor', 'ordering': '-priority_score'})
+        second = self.client.get(first.data['next'])
+        self.assertEqual(self.ids(first) + self.ids(second), expected)
+
+    def test_comment_and_activity_cursors(self):
+        feature = Feature.objects.first()
+        for i in range(25):
+            Comment.objects.create(feature=feature, author=self.user, content=f'Comment {i}', tag='idea')
+            Activity.objects.create(feature=feature, user=self.user, action='commented', description=f'{i}')
+        for url in [f'/api/features/{feature.id}/comments/', f'/api/features/{feature.id}/activities/']:
+            first = self.client.get(url, {'pagination': 'cursor'})
+            second = self.client.get(first.data['next'])
+            ids = self.ids(first) + self.ids(second)
+            self.assertEqual(len(ids), 25)
+            self.assertEqual(len(set(ids)), 25)
+
+    def test_page_number_pagination_is_default(self):
+        response = self.client.get('/api/features/')
+        self.assertEqual(response.data['count'], 25)
+
+    def test_page_number_beyond_any_offset(self):
+        response = self.client.get('/api/features/', {'page': '99999999999999999999999'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/features/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_unusable_position(self):
+        for ordering, position in [('-created_at', [None, 1]), ('priority_score', [10 ** 400, 1])]:
+            token = base64.urlsafe_b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+            response = self.client.get('/api/features/', {'cursor': token, 'ordering': ordering})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, ordering)
+
+
+class FullTextSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.dark_mode = Feature.objects.create(
+            title='Dark mode',
+            business_problem='Bright screens strain eyes at night',
+            expected_value='Happier users',
+            affected_users='Everyone',
+            created_by=self.user
+        )
+        self.export = Feature.objects.create(
+            title='CSV export',
+            business_problem='Reports are assembled by hand',
+            expected_value='Less manual work, maybe a dark theme for reports',
+            affected_users='Analysts',
+            created_by=self.user
+        )
+
+    def search(self, q):
+        response = self.client.get('/api/features/search/', {'q': q})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [f['id'] for f in response.data['results']]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search('dark'), [self.dark_mode.id, self.export.id])
+
+    def test_stemmed_matches(self):
+        self.assertEqual(self.search('report'), [self.export.id])
+        self.assertEqual(self.search('screen'), [self.dark_mode.id])
+
+    def test_index_follows_writes(self):
+        self.export.title = 'Spreadsheet export'
+        self.export.save()
+        self.assertEqual(self.search('spreadsheet'), [self.export.id])
+
+        comment = Comment.objects.create(
+            feature=self.dark_mode, author=self.user, content='Consider high contrast too', tag='idea'
+        )
+        self.assertEqual(self.search('contrast'), [self.dark_mode.id])
+        comment.delete()
+        self.assertEqual(self.search('contrast'), [])
+
+        self.dark_mode.delete()
+        self.assertEqual(self.search('screens'), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('dark*)("^'), [self.dark_mode.id, self.export.id])
+
+    def test_query_required(self):
+        response = self.client.get('/api/features/search/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_search_is_not_truncated(self):
+        features = Feature.objects.bulk_create([
+            Feature(title=f'Widget {i}', business_problem='Problem', expected_value='Value',
+                    affected_users='Users', created_by=self.user)
+            for i in range(1005)
+        ])
+        search.index_features(features)
+        feature_admin = FeatureAdmin(Feature, admin.site)
+        queryset, may_have_duplicates = feature_admin.get_search_results(None, Feature.objects.all(), 'widget')
+        self.assertEqual(queryset.count(), 1005)
+        self.assertFalse(may_have_duplicates)
+        queryset, _ = feature_admin.get_search_results(None, Feature.objects.all(), 'dark')
+        self.assertEqual(set(queryset), {self.dark_mode, self.export})
+        queryset, _ = feature_admin.get_search_results(None, Feature.objects.all(), '*')
+        self.assertFalse(queryset.exists())
+
+    def test_rebuild_command(self):
+        search.get_backend().clear()
+        self.assertEqual(self.search('dark'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('dark'), [self.dark_mode.id, self.export.id])
+
+
+class FeatureDetailEmbedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.feature = Feature.objects.create(
+            title='Busy feature',
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            created_by=self.user
+        )
+        self.limit = FeatureDetailSerializer.embed_limit
+        for i in range(self.limit + 5):
+            Comment.objects.create(feature=self.feature, author=self.user, content=f'Comment {i}', tag='idea')
+            Activity.objects.create(feature=self.feature, user=self.user, action='commented', description=f'{i}')
+
+    def test_embeds_latest_rows_only(self):
+        response = self.client.get(f'/api/features/{self.feature.id}/')
+        comments = [c['content'] for c in response.data['comments']]
+        self.assertEqual(comments, [f'Comment {i}' for i in range(5, self.limit + 5)])
+        self.assertEqual(len(response.data['activities']), self.limit)
+        self.assertEqual(response.data['status_changes'], [])
+        self.assertIsNone(response.data['more']['status_changes'])
+
+    def test_more_links_fetch_the_rest(self):
+        response = self.client.get(f'/api/features/{self.feature.id}/')
+        older_comments = self.client.get(response.data['more']['comments'])
+        self.assertEqual(
+            [c['content'] for c in older_comments.data['results']],
+            [f'Comment {i}' for i in range(5)]
+        )
+        older_activities = self.client.get(response.data['more']['activities'])
+        self.assertEqual(
+            [a['description'] for a in older_activities.data['results']],
+            [str(i) for i in reversed(range(5))]
+        )
+
+    def test_expand_selects_collections(self):
+        response = self.client.get(f'/api/features/{self.feature.id}/', {'expand': 'comments'})
+        self.assertIn('comments', response.data)
+        self.assertNotIn('activities', response.data)
+        self.assertNotIn('status_changes', response.data)
+        self.assertEqual(list(response.data['more']), ['comments'])
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(f'/api/features/{self.feature.id}/', {'expand': ''})
+        self.assertFalse(any('features_comment' in q['sql'] for q in context.captured_queries))
+
+    def test_unknown_expand_rejected(self):
+        response = self.client.get(f'/api/features/{self.feature.id}/', {'expand': 'votes'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.feature = Feature.objects.create(
+            title='Feature',
+            business_problem='A long problem statement',
+            expected_value='Value',
+            affected_users='Users',
+            created_by=self.user
+        )
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        feature_sql = [q['sql'] for q in context.captured_queries if 'FROM "features_feature"' in q['sql']]
+        return response, ' '.join(feature_sql)
+
+    def test_fields_trims_output_and_select(self):
+        response, sql = self.get('/api/features/', {'fields': 'id,title,status,priority_score'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'status', 'priority_score'})
+        self.assertNotIn('business_problem', sql)
+        self.assertNotIn('features_comment', sql)
+
+    def test_omit_drops_large_text_fields(self):
+        response, sql = self.get('/api/features/', {'omit': 'business_problem,expected_value,affected_users'})
+        row = response.data['results'][0]
+        self.assertNotIn('business_problem', row)
+        self.assertEqual(row['created_by']['username'], 'testuser')
+        self.assertEqual(row['comment_count'], 0)
+        self.assertNotIn('"features_feature"."business_problem"', sql)
+
+    def test_sparse_detail_with_cursor_list(self):
+        response, _ = self.get(f'/api/features/{self.feature.id}/', {'fields': 'id,title,comments'})
+        self.assertEqual(set(response.data), {'id', 'title', 'comments'})
+        response, _ = self.get('/api/features/', {'fields': 'title', 'pagination': 'cursor'})
+        self.assertEqual(response.data['results'], [{'title': 'Feature'}])
+
+    def test_unknown_field_rejected(self):
+        response = self.client.get('/api/features/', {'fields': 'title,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.feature = Feature.objects.create(
+            title='Feature',
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            created_by=self.user
+        )
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_reads_return_304(self):
+        for url in [
+            '/api/features/',
+            f'/api/features/{self.feature.id}/',
+            f'/api/features/{self.feature.id}/comments/',
+            f'/api/features/{self.feature.id}/activities/',
+        ]:
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, status.HTTP_200_OK)
+            with CaptureQueriesContext(connection) as context:
+                second = self.revalidate(url, first['ETag'])
+            self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED, url)
+            self.assertEqual(second['ETag'], first['ETag'])
+            # JWT user lookup plus the validator query, nothing else
+            self.assertLessEqual(len(context), 2)
+
+    def test_comment_invalidates_feature_reads(self):
+        urls = ['/api/features/', f'/api/features/{self.feature.id}/', f'/api/features/{self.feature.id}/comments/']
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        self.client.post(f'/api/features/{self.feature.id}/comments/', {'content': 'New', 'tag': 'idea'})
+        for url in urls:
+            self.assertEqual(self.revalidate(url, etags[url]).status_code, status.HTTP_200_OK, url)
+
+    def test_delete_and_query_change_invalidate_list(self):
+        etag = self.client.get('/api/features/')['ETag']
+        self.assertNotEqual(self.client.get('/api/features/', {'status': 'done'})['ETag'], etag)
+        Feature.objects.create(
+            title='Other', business_problem='P', expected_value='V', affected_users='U', created_by=self.user
+        ).delete()
+        self.assertEqual(self.revalidate('/api/features/', etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.feature.delete()
+        self.assertEqual(self.revalidate('/api/features/', etag).status_code, status.HTTP_200_OK)
+
+    def test_list_sees_late_commit_with_lower_change_seq(self):
+        other = Feature.objects.create(
+            title='Other', business_problem='P', expected_value='V', affected_users='U', created_by=self.user
+        )
+        Feature.objects.filter(pk=other.pk).update(change_seq=1000)
+        etag = self.client.get('/api/features/')['ETag']
+        # A transaction that took its change_seq earlier commits after the read
+        Feature.objects.filter(pk=self.feature.pk).update(title='Late', change_seq=500)
+        self.assertEqual(self.revalidate('/api/features/', etag).status_code, status.HTTP_200_OK)
+
+    def test_cursor_list_validates_its_page(self):
+        url = '/api/features/?pagination=cursor'
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in context.captured_queries))
+        self.client.patch(f'/api/features/{self.feature.id}/', {'title': 'Renamed'})
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_200_OK)
+        etag = self.client.get(url)['ETag']
+        self.feature.delete()
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_200_OK)
+
+    def test_detail_has_last_modified(self):
+        response = self.client.get(f'/api/features/{self.feature.id}/')
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(
+            f'/api/features/{self.feature.id}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.feature = Feature.objects.create(
+            title='Feature',
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            created_by=self.user
+        )
+        self.url = f'/api/features/{self.feature.id}/'
+
+    def test_repeat_reads_served_from_cache(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get(self.url)
+        self.assertEqual(second.data, first.data)
+        self.assertFalse(any('features_comment' in q['sql'] for q in context.captured_queries))
+
+    def test_variants_cached_separately(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url, {'fields': 'id,title'})
+        self.assertEqual(set(response.data), {'id', 'title'})
+
+    def test_writes_invalidate(self):
+        self.client.get(self.url)
+        self.client.patch(self.url, {'title': 'Renamed'})
+        self.assertEqual(self.client.get(self.url).data['title'], 'Renamed')
+
+        self.client.post(f'{self.url}comments/', {'content': 'Fresh comment', 'tag': 'idea'})
+        self.assertEqual(self.client.get(self.url).data['comments'][-1]['content'], 'Fresh comment')
+
+        self.client.post(f'{self.url}change_status/', {'status': 'approved', 'justification': 'Go'})
+        self.assertEqual(self.client.get(self.url).data['status'], 'approved')
+
+        self.client.delete(self.url)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_feature_delete_does_not_scale_with_children(self):
+        def delete_queries(children):
+            feature = Feature.objects.create(
+                title='Busy', business_problem='P', expected_value='V', affected_users='U', created_by=self.user
+            )
+            for i in range(children):
+                Comment.objects.create(feature=feature, author=self.user, content=f'Comment {i}', tag='idea')
+                StatusChange.objects.create(
+                    feature=feature, changed_by=self.user, from_status='proposed', to_status='approved',
+                    justification='Go'
+                )
+                Activity.objects.create(feature=feature, user=self.user, action='updated', description='Edit')
+            with CaptureQueriesContext(connection) as context:
+                feature.delete()
+            return len(context)
+
+        self.assertEqual(delete_queries(40), delete_queries(2))
+
+    def test_user_delete_invalidates_their_features(self):
+        other = User.objects.create_user(username='other')
+        Activity.objects.create(feature=self.feature, user=other, action='updated', description='By other')
+        self.assertEqual(len(self.client.get(self.url).data['activities']), 1)
+        other.delete()
+        self.assertEqual(self.client.get(self.url).data['activities'], [])
+
+    def test_version_bumped_again_on_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Comment.objects.create(feature=self.feature, author=self.user, content='Racy', tag='risk')
+            # A reader inside the write window caches the uncommitted state...
+            self.client.get(self.url)
+        for callback in callbacks:
+            callback()
+        # ...but the commit-time bump means it is never served
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        self.assertTrue(any('features_comment' in q['sql'] for q in context.captured_queries))
+
+
+class StatusTransitionConcurrencyTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.feature = Feature.objects.create(
+            title='Feature',
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            created_by=self.user
+        )
+        self.url = f'/api/features/{self.feature.id}/change_status/'
+
+    def test_minimal_response(self):
+        response = self.client.post(f'{self.url}?response=minimal', {
+            'status': 'approved',
+            'justification': 'Approved'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {'id', 'status', 'updated_at'})
+        self.assertEqual(response.data['status'], 'approved')
+
+    def test_stale_from_status_conflicts(self):
+        response = self.client.post(self.url, {
+            'status': 'approved',
+            'justification': 'Approved',
+            'from_status': 'under_discussion'
+        })
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['status'], 'proposed')
+        self.assertFalse(StatusChange.objects.exists())
+
+    def test_concurrent_transition_is_not_lost(self):
+        stale = Feature.objects.get(pk=self.feature.pk)
+        # Another user moves the feature after this request has read it
+        Feature.objects.filter(pk=self.feature.pk).update(status='under_discussion')
+        with mock.patch.object(FeatureViewSet, 'get_object', return_value=stale):
+            response = self.client.post(self.url, {'status': 'approved', 'justification': 'Approved'})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.status, 'under_discussion')
+        self.assertFalse(StatusChange.objects.exists())
+
+    def test_transition_is_atomic(self):
+        with mock.patch.object(Activity.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(self.url, {'status': 'approved', 'justification': 'Approved'})
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.status, 'proposed')
+        self.assertFalse(StatusChange.objects.exists())
+
+    def test_only_status_columns_written(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.post(f'{self.url}?response=minimal', {'status': 'approved', 'justification': 'Approved'})
+        updates = [q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE "features_feature"')]
+        # The status change, then last_activity_at for its activity
+        self.assertEqual(len(updates), 2)
+        self.assertTrue(all('"title"' not in sql for sql in updates))
+
+
+class ActivityWriterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.feature = Feature.objects.create(
+            title='Feature',
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            created_by=self.user
+        )
+
+    def inserts(self, context):
+        return [q for q in context.captured_queries if q['sql'].startswith('INSERT INTO "features_activity"')]
+
+    def test_sync_batch_uses_one_insert(self):
+        writer = ActivityWriter('sync')
+        with CaptureQueriesContext(connection) as context:
+            with writer.batch():
+                for i in range(5):
+                    writer.log(self.feature, self.user, 'updated', f'Update {i}')
+                self.assertEqual(Activity.objects.count(), 0)
+        self.assertEqual(Activity.objects.count(), 5)
+        self.assertEqual(len(self.inserts(context)), 1)
+
+    def test_sync_batch_discarded_on_error(self):
+        writer = ActivityWriter('sync')
+        with self.assertRaises(ValueError):
+            with writer.batch():
+                writer.log(self.feature, self.user, 'updated', 'Update')
+                raise ValueError
+        self.assertEqual(Activity.objects.count(), 0)
+
+    def test_after_response_writes_once_request_finishes(self):
+        writer = ActivityWriter('after_response')
+        with self.captureOnCommitCallbacks(execute=True):
+            writer.log(self.feature, self.user, 'updated', 'First')
+            writer.log(self.feature, self.user, 'updated', 'Second')
+        self.assertEqual(Activity.objects.count(), 0)
+        with CaptureQueriesContext(connection) as context:
+            writer.flush_request()
+        self.assertEqual(Activity.objects.count(), 2)
+        self.assertEqual(len(self.inserts(context)), 1)
+
+    def test_queued_entries_keep_logged_time(self):
+        writer = ActivityWriter('after_response')
+        logged_at = timezone.now() - timedelta(minutes=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch('features.activity.timezone.now', return_value=logged_at):
+                writer.log(self.feature, self.user, 'updated', 'Queued')
+        writer.flush_request()
+        self.assertEqual(Activity.objects.get().created_at, logged_at)
+
+    def test_rolled_back_entries_are_never_written(self):
+        writer = ActivityWriter('after_response')
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    writer.log(self.feature, self.user, 'updated', 'Rolled back')
+                    raise ValueError
+            except ValueError:
+                pass
+        writer.flush_request()
+        self.assertEqual(Activity.objects.count(), 0)
+
+    def test_background_queue_flushed_on_shutdown(self):
+        writer = ActivityWriter('background', flush_interval=3600)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                writer.log(self.feature, self.user, 'updated', f'Update {i}')
+        self.assertEqual(Activity.objects.count(), 0)
+        writer.shutdown()
+        self.assertEqual(Activity.objects.count(), 3)
+
+    def test_unknown_delivery_rejected(self):
+        with self.assertRaises(ValueError):
+            ActivityWriter('eventually')
+
+
+# The query budgets below are for the bulk work; keep throttle writes out of them
+@override_settings(THROTTLE_STORE={'BACKEND': 'cache', 'CACHE_ALIAS': 'default'})
+class BulkOperationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.features = [
+            Feature.objects.create(
+                title=f'Feature {i}',
+                business_problem='Problem',
+                expected_value='Value',
+                affected_users='Users',
+                created_by=self.user
+            )
+            for i in range(3)
+        ]
+        self.url = '/api/features/bulk/'
+
+    def item(self, title):
+        return {
+            'title': title,
+            'business_problem': 'Problem',
+            'expected_value': 'Value',
+            'affected_users': 'Users',
+        }
+
+    def test_bulk_create(self):
+        items = [self.item(f'New {i}') for i in range(20)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row['title'] for row in response.data['results']], [item['title'] for item in items])
+        self.assertEqual(response.data['results'][0]['priority_score'], 0.0)
+        self.assertEqual(response.data['results'][0]['created_by']['username'], 'testuser')
+        self.assertEqual(Feature.objects.count(), 23)
+        self.assertEqual(Activity.objects.filter(action='created').count(), 20)
+        self.assertLess(len(context.captured_queries), 15)
+        self.assertEqual(len(search.search_features('New', limit=100)), 20)
+
+    def test_bulk_create_is_all_or_nothing(self):
+        items = [self.item('Valid'), {'title': 'Missing fields'}]
+        response = self.client.post(self.url, {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['items'][0], {})
+        self.assertIn('business_problem', response.data['items'][1])
+        self.assertEqual(Feature.objects.count(), 3)
+
+    def test_bulk_update(self):
+        items = [{'id': feature.pk, 'title': f'Renamed {feature.pk}', 'effort': 1} for feature in self.features]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(self.url, {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['title'], f'Renamed {self.features[0].pk}')
+        self.assertEqual(response.data['results'][0]['priority_score'], 2.0)
+        feature_updates = [
+            q for q in context.captured_queries
+            if q['sql'].startswith('UPDATE "features_feature"') and '"title"' in q['sql']
+        ]
+        self.assertEqual(len(feature_updates), 1)
+        self.assertEqual(Activity.objects.filter(action='updated').count(), 3)
+        self.assertEqual(len(search.search_features('Renamed')), 3)
+
+    def test_bulk_update_reports_per_item_errors(self):
+        items = [
+            {'id': self.features[0].pk, 'effort': 11},
+            {'id': 999999, 'title': 'Nope'},
+            {'id': self.features[1].pk, 'status': 'approved'},
+            {'id': self.features[2].pk, 'title': 'Fine'},
+        ]
+        response = self.client.patch(self.url, {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data['items']
+        self.assertIn('effort', errors[0])
+        self.assertIn('id', errors[1])
+        self.assertIn('status', errors[2])
+        self.assertEqual(errors[3], {})
+        self.assertFalse(Feature.objects.filter(title='Fine').exists())
+
+    def test_bulk_status_change(self):
+        items = [
+            {'id': feature.pk, 'status': 'approved', 'justification': 'Triage', 'from_status': 'proposed'}
+            for feature in self.features
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(f'{self.url}status/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({row['status'] for row in response.data['results']}, {'approved'})
+        self.assertEqual(Feature.objects.filter(status='approved').count(), 3)
+        self.assertEqual(StatusChange.objects.filter(from_status='proposed', to_status='approved').count(), 3)
+        self.assertEqual(Activity.objects.filter(action='status_changed').count(), 3)
+        self.assertLess(len(context.captured_queries), 13)
+
+    def test_bulk_status_validates_transitions(self):
+        items = [
+            {'id': self.features[0].pk, 'status': 'done', 'justification': 'Skip ahead'},
+            {'id': self.features[1].pk, 'status': 'approved', 'justification': 'Fine'},
+        ]
+        response = self.client.post(f'{self.url}status/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data['items'][0])
+        self.assertEqual(response.data['items'][1], {})
+        self.assertFalse(StatusChange.objects.exists())
+
+    def test_bulk_status_stale_from_status_conflicts(self):
+        items = [{'id': self.features[0].pk, 'status': 'approved', 'justification': 'Go', 'from_status': 'approved'}]
+        response = self.client.post(f'{self.url}status/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn('from_status', response.data['items'][0])
+
+    def test_bulk_status_concurrent_move_rolls_back(self):
+        stale = list(Feature.objects.select_related('created_by').order_by('pk'))
+        Feature.objects.filter(pk=stale[1].pk).update(status='under_discussion')
+        items = [{'id': feature.pk, 'status': 'approved', 'justification': 'Go'} for feature in stale]
+        with mock.patch('features.bulk.resolve', return_value=(stale, [{}, {}, {}])):
+            response = self.client.post(f'{self.url}status/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['items'][0], {})
+        self.assertIn('from_status', response.data['items'][1])
+        self.assertFalse(Feature.objects.filter(status='approved').exists())
+        self.assertFalse(StatusChange.objects.exists())
+
+    def test_bulk_delete(self):
+        for feature in self.features:
+            Comment.objects.create(feature=feature, author=self.user, content='Searchable note', tag='idea')
+        ids = [feature.pk for feature in self.features[:2]]
+        self.client.get(f'/api/features/{ids[0]}/')
+        response = self.client.delete(self.url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in response.data['results']], ids)
+        self.assertEqual(Feature.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(search.search_features('Searchable'), [self.features[2].pk])
+        self.assertEqual(self.client.get(f'/api/features/{ids[0]}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_delete_unknown_id(self):
+        response = self.client.delete(self.url, {'ids': [self.features[0].pk, 999999]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['ids'][0], {})
+        self.assertEqual(Feature.objects.count(), 3)
+
+    def test_out_of_range_ids_rejected(self):
+        for pk in [10 ** 30, 0, -1]:
+            for method, url, data in [
+                (self.client.patch, self.url, {'items': [{'id': pk, 'title': 'Nope'}]}),
+                (self.client.post, f'{self.url}status/', {'items': [{'id': pk, 'status': 'approved', 'justification': 'Go'}]}),
+                (self.client.delete, self.url, {'ids': [pk]}),
+            ]:
+                response = method(url, data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, (url, pk))
+                errors = response.data.get('items') or response.data['ids']
+                self.assertIn('A feature id is required.', str(errors[0]))
+
+    def test_item_limit(self):
+        response = self.client.post(self.url, {'items': [self.item('x')] * 501}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportExportTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.bystander = User.objects.create_user(username='bystander', email='by@example.com', password='testpass123')
+        self.user.is_staff = True
+        self.user.save()
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.feature = Feature.objects.create(
+            title='Exported feature',
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            status='approved',
+            effort=3,
+            created_by=self.user
+        )
+        self.other_feature = Feature.objects.create(
+            title='Other feature',
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            complexity='high',
+            created_by=self.other
+        )
+        Comment.objects.create(feature=self.feature, author=self.other, content='Needs "quotes", commas\nand lines', tag='risk')
+        StatusChange.objects.create(
+            feature=self.feature, changed_by=self.user,
+            from_status='proposed', to_status='approved', justification='Approved'
+        )
+        Activity.objects.create(feature=self.feature, user=self.user, action='created', description='Created')
+        Feature.objects.filter(pk=self.feature.pk).update(created_at='2024-01-02T03:04:05Z')
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_features', *args, stdout=out)
+        return out.getvalue()
+
+    def round_trip(self, output_format):
+        path = f'{self.tmpdir}/dump.{output_format}'
+        call_command('export_features', path, stdout=StringIO())
+        # Import into an emptied database; users are matched by username
+        Feature.objects.all().delete()
+        User.objects.filter(username='other').delete()
+        call_command('import_features', path, stdout=StringIO())
+
+        feature = Feature.objects.get(title='Exported feature')
+        self.assertEqual(feature.status, 'approved')
+        self.assertEqual(feature.effort, 3)
+        self.assertEqual(feature.created_by, self.user)
+        self.assertEqual(feature.created_at.isoformat(), '2024-01-02T03:04:05+00:00')
+        comment = feature.comments.get()
+        self.assertEqual(comment.content, 'Needs "quotes", commas\nand lines')
+        self.assertEqual(comment.author.username, 'other')
+        self.assertFalse(comment.author.has_usable_password())
+        self.assertEqual(feature.status_changes.get().justification, 'Approved')
+        self.assertEqual(feature.activities.get().action, 'created')
+        self.assertEqual(Feature.objects.get(title='Other feature').created_by.username, 'other')
+        self.assertEqual(search.search_features('quotes'), [feature.pk])
+
+    def setup_tmpdir(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmpdir = tmp.name
+
+    def test_ndjson_round_trip(self):
+        self.setup_tmpdir()
+        self.round_trip('ndjson')
+
+    def test_csv_round_trip(self):
+        self.setup_tmpdir()
+        self.round_trip('csv')
+
+    def test_ndjson_lines(self):
+        lines = self.export().splitlines()
+        types = [json.loads(line)['type'] for line in lines]
+        self.assertEqual(types, ['user', 'user', 'feature', 'feature', 'comment', 'status_change', 'activity'])
+        feature = json.loads(lines[2])
+        self.assertEqual(feature['created_by'], self.user.pk)
+        self.assertNotIn('password', json.loads(lines[0]))
+
+    def test_export_streams_in_chunks(self):
+        records = transfer.export_records(chunk_size=1)
+        with CaptureQueriesContext(connection) as context:
+            next(records)
+        # Ceilings plus the first table's cursor; nothing else is read yet
+        self.assertEqual(len(context.captured_queries), 6)
+
+    def test_endpoint_streams_filtered_export(self):
+        response = self.client.get('/api/features/export/?output=csv&complexity=high')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['title'] for row in rows if row['type'] == 'feature'], ['Other feature'])
+        self.assertFalse([row for row in rows if row['type'] == 'comment'])
+
+    def test_endpoint_exports_only_referenced_users(self):
+        response = self.client.get('/api/features/export/?complexity=high')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['username'] for record in records if record['type'] == 'user'], ['other'])
+
+    def test_endpoint_requires_staff(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.other).access_token}')
+        self.assertEqual(client.get('/api/features/export/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_endpoint_rejects_unknown_output(self):
+        response = self.client.get('/api/features/export/?output=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_unknown_reference_rolls_back(self):
+        self.setup_tmpdir()
+        path = f'{self.tmpdir}/bad.ndjson'
+        with open(path, 'w') as output:
+            output.write(json.dumps({'type': 'user', 'id': 1, 'username': 'fresh', 'email': ''}) + '\n')
+            output.write(json.dumps({'type': 'comment', 'id': 1, 'feature': 42, 'author': 1, 'content': 'x', 'tag': 'idea'}) + '\n')
+        with self.assertRaisesMessage(CommandError, 'Line 2: feature refers to unknown feature'):
+            call_command('import_features', path, stdout=StringIO())
+        self.assertFalse(User.objects.filter(username='fresh').exists())
+
+    def test_import_malformed_records(self):
+        self.setup_tmpdir()
+        path = f'{self.tmpdir}/bad.ndjson'
+        for record, message in [
+            ({'type': 'user', 'id': 'x', 'username': 'fresh'}, "Line 1: invalid id 'x'"),
+            ({'type': 'user', 'id': 1, 'email': ''}, 'Line 1: missing username'),
+            ({'type': 'user', 'id': 1, 'username': ['fresh']}, "Line 1: invalid username ['fresh']"),
+        ]:
+            with open(path, 'w') as output:
+                output.write(json.dumps(record) + '\n')
+            with self.assertRaisesMessage(CommandError, message):
+                call_command('import_features', path, stdout=StringIO())
+
+    def test_import_validates_fields_and_choices(self):
+        self.setup_tmpdir()
+        path = f'{self.tmpdir}/bad.ndjson'
+        user = {'type': 'user', 'id': 1, 'username': 'fresh', 'email': ''}
+        feature = {
+            'type': 'feature', 'id': 1, 'title': 'Imported', 'business_problem': 'P', 'expected_value': 'V',
+            'affected_users': 'U', 'created_by': 1,
+        }
+        for record, message in [
+            ({**feature, 'status': 'bogus'}, "Line 2: status: Value 'bogus' is not a valid choice."),
+            ({**feature, 'complexity': 'gigantic'}, "Line 2: complexity: Value 'gigantic' is not a valid choice."),
+            ({**feature, 'effort': -3}, 'Line 2: effort: Ensure this value is greater than or equal to 1.'),
+            ({**feature, 'business_value': 99}, 'Line 2: business_value: Ensure this value is less than or equal to 10.'),
+            ({key: value for key, value in feature.items() if key != 'title'}, 'Line 2: title: This field cannot be blank.'),
+            ({**feature, 'title': ['Imported']}, "Line 2: invalid title ['Imported']"),
+        ]:
+            with open(path, 'w') as output:
+                output.write(json.dumps(user) + '\n')
+                output.write(json.dumps(record) + '\n')
+            with self.assertRaisesMessage(CommandError, message):
+                call_command('import_features', path, stdout=StringIO())
+        self.assertFalse(User.objects.filter(username='fresh').exists())
+
+    def test_import_keeps_only_referenced_ids(self):
+        importer = transfer.Importer()
+        importer.run(transfer.parse(self.export().splitlines(), 'ndjson'))
+        self.assertEqual(set(importer.ids), {'user', 'feature'})
+
+
+class ChangeFeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.features = [self.create(f'Feature {i}') for i in range(3)]
+        self.url = '/api/features/changes/'
+
+    def create(self, title):
+        return Feature.objects.create(
+            title=title,
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            created_by=self.user
+        )
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_full_sync_then_nothing_new(self):
+        data = self.sync()
+        self.assertEqual([row['id'] for row in data['results']], [f.pk for f in self.features])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+        again = self.sync(data['next'])
+        self.assertEqual(again['results'], [])
+        self.assertEqual(again['next'], data['next'])
+
+    def test_only_changed_rows_returned(self):
+        token = self.sync()['next']
+        self.client.patch(f'/api/features/{self.features[1].pk}/', {'title': 'Renamed'})
+        self.client.post(f'/api/features/{self.features[0].pk}/change_status/', {
+            'status': 'approved', 'justification': 'Go'
+        })
+        created = self.create('New one')
+        data = self.sync(token)
+        self.assertEqual(
+            [row['id'] for row in data['results']],
+            [self.features[1].pk, self.features[0].pk, created.pk]
+        )
+        self.assertEqual(data['results'][0]['title'], 'Renamed')
+        self.assertEqual(data['results'][1]['status'], 'approved')
+
+    def test_deletes_become_tombstones(self):
+        token = self.sync()['next']
+        self.client.delete(f'/api/features/{self.features[0].pk}/')
+        self.client.delete('/api/features/bulk/', {'ids': [self.features[2].pk]}, format='json')
+        data = self.sync(token)
+        self.assertEqual(data['results'], [])
+        self.assertEqual(data['deleted'], [self.features[0].pk, self.features[2].pk])
+
+    def test_pages_through_rows_sharing_a_sequence(self):
+        token = self.sync()['next']
+        items = [{'id': f.pk, 'effort': 2} for f in self.features]
+        self.client.patch('/api/features/bulk/', {'items': items}, format='json')
+        seen = []
+        while True:
+            data = self.sync(token, limit=2)
+            seen += [row['id'] for row in data['results']]
+            token = data['next']
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, [f.pk for f in self.features])
+
+    def test_sequence_increases_with_every_write(self):
+        feature = self.features[0]
+        before = feature.change_seq
+        feature.title = 'Saved'
+        feature.save(update_fields=['title'])
+        feature.refresh_from_db()
+        self.assertGreater(feature.change_seq, before)
+        self.assertGreater(feature.change_seq, self.features[2].change_seq)
+
+    def test_invalid_token(self):
+        response = self.client.get(self.url, {'since': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_holds_back_unsettled_changes(self):
+        with mock.patch.object(ChangeSequence, 'visible_below', return_value=self.features[2].change_seq):
+            data = self.sync()
+        self.assertEqual([row['id'] for row in data['results']], [f.pk for f in self.features[:2]])
+        data = self.sync(data['next'])
+        self.assertEqual([row['id'] for row in data['results']], [self.features[2].pk])
+
+    def test_pruned_tombstones_force_resync(self):
+        ids = [f.pk for f in self.features]
+        old_token = self.sync()['next']
+        self.features[0].delete()
+        self.features[1].delete()
+        FeatureTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=100))
+        current_token = self.sync(old_token)['next']
+        self.features[2].delete()
+        out = StringIO()
+        call_command('prune_feature_tombstones', stdout=out)
+        self.assertIn('Pruned 1 tombstones', out.getvalue())
+
+        response = self.client.get(self.url, {'since': old_token})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual(self.sync(current_token)['deleted'], [ids[2]])
+        self.assertEqual(self.sync()['deleted'], ids[1:])
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.feature = Feature.objects.create(
+            title='Feature',
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            created_by=self.user
+        )
+        self.other = Feature.objects.create(
+            title='Other',
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            created_by=self.user
+        )
+
+    def write_activity(self, feature, description):
+        with self.captureOnCommitCallbacks(execute=True):
+            log_activity(feature=feature, user=self.user, action='commented', description=description)
+
+    async def next_frame(self, frames):
+        return await asyncio.wait_for(anext(frames), 5)
+
+    async def get_ticket(self):
+        response = await self.async_client.post(
+            '/api/stream/ticket/', headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['ticket']
+
+    async def open_stream(self, query='', **kwargs):
+        response = await self.async_client.get(f'/api/stream/?ticket={await self.get_ticket()}{query}', **kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = aiter(response.streaming_content)
+        self.assertEqual(await self.next_frame(frames), b'retry: 3000\n\n')
+        return frames
+
+    async def test_pushes_activities_for_the_feature(self):
+        frames = await self.open_stream(f'&feature={self.feature.pk}')
+        try:
+            await sync_to_async(self.write_activity)(self.other, 'Elsewhere')
+            await sync_to_async(self.write_activity)(self.feature, 'Hello')
+            frame = (await self.next_frame(frames)).decode()
+        finally:
+            await frames.aclose()
+        self.assertIn('event: activity\n', frame)
+        payload = json.loads(frame.split('data: ', 1)[1])
+        self.assertEqual(payload['description'], 'Hello')
+        self.assertEqual(payload['user']['username'], 'testuser')
+
+    async def test_rolled_back_activity_is_not_pushed(self):
+        frames = await self.open_stream()
+        try:
+            def rolled_back():
+                with self.captureOnCommitCallbacks(execute=True):
+                    try:
+                        with transaction.atomic():
+                            log_activity(feature=self.feature, user=self.user, action='updated', description='Undone')
+                            raise ValueError
+                    except ValueError:
+                        pass
+                    log_activity(feature=self.feature, user=self.user, action='updated', description='Kept')
+            await sync_to_async(rolled_back)()
+            frame = (await self.next_frame(frames)).decode()
+        finally:
+            await frames.aclose()
+        self.assertIn('Kept', frame)
+
+    async def test_replays_missed_activities(self):
+        first = await Activity.objects.acreate(feature=self.feature, user=self.user, action='updated', description='Seen')
+        await Activity.objects.acreate(feature=self.feature, user=self.user, action='updated', description='Missed')
+        frames = await self.open_stream(f'&feature={self.feature.pk}', headers={'Last-Event-ID': str(first.pk)})
+        try:
+            frame = (await self.next_frame(frames)).decode()
+        finally:
+            await frames.aclose()
+        self.assertIn('Missed', frame)
+
+    async def test_replays_more_than_one_page(self):
+        first = await Activity.objects.acreate(feature=self.feature, user=self.user, action='updated', description='Seen')
+        for i in range(5):
+            await Activity.objects.acreate(feature=self.feature, user=self.user, action='updated', description=f'Missed {i}')
+        broker = events.LocalBroker()
+        frames = events.stream(broker.subscribe(self.feature.pk), last_event_id=first.pk, replay_limit=2)
+        try:
+            self.assertEqual(await self.next_frame(frames), 'retry: 3000\n\n')
+            replayed = [await self.next_frame(frames) for _ in range(5)]
+        finally:
+            await frames.aclose()
+        self.assertEqual([json.loads(frame.split('data: ', 1)[1])['description'] for frame in replayed],
+                         [f'Missed {i}' for i in range(5)])
+
+    async def test_requires_ticket(self):
+        response = await self.async_client.get('/api/stream/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/stream/?ticket=bogus')
+        self.assertEqual(response.status_code, 401)
+        # Access tokens don't belong in URLs
+        response = await self.async_client.get(f'/api/stream/?token={self.token}')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_ticket_is_single_use(self):
+        ticket = await self.get_ticket()
+        response = await self.async_client.get(f'/api/stream/?ticket={ticket}&feature=999999')
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(f'/api/stream/?ticket={ticket}&feature=999999')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_ticket_expires(self):
+        ticket = await self.get_ticket()
+        with override_settings(EVENT_STREAM={**settings.EVENT_STREAM, 'TICKET_TTL': -1}):
+            response = await self.async_client.get(f'/api/stream/?ticket={ticket}')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_ends_when_credentials_expire(self):
+        broker = events.LocalBroker()
+        frames = events.stream(broker.subscribe(self.feature.pk), keepalive=5, expires_at=time.time() + 0.05)
+        self.assertEqual(await self.next_frame(frames), 'retry: 3000\n\n')
+        with self.assertRaises(StopAsyncIteration):
+            await self.next_frame(frames)
+        self.assertFalse(broker._topics)
+
+    def test_refused_under_wsgi(self):
+        response = self.client.get('/api/stream/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, 501)
+
+    async def test_unknown_feature(self):
+        response = await self.async_client.get(
+            '/api/stream/?feature=999999', headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_malformed_ids_rejected(self):
+        headers = {'Authorization': f'Bearer {self.token}'}
+        for value in ['\u00b2', '99999999999999999999']:
+            response = await self.async_client.get('/api/stream/', {'feature': value}, headers=headers)
+            self.assertEqual(response.status_code, 400)
+            response = await self.async_client.get('/api/stream/', {'last_event_id': value}, headers=headers)
+            self.assertEqual(response.status_code, 400)
+
+    async def test_database_backend_polls_for_new_activities(self):
+        broker = events.DatabaseBroker(poll_interval=0.01)
+        subscription = broker.subscribe(self.feature.pk)
+        await asyncio.sleep(0.05)
+        await Activity.objects.acreate(feature=self.feature, user=self.user, action='updated', description='Polled')
+        event = await subscription.get(5)
+        broker.unsubscribe(subscription)
+        self.assertIn('Polled', event[1])
+
+    async def test_closed_stream_unsubscribes(self):
+        broker = events.LocalBroker()
+        frames = events.stream(broker.subscribe(self.feature.pk))
+        await anext(frames)
+        self.assertTrue(broker._topics)
+        await frames.aclose()
+        self.assertFalse(broker._topics)
+
+    async def test_slow_subscriber_is_disconnected(self):
+        broker = events.LocalBroker(queue_size=2)
+        subscription = broker.subscribe(self.feature.pk)
+        broker.publish([(self.feature.pk, (i, f'frame {i}')) for i in range(3)])
+        await asyncio.sleep(0)
+        self.assertIs(await subscription.get(1), events.OVERFLOW)
+        self.assertFalse(broker._topics)
+
+
+class AsyncReadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth['Authorization'])
+        self.features = [
+            Feature.objects.create(
+                title=f'Feature {i}',
+                business_problem='Problem',
+                expected_value='Value',
+                affected_users='Users',
+                complexity='high' if i % 2 else 'low',
+                created_by=self.user
+            )
+            for i in range(25)
+        ]
+        self.feature = self.features[0]
+        for i in range(3):
+            Comment.objects.create(feature=self.feature, author=self.user, content=f'Comment {i}', tag='idea')
+            Activity.objects.create(feature=self.feature, user=self.user, action='commented', description=f'Activity {i}')
+
+    async def assert_same(self, path):
+        sync_response = await sync_to_async(self.client.get)(f'/api{path}')
+        async_response = await self.async_client.get(f'/api/async{path}', headers=self.auth)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        # Pagination links point back at the endpoint that served them
+        body = async_response.content.decode().replace('/api/async/', '/api/')
+        self.assertEqual(json.loads(body), sync_response.json())
+        return async_response
+
+    async def test_feature_list_matches_sync(self):
+        response = await self.assert_same('/features/')
+        self.assertEqual(response.json()['count'], 25)
+        await self.assert_same('/features/?page=2&complexity=high&ordering=priority_score')
+        await self.assert_same('/features/?fields=id,title&search=Feature')
+
+    async def test_cursor_pagination_matches_sync(self):
+        response = await self.assert_same('/features/?pagination=cursor')
+        cursor = response.json()['next'].split('cursor=')[1]
+        await self.assert_same(f'/features/?cursor={cursor}')
+
+    async def test_feature_detail_matches_sync(self):
+        await self.assert_same(f'/features/{self.feature.pk}/')
+        await self.assert_same(f'/features/{self.feature.pk}/?expand=comments&omit=more')
+        await self.assert_same('/features/999999/')
+
+    async def test_collections_match_sync(self):
+        response = await self.assert_same(f'/features/{self.feature.pk}/comments/')
+        self.assertEqual(response.json()['count'], 3)
+        await self.assert_same(f'/features/{self.feature.pk}/activities/?pagination=cursor')
+
+    async def test_invalid_params_rejected(self):
+        await self.assert_same('/features/?status=bogus')
+        await self.assert_same('/features/?page=99')
+
+    async def test_serializes_off_the_event_loop(self):
+        loop_thread = threading.current_thread()
+        threads = set()
+        to_representation = FeatureDetailSerializer.to_representation
+
+        def record(serializer, instance):
+            threads.add(threading.current_thread())
+            return to_representation(serializer, instance)
+
+        with mock.patch.object(FeatureDetailSerializer, 'to_representation', record):
+            response = await self.async_client.get(f'/api/async/features/{self.feature.pk}/', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/api/async/features/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_read_only(self):
+        response = await self.async_client.post('/api/async/features/', {}, headers=self.auth)
+        self.assertEqual(response.status_code, 405)
+
+
+class FeatureCounterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.feature = self.create('Feature')
+
+    def create(self, title):
+        return Feature.objects.create(
+            title=title,
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            created_by=self.user
+        )
+
+    def comment(self, tag, feature=None):
+        feature = feature or self.feature
+        response = self.client.post(f'/api/features/{feature.pk}/comments/', {'content': 'Hmm', 'tag': tag})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def counts(self, feature=None):
+        feature = feature or self.feature
+        feature.refresh_from_db()
+        return (
+            feature.comment_count, feature.question_comment_count, feature.idea_comment_count,
+            feature.risk_comment_count, feature.agreement_comment_count,
+        )
+
+    def test_comments_move_counters(self):
+        self.comment('risk')
+        self.comment('risk')
+        self.comment('idea')
+        self.assertEqual(self.counts(), (3, 0, 1, 2, 0))
+
+    def test_retag_and_delete(self):
+        comment = Comment.objects.get(pk=self.comment('risk'))
+        comment.tag = 'agreement'
+        comment.save()
+        self.assertEqual(self.counts(), (1, 0, 0, 0, 1))
+        comment.content = 'Edited'
+        comment.save()
+        self.assertEqual(self.counts(), (1, 0, 0, 0, 1))
+        comment.delete()
+        self.assertEqual(self.counts(), (0, 0, 0, 0, 0))
+
+    def test_deleting_feature_skips_counter_updates(self):
+        self.comment('risk')
+        self.comment('idea')
+        with CaptureQueriesContext(connection) as context:
+            self.feature.delete()
+        updates = [q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE "features_feature"')]
+        self.assertEqual(updates, [])
+
+    def test_counters_use_f_updates(self):
+        with CaptureQueriesContext(connection) as context:
+            self.comment('question')
+        updates = [q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE "features_feature"')]
+        self.assertTrue(any('"comment_count" = ("features_feature"."comment_count" + 1)' in sql for sql in updates))
+
+    def test_comment_rolls_back_with_counter_failure(self):
+        with mock.patch('features.counters.comments_changed', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Comment.objects.create(feature=self.feature, author=self.user, content='x', tag='idea')
+        self.assertFalse(Comment.objects.exists())
+
+    def test_last_activity_at_follows_activities(self):
+        self.feature.refresh_from_db()
+        before = self.feature.last_activity_at
+        log_activity(self.feature, self.user, 'updated', 'Touched')
+        self.feature.refresh_from_db()
+        self.assertGreater(self.feature.last_activity_at, before)
+        self.assertEqual(self.feature.last_activity_at, Activity.objects.get().created_at)
+
+    def test_counter_changes_reach_change_feed(self):
+        token = self.client.get('/api/features/changes/').data['next']
+        self.comment('idea')
+        data = self.client.get('/api/features/changes/', {'since': token}).data
+        self.assertEqual([row['comment_count'] for row in data['results']], [1])
+
+    def test_list_sorts_without_joins(self):
+        quiet = self.create('Quiet')
+        self.comment('idea')
+        self.comment('risk')
+        self.comment('question', feature=quiet)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/features/', {'ordering': '-comment_count'})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.feature.pk, quiet.pk])
+        self.assertEqual(response.data['results'][0]['comment_count'], 2)
+        self.assertEqual(response.data['results'][0]['risk_comment_count'], 1)
+        listing = [q['sql'] for q in context.captured_queries if 'ORDER BY' in q['sql']][0]
+        self.assertNotIn('features_comment', listing)
+
+        response = self.client.get('/api/features/', {'ordering': '-last_activity_at'})
+        self.assertEqual(response.data['results'][0]['id'], quiet.pk)
+
+    def test_recently_active_cursor_pages(self):
+        for i in range(4):
+            self.create(f'Extra {i}')
+        with mock.patch('features.pagination.KeysetPagination.page_size', 2):
+            response = self.client.get('/api/features/', {'ordering': '-last_activity_at', 'pagination': 'cursor'})
+            seen = [row['id'] for row in response.data['results']]
+            while response.data['next']:
+                response = self.client.get(response.data['next'])
+                seen += [row['id'] for row in response.data['results']]
+        self.assertEqual(sorted(seen), sorted(Feature.objects.values_list('pk', flat=True)))
+
+    def test_repair_command(self):
+        self.comment('risk')
+        log_activity(self.feature, self.user, 'updated', 'Touched')
+        Feature.objects.filter(pk=self.feature.pk).update(comment_count=7, risk_comment_count=0)
+        other = self.create('Other')
+        Comment.objects.bulk_create([Comment(feature=other, author=self.user, content='x', tag='idea')])
+        out = StringIO()
+        call_command('repair_feature_counters', stdout=out)
+        self.assertIn('Repaired counters on 2 features', out.getvalue())
+        self.assertEqual(self.counts(), (1, 0, 0, 1, 0))
+        self.assertEqual(self.counts(other), (1, 0, 1, 0, 0))
+        out = StringIO()
+        call_command('repair_feature_counters', stdout=out)
+        self.assertIn('Repaired counters on 0 features', out.getvalue())
+
+    def test_import_fills_counters(self):
+        self.comment('question')
+        self.comment('idea')
+        lines = list(transfer.to_ndjson(transfer.export_records()))
+        transfer.Importer().run(transfer.parse(lines, 'ndjson'))
+        imported = Feature.objects.exclude(pk=self.feature.pk).get()
+        self.assertEqual(self.counts(imported), (2, 1, 1, 0, 0))
+        self.assertEqual(imported.last_activity_at, Activity.objects.filter(feature=imported).latest('created_at').created_at)
+
+
+class FeatureStatsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.url = '/api/features/stats/'
+        self.features = [
+            self.create('A', 'proposed', 'low', self.user, business_value=10, effort=1, risk=1),
+            self.create('B', 'proposed', 'high', self.user, business_value=1, effort=10, risk=10),
+            self.create('C', 'done', 'low', self.other),
+        ]
+
+    def create(self, title, status_value, complexity, user, **scores):
+        return Feature.objects.create(
+            title=title,
+            business_problem='Problem',
+            expected_value='Value',
+            affected_users='Users',
+            status=status_value,
+            complexity=complexity,
+            created_by=user,
+            **scores
+        )
+
+    def test_aggregates(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['by_status'], {
+            'proposed': 2, 'under_discussion': 0, 'approved': 0, 'in_progress': 0, 'done': 1,
+        })
+        self.assertEqual(response.data['by_complexity'], {'low': 2, 'medium': 0, 'high': 1})
+        self.assertEqual(response.data['by_creator'], [
+            {'id': self.user.pk, 'username': 'testuser', 'count': 2},
+            {'id': self.other.pk, 'username': 'other', 'count': 1},
+        ])
+        # (9.0 - 9.0 + 0.0) / 3
+        self.assertEqual(response.data['average_priority'], 0.0)
+
+    def test_one_aggregate_query_then_cached(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        self.assertEqual(len([q for q in context.captured_queries if 'GROUP BY' in q['sql']]), 1)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        self.assertFalse([q for q in context.captured_queries if 'features_feature' in q['sql']])
+
+    def test_writes_invalidate(self):
+        self.assertEqual(self.client.get(self.url).data['by_status']['approved'], 0)
+        self.client.post(f'/api/features/{self.features[0].pk}/change_status/', {
+            'status': 'approved', 'justification': 'Go'
+        })
+        self.assertEqual(self.client.get(self.url).data['by_status']['approved'], 1)
+        self.client.patch(f'/api/features/{self.features[0].pk}/', {'complexity': 'medium'})
+        self.assertEqual(self.client.get(self.url).data['by_complexity']['medium'], 1)
+        self.client.delete('/api/features/bulk/', {'ids': [self.features[1].pk]}, format='json')
+        self.assertEqual(self.client.get(self.url).data['total'], 2)
+
+    def test_comments_leave_cache_alone(self):
+        self.client.get(self.url)
+        self.client.post(f'/api/features/{self.features[0].pk}/comments/', {'content': 'Hi', 'tag': 'idea'})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        self.assertFalse([q for q in context.captured_queries if 'GROUP BY' in q['sql']])
+
+    def test_empty(self):
+        Feature.objects.all().delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['total'], 0)
+        self.assertIsNone(response.data['average_priority'])
+        self.assertEqual(response.data['by_creator'], [])
+
+
+class ThrottleStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def check_store(self, store):
+        # 4 per minute: a burst of 4, then one every 15 seconds
+        results = [store.consume('key', 4, 60, 1000.0) for _ in range(5)]
+        self.assertEqual([allowed for allowed, _ in results], [True, True, True, True, False])
+        self.assertAlmostEqual(results[-1][1], 15.0, places=2)
+        self.assertEqual(store.consume('key', 4, 60, 1010.0)[0], False)
+        self.assertEqual(store.consume('key', 4, 60, 1015.0)[0], True)
+        self.assertEqual(store.consume('key', 4, 60, 1015.0)[0], False)
+        # Idle for a full period refills the bucket
+        self.assertEqual([store.consume('key', 4, 60, 1100.0)[0] for _ in range(5)], [True] * 4 + [False])
+        self.assertEqual(store.consume('other', 4, 60, 1100.0)[0], True)
+
+    def test_cache_store(self):
+        self.check_store(CacheThrottleStore())
+        # One integer per key, however high the rate
+        self.assertIsInstance(cache.get(CacheThrottleStore.key_prefix + 'key'), int)
+
+    def test_database_store(self):
+        self.check_store(DatabaseThrottleStore())
+        self.assertEqual(ThrottleBucket.objects.count(), 2)
+
+    def test_database_store_is_one_update(self):
+        store = DatabaseThrottleStore()
+        store.consume('key', 4, 60, 1000.0)
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(store.consume('key', 4, 60, 1000.0)[0])
+        self.assertEqual(len(context), 1)
+        self.assertTrue(context.captured_queries[0]['sql'].startswith('UPDATE'))
+
+    def test_new_key_leaves_other_buckets(self):
+        store = DatabaseThrottleStore()
+        store.consume('old', 4, 60, 1000.0)
+        with CaptureQueriesContext(connection) as context:
+            store.consume('new', 4, 60, 2000.0)
+        self.assertFalse([q for q in context.captured_queries if q['sql'].startswith('DELETE')])
+        self.assertEqual(ThrottleBucket.objects.count(), 2)
+
+    def test_prune_full_buckets(self):
+        store = DatabaseThrottleStore()
+        store.consume('old', 4, 60, time.time() - 1000)
+        store.consume('new', 4, 60, time.time())
+        out = StringIO()
+        call_command('prune_throttle_buckets', stdout=out)
+        self.assertIn('Pruned 1 throttle buckets', out.getvalue())
+        self.assertEqual(
+            list(ThrottleBucket.objects.values_list('key', flat=True)), [DatabaseThrottleStore.bucket_key('new')]
+        )
+
+    def test_unknown_store(self):
+        with override_settings(THROTTLE_STORE={'BACKEND': 'bogus'}):
+            with self.assertRaises(ValueError):
+                get_throttle_store()
+
+
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='testuser', password='testpass123')
+
+    def register(self):
+        return self.client.post('/api/auth/register/', {'username': 'testuser'})
+
+    def check_auth_limit(self):
+        statuses = [self.register().status_code for _ in range(6)]
+        self.assertEqual(statuses, [status.HTTP_400_BAD_REQUEST] * 5 + [status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertGreater(int(self.register()['Retry-After']), 0)
+
+    def test_auth_scope_limited_in_cache(self):
+        with override_settings(THROTTLE_STORE={'BACKEND': 'cache', 'CACHE_ALIAS': 'default'}):
+            self.check_auth_limit()
+
+    def test_auth_scope_limited_in_database(self):
+        self.check_auth_limit()
+        self.assertEqual(ThrottleBucket.objects.count(), 1)
+
+    def test_long_forwarded_for_is_stored_fixed_length(self):
+        response = self.client.post(
+            '/api/auth/register/', {'username': 'testuser'}, HTTP_X_FORWARDED_FOR=', '.join(['10.0.0.1'] * 100)
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([len(key) for key in ThrottleBucket.objects.values_list('key', flat=True)], [64])
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def user_queries(self, url='/api/auth/me/'):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        queries = [q for q in context.captured_queries if 'FROM "auth_user"' in q['sql']]
+        return response, len(queries)
+
+    def test_user_loaded_once(self):
+        response, queries = self.user_queries('/api/features/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries, 1)
+        response, queries = self.user_queries('/api/features/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries, 0)
+
+    def test_cache_keeps_no_password_hash(self):
+        self.client.get('/api/features/')
+        values, password_digest = cache.get(user_key(self.user.pk))
+        self.assertEqual(values, [self.user.pk, 'testuser', True])
+        self.assertNotEqual(password_digest, self.user.password)
+
+    def test_other_fields_load_from_database(self):
+        self.user.email = 'test@example.com'
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get('/api/features/')
+        response, queries = self.user_queries()
+        self.assertEqual(response.data['email'], 'test@example.com')
+        self.assertEqual(queries, 1)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, status.HTTP_200_OK)
+
+    def test_writes_use_cached_user(self):
+        self.client.get('/api/auth/me/')
+        response = self.client.post('/api/features/', {
+            'title': 'Feature',
+            'business_problem': 'Problem',
+            'expected_value': 'Value',
+            'affected_users': 'Users',
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Feature.objects.get().created_by, self.user)
+
+    def test_save_invalidates(self):
+        self.client.get('/api/auth/me/')
+        self.user.email = 'new@example.com'
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/me/').data['email'], 'new@example.com')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_delete_invalidates(self):
+        self.client.get('/api/auth/me/')
+        self.user.delete()
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(JWT_USER_CACHE_TIMEOUT=0)
+    def test_can_be_disabled(self):
+        self.user_queries()
+        self.assertEqual(self.user_queries()[1], 1)
+
+
+# Login authenticates on the hashing pool's threads, which only see committed rows
+class AsyncAuthTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+
+    async def login(self, password='testpass123', **extra):
+        return await self.async_client.post(
+            '/api/async/auth/login/', {'username': 'testuser', 'password': password, **extra},
+            content_type='application/json'
+        )
+
+    async def test_login(self):
+        response = await self.login()
+        self.assertEqual(response.status_code, 200)
+        access = response.json()['access']
+        me = await self.async_client.get('/api/async/features/', headers={'Authorization': f'Bearer {access}'})
+        self.assertEqual(me.status_code, 200)
+
+    async def test_no_csrf_token_needed(self):
+        client = AsyncClient(enforce_csrf_checks=True)
+        response = await client.post(
+            '/api/async/auth/login/', {'username': 'testuser', 'password': 'testpass123'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    async def test_bad_credentials_match_sync(self):
+        response = await self.login(password='wrong')
+        sync_response = await sync_to_async(self.client.post)(
+            '/api/auth/login/', {'username': 'testuser', 'password': 'wrong'}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), sync_response.json())
+        missing = await self.async_client.post(
+            '/api/async/auth/login/', {'username': 'nobody', 'password': 'x'}, content_type='application/json'
+        )
+        self.assertEqual(missing.status_code, 401)
+        blank = await self.async_client.post('/api/async/auth/login/', {}, content_type='application/json')
+        self.assertEqual(blank.status_code, 400)
+        self.assertIn('password', blank.json())
+
+    async def test_inactive_user_rejected(self):
+        self.user.is_active = False
+        await self.user.asave()
+        self.assertEqual((await self.login()).status_code, 401)
+
+    async def test_uses_authentication_backends(self):
+        # Only takes a REMOTE_USER, so the password is never checked
+        with override_settings(AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.RemoteUserBackend']):
+            self.assertEqual((await self.login()).status_code, 401)
+
+    async def test_updates_last_login_when_configured(self):
+        await self.login()
+        await self.user.arefresh_from_db()
+        self.assertIsNone(self.user.last_login)
+        with override_settings(SIMPLE_JWT={**settings.SIMPLE_JWT, 'UPDATE_LAST_LOGIN': True}):
+            self.assertEqual((await self.login()).status_code, 200)
+        await self.user.arefresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    async def test_register(self):
+        response = await self.async_client.post('/api/async/auth/register/', {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password': 'newpass123',
+            'password_confirm': 'newpass123',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['user']['username'], 'newuser')
+        self.assertIn('access', response.json()['tokens'])
+        user = await User.objects.aget(username='newuser')
+        self.assertTrue(await sync_to_async(user.check_password)('newpass123'))
+
+        again = await self.async_client.post('/api/async/auth/register/', {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password': 'newpass123',
+            'password_confirm': 'newpass123',
+        }, content_type='application/json')
+        self.assertEqual(again.status_code, 400)
+        self.assertIn('username', again.json())
+
+    async def test_register_throttled(self):
+        statuses = [
+            (await self.async_client.post('/api/async/auth/register/', {}, content_type='application/json')).status_code
+            for _ in range(6)
+        ]
+        self.assertEqual(statuses, [400] * 5 + [429])
+
+    async def test_full_pool_answers_503(self):
+        with mock.patch('features.async_views.pool', HashingPool(workers=1, max_pending=0)):
+            response = await self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class HashingPoolTests(TestCase):
+    async def test_bounded(self):
+        pool = HashingPool(workers=1, max_pending=2)
+        release = threading.Event()
+        first = asyncio.ensure_future(pool.run(release.wait, 5))
+        second = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0)
+        with self.assertRaises(HashingBusy):
+            await pool.run(sum, [1, 2])
+        release.set()
+        self.assertEqual(await first, True)
+        self.assertEqual(await second, True)
+        self.assertEqual(await pool.run(sum, [1, 2]), 3)
+
+    async def test_cancelled_request_keeps_slot_until_job_ends(self):
+        pool = HashingPool(workers=1, max_pending=1)
+        release = threading.Event()
+        waiter = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(HashingBusy):
+            await pool.run(sum, [1])
+        release.set()
+        await asyncio.sleep(0.1)
+        self.assertEqual(await pool.run(sum, [1]), 1)
+
+
+class DatabaseProfileTests(TestCase):
+    def open_file_connection(self, directory, options=None):
+        settings_dict = {**connections['default'].settings_dict, 'NAME': f'{directory}/profile.sqlite3'}
+        if options is not None:
+            settings_dict['OPTIONS'] = options
+        wrapper = type(connections['default'])(settings_dict, alias='profile')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragmas(self, wrapper):
+        with wrapper.cursor() as cursor:
+            return {
+                name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ['journal_mode', 'synchronous', 'busy_timeout', 'cache_size']
+            }
+
+    def test_sqlite_pragmas_applied_per_connection(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.open_file_connection(directory)
+            self.assertEqual(self.pragmas(wrapper), {
+                'journal_mode': 'wal',
+                # NORMAL
+                'synchronous': 1,
+                'busy_timeout': 5000,
+                'cache_size': -64 * 1024,
+            })
+            self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+
+    def test_tuning_off(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.open_file_connection(directory, {})
+            self.assertEqual(self.pragmas(wrapper)['journal_mode'], 'delete')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(APITestCase):
+    """An empty, migrated SQLite file stands in for a replica that is behind."""
+    # Resolved in setUpClass, once 'replica' is configured
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_directory = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections.settings['default'], 'NAME': f'{cls.replica_directory.name}/replica.sqlite3'
+        }
+        call_command('migrate', database='replica', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.replica_directory.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.other = User.objects.create_user(username='reader', password='testpass123')
+        self.feature = Feature.objects.create(
+            title='Primary only', business_problem='Problem', expected_value='Value',
+            affected_users='Users', complexity='low', created_by=self.user
+        )
+
+    def get(self, url, user):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def comment(self, user, **data):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.post(
+            f'/api/features/{self.feature.pk}/comments/', {'content': 'Seen?', 'tag': 'question', **data},
+            HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+
+    def test_safe_reads_go_to_replica(self):
+        self.assertEqual(self.get('/api/features/', self.other).data['count'], 0)
+        self.assertEqual(self.get(f'/api/features/{self.feature.pk}/activities/', self.other).data['count'], 0)
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.get('/api/features/', self.other).data['count'], 1)
+
+    def test_writer_reads_own_writes(self):
+        self.assertEqual(self.comment(self.user).status_code, 201)
+        url = f'/api/features/{self.feature.pk}/comments/'
+        self.assertEqual(self.get(url, self.user).data['count'], 1)
+        # Everyone else reads the replica, which hasn't caught up
+        self.assertEqual(self.get(url, self.other).data['count'], 0)
+        cache.delete(routing.sticky_key(self.user.pk))
+        self.assertEqual(self.get(url, self.user).data['count'], 0)
+
+    def test_failed_write_does_not_stick(self):
+        self.assertEqual(self.comment(self.user, content='').status_code, 400)
+        self.assertEqual(self.get('/api/features/', self.user).data['count'], 0)
+
+    def test_cached_detail_read_from_primary(self):
+        response = self.get(f'/api/features/{self.feature.pk}/', self.other)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'Primary only')
+
+    def test_writes_go_to_primary(self):
+        instance = Feature(title='Read on a replica')
+        instance._state.db = 'replica'
+        self.assertEqual(routing.ReplicaRouter().db_for_write(Feature, instance=instance), 'default')
+
+    async def test_async_reads_go_to_replica(self):
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.other).access_token))()
+        response = await self.async_client.get('/api/async/features/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.json()['count'], 0)
+
+
+class SeedFeaturesTests(TestCase):
+    def seed(self, **options):
+        out = StringIO()
+        call_command('seed_features', stdout=out, batch_size=10, users=5, **options)
+        return out.getvalue()
+
+    def test_seeds_consistent_data(self):
+        output = self.seed(features=25)
+        self.assertIn('Created 25 features', output)
+        self.assertEqual(User.objects.filter(username__startswith='seed-user-').count(), 5)
+        self.assertEqual(Feature.objects.count(), 25)
+        self.assertEqual(Activity.objects.filter(action='created').count(), 25)
+        # Counters and last activity need no repair
+        self.assertEqual(counters.rebuild(), 0)
+        for feature in Feature.objects.prefetch_related('status_changes'):
+            status = 'proposed'
+            for change in sorted(feature.status_changes.all(), key=lambda change: change.created_at):
+                self.assertEqual(change.from_status, status)
+                self.assertIn(change.to_status, STATUS_TRANSITIONS[status])
+                self.assertGreaterEqual(change.created_at, feature.created_at)
+                status = change.to_status
+            self.assertEqual(feature.status, status)
+        self.assertTrue(self.client.login(username='seed-user-0', password='featureflow-seed'))
+
+    def test_same_seed_same_data(self):
+        self.seed(features=10, seed=7)
+        first = list(Feature.objects.order_by('pk').values_list('title', 'status', 'comment_count'))
+        Feature.objects.all().delete()
+        self.seed(features=10, seed=7)
+        self.assertEqual(list(Feature.objects.order_by('pk').values_list('title', 'status', 'comment_count')), first)
+
+    def test_batch_size_must_be_positive(self):
+        with self.assertRaises(CommandError):
+            call_command('seed_features', stdout=StringIO(), batch_size=0, users=5, features=5)
+        self.assertFalse(Feature.objects.exists())
+
+    def test_search_index(self):
+        self.seed(features=10)
+        title = Feature.objects.values_list('title', flat=True).first()
+        self.assertTrue(search.search_features(title.split()[-1]))
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        Feature.objects.create(
+            title='Measured', business_problem='Problem', expected_value='Value',
+            affected_users='Users', complexity='low', created_by=self.user
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/features/')
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^auth;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+
+    async def test_async_view_queries_counted(self):
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+        response = await self.async_client.get('/api/async/features/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+    def test_query_wrapper_installed_once(self):
+        wrapper = connections.create_connection('default')
+        try:
+            # close() keeps the in-memory test database open, so reconnect directly
+            for _ in range(3):
+                if wrapper.connection is not None:
+                    wrapper.connection.close()
+                wrapper.connect()
+            self.assertEqual(wrapper.execute_wrappers.count(metrics.record_query), 1)
+            request_metrics = metrics.RequestMetrics()
+            token = metrics._current.set(request_metrics)
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            finally:
+                metrics._current.reset(token)
+            self.assertEqual(request_metrics.sql_count, 1)
+        finally:
+            wrapper.connection.close()
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/features/')
+        self.client.get('/api/features/')
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        cache.clear()
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('featureflow_requests_total{method="GET",endpoint="feature-list",status="200"} 2', body)
+        self.assertIn('featureflow_request_duration_seconds_bucket{method="GET",endpoint="feature-list",le="+Inf"} 2', body)
+        self.assertIn('featureflow_request_db_queries_count{method="GET",endpoint="feature-list"} 2', body)
+
+    def test_metrics_denied_by_default(self):
+        self.assertEqual(APIClient().get('/api/metrics/').status_code, 401)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    def test_metrics_token(self):
+        with override_settings(METRICS={**settings.METRICS, 'TOKEN': 'scrape-secret'}):
+            self.assertEqual(APIClient().get('/api/metrics/').status_code, 401)
+            response = APIClient().get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret')
+            self.assertEqual(response.status_code, 200)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('example_seconds', 'Example.', (0.1, 1.0))
+        histogram.observe((('endpoint', 'x'),), 0.5)
+        histogram.observe((('endpoint', 'x'),), 5)
+        self.assertEqual(histogram.render()[2:], [
+            'example_seconds_bucket{endpoint="x",le="0.1"} 0',
+            'example_seconds_bucket{endpoint="x",le="1.0"} 1',
+            'example_seconds_bucket{endpoint="x",le="+Inf"} 2',
+            'example_seconds_sum{endpoint="x"} 5.5',
+            'example_seconds_count{endpoint="x"} 2',
+        ])
+
+    def test_slow_request_log(self):
+        with override_settings(METRICS={**settings.METRICS, 'SLOW_REQUEST_MS': 0.001}):
+            with self.assertLogs('features.metrics', 'WARNING') as logs:
+                self.client.get('/api/features/')
+        self.assertIn('GET /api/features/ (feature-list)', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
@@ -1,4 +1,167 @@
-from rest_framework.throttling import AnonRateThrottle
+"""
+Rate limiting with the generic cell rate algorithm (GCRA), a token bucket
+that needs one number of state per key.
+
+For a rate of N requests per period, requests are spaced ``period / N``
+apart and a burst of up to N is allowed. The state is the bucket's
+theoretical arrival time (TAT): a request at ``now`` is allowed when
+``TAT <= now + period - interval``, and moves TAT to
+``max(TAT, now) + interval``. Each check is one read-modify-write of a
+single value, whatever the rate, where DRF's throttles rewrite a list of
+timestamps that grows with it.
+
+``settings.THROTTLE_STORE['BACKEND']`` picks where the state lives:
+
+``database`` (default)
+    A ``ThrottleBucket`` row per key in the default database, updated with
+    a conditional UPDATE, so every worker shares the limit. Rows are keyed
+    by a SHA-256 digest of the throttle key, which can embed a client-sent
+    X-Forwarded-For header of any length. Rows of idle keys stay until
+    ``prune_throttle_buckets`` (run it periodically) deletes the ones whose
+    bucket has refilled.
+
+``cache``
+    The ``CACHE_ALIAS`` cache, updated with ``add``/``incr``/``decr``, which
+    saves a database write per request. A locmem cache is private to its
+    process, so only use this with a single worker or a shared cache
+    (memcached, redis). Atomic on those backends; the database and file
+    cache backends implement ``incr`` as get-then-set and can let a few
+    extra requests through under contention. Two races are accepted rather
+    than locked out: a request that finds the bucket refilled restarts it
+    with ``set``, dropping increments made at that moment (at most one extra
+    request per concurrent caller gets through), and a denied request's
+    ``incr`` stands until its ``decr``, so a caller checking in between can
+    be turned away up to one interval early.
+
+Scopes and rates are DRF's: ``DEFAULT_THROTTLE_RATES`` with the usual
+``anon``, ``user`` and ``auth`` scopes.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from rest_framework import throttling
+
+from .models import ThrottleBucket
+
+
+class CacheThrottleStore:
+    key_prefix = 'featureflow:throttle:'
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    def consume(self, key, limit, period, now):
+        """Take one request from `key`'s bucket; returns (allowed, wait seconds)."""
+        cache = caches[self.alias]
+        key = self.key_prefix + key
+        # Whole milliseconds, so the state can be moved with incr/decr
+        now = int(now * 1000)
+        interval = max(1, int(period * 1000 / limit))
+        tolerance = int(period * 1000) - interval
+        # Every allowed request leaves TAT at most one period ahead, so an
+        # entry that lives a period past its last update is never needed
+        if cache.add(key, now + interval, period):
+            return True, None
+        try:
+            tat = cache.incr(key, interval)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(key, now + interval, period)
+            return True, None
+        previous = tat - interval
+        if previous < now:
+            # The bucket had refilled: start again from now
+            cache.set(key, now + interval, period)
+            return True, None
+        if previous > now + tolerance:
+            cache.decr(key, interval)
+            return False, (previous - tolerance - now) / 1000
+        cache.touch(key, period)
+        return True, None
+
+
+class DatabaseThrottleStore:
+    @staticmethod
+    def bucket_key(key):
+        # Fixed length, whatever the client put in the key
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def consume(self, key, limit, period, now, attempts=3):
+        """Take one request from `key`'s bucket; returns (allowed, wait seconds)."""
+        key = self.bucket_key(key)
+        interval = period / limit
+        tolerance = period - interval
+        for _ in range(attempts):
+            # Check and update in one statement, so concurrent requests
+            # serialize on the row instead of racing a read
+            allowed = ThrottleBucket.objects.filter(key=key, tat__lte=now + tolerance).update(
+                tat=Greatest(F('tat'), Value(now)) + interval
+            )
+            if allowed:
+                return True, None
+            tat = ThrottleBucket.objects.filter(key=key).values_list('tat', flat=True).first()
+            if tat is not None:
+                return False, max(0.0, tat - tolerance - now)
+            try:
+                with transaction.atomic():
+                    ThrottleBucket.objects.create(key=key, tat=now + interval)
+                return True, None
+            except IntegrityError:
+                # Another request created it first; go round again
+                continue
+        return False, interval
+
+    def prune(self, now):
+        """Delete the buckets that have refilled (the same as no row); returns how many."""
+        deleted, _ = ThrottleBucket.objects.filter(tat__lt=now).delete()
+        return deleted
+
+
+STORES = {
+    'cache': CacheThrottleStore,
+    'database': DatabaseThrottleStore,
+}
+
+
+def get_store():
+    options = getattr(settings, 'THROTTLE_STORE', {})
+    backend = options.get('BACKEND', 'database')
+    if backend not in STORES:
+        raise ValueError(f'Unknown throttle store {backend!r}; choose from {list(STORES)}')
+    if backend == 'database':
+        return DatabaseThrottleStore()
+    return CacheThrottleStore(options.get('CACHE_ALIAS', 'default'))
+
+
+class GCRAThrottleMixin:
+    """
+    Replaces SimpleRateThrottle's timestamp history with a GCRA bucket in
+    the configured store; cache keys and rates are unchanged.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self.retry_after = get_store().consume(self.key, self.num_requests, self.duration, self.timer())
+        return allowed
+
+    def wait(self):
+        return getattr(self, 'retry_after', None)
+
+
+class AnonRateThrottle(GCRAThrottleMixin, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(GCRAThrottleMixin, throttling.UserRateThrottle):
+    pass
 
 
 class AuthRateThrottle(AnonRateThrottle):
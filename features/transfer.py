@@ -0,0 +1,307 @@
+"""
+Streaming export and import of features with their comments, status changes
+and activities.
+
+A dataset is a stream of records, each tagged with its ``type``: users first,
+then features, comments, status changes and activities, every one ordered by
+id so parents always come before the rows pointing at them. NDJSON writes one
+JSON object per line; CSV writes one row per record under the union of all
+columns, leaving the ones a type doesn't have empty.
+
+Exports read each table with ``.iterator(chunk_size=...)`` over
+``values_list()``, so memory stays flat however many rows there are. Imports
+buffer at most ``batch_size`` records of one type before a ``bulk_create``,
+give every row a new id and remap references: users by username (creating
+missing ones with an unusable password), features through the ids the import
+assigned, which are the only ids it keeps. Every row is checked against its
+model's fields and choices before it is written. Feature counters are rebuilt
+once everything is in.
+"""
+import csv
+import json
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+
+from . import counters, search
+from .cache import invalidate_stats
+from .models import Activity, ChangeSequence, Comment, Feature, StatusChange
+
+# type: (model, [(record key, column)]); references are named after the
+# model field and hold the exported id
+RECORD_TYPES = {
+    'user': (User, [('id', 'id'), ('username', 'username'), ('email', 'email')]),
+    'feature': (Feature, [
+        ('id', 'id'), ('title', 'title'), ('business_problem', 'business_problem'),
+        ('expected_value', 'expected_value'), ('affected_users', 'affected_users'),
+        ('complexity', 'complexity'), ('status', 'status'), ('business_value', 'business_value'),
+        ('effort', 'effort'), ('risk', 'risk'), ('created_by', 'created_by_id'),
+        ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]),
+    'comment': (Comment, [
+        ('id', 'id'), ('feature', 'feature_id'), ('author', 'author_id'), ('content', 'content'),
+        ('tag', 'tag'), ('created_at', 'created_at'),
+    ]),
+    'status_change': (StatusChange, [
+        ('id', 'id'), ('feature', 'feature_id'), ('changed_by', 'changed_by_id'),
+        ('from_status', 'from_status'), ('to_status', 'to_status'),
+        ('justification', 'justification'), ('created_at', 'created_at'),
+    ]),
+    'activity': (Activity, [
+        ('id', 'id'), ('feature', 'feature_id'), ('user', 'user_id'), ('action', 'action'),
+        ('description', 'description'), ('created_at', 'created_at'),
+    ]),
+}
+
+# Reference keys and the type they point at
+REFERENCES = {
+    'created_by': 'user', 'author': 'user', 'changed_by': 'user', 'user': 'user',
+    'feature': 'feature',
+}
+
+# Types whose ids are kept for remapping the references above
+REFERENCED_TYPES = set(REFERENCES.values())
+
+INTEGER_KEYS = {'business_value', 'effort', 'risk'}
+DATETIME_KEYS = {'created_at', 'updated_at'}
+# Status columns without choices on their model
+STATUS_KEYS = {'from_status', 'to_status'}
+
+CSV_COLUMNS = ['type'] + list(dict.fromkeys(
+    key for _, columns in RECORD_TYPES.values() for key, _ in columns
+))
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class TransferError(ValueError):
+    pass
+
+
+def export_records(features=None, chunk_size=2000):
+    """
+    Yield every record as a dict. `features` limits the export to a feature
+    queryset and the rows that belong to it. Users are the ones those rows
+    refer to.
+    """
+    # Id ceilings taken children first: a row under its ceiling points at
+    # parents that existed before it, so they are under theirs and a dataset
+    # never refers to rows written while it streams
+    ceilings = {}
+    for record_type, (model, _) in reversed(RECORD_TYPES.items()):
+        ceilings[record_type] = model.objects.aggregate(ceiling=Max('pk'))['ceiling'] or 0
+
+    querysets = {}
+    for record_type, (model, _) in RECORD_TYPES.items():
+        queryset = model.objects.filter(pk__lte=ceilings[record_type])
+        if features is not None and record_type == 'feature':
+            queryset = features.filter(pk__lte=ceilings[record_type])
+        elif features is not None and model is not User:
+            queryset = queryset.filter(feature__in=features.order_by().values('pk'))
+        querysets[record_type] = queryset
+
+    # Only the users the exported rows refer to, not every account
+    referenced = Q()
+    for record_type, (_, columns) in RECORD_TYPES.items():
+        for key, column in columns:
+            if REFERENCES.get(key) == 'user':
+                referenced |= Q(pk__in=querysets[record_type].order_by().values(column))
+    querysets['user'] = querysets['user'].filter(referenced)
+
+    for record_type, (model, columns) in RECORD_TYPES.items():
+        keys = [key for key, _ in columns]
+        rows = querysets[record_type].order_by('pk').values_list(*[column for _, column in columns])
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield {'type': record_type, **dict(zip(keys, row))}
+
+
+class Echo:
+    """File-like object that hands back what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def to_ndjson(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+
+
+def to_csv(records):
+    writer = csv.DictWriter(Echo(), fieldnames=CSV_COLUMNS)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow({
+            key: value.isoformat() if hasattr(value, 'isoformat') else value
+            for key, value in record.items()
+        })
+
+
+def render(records, output_format):
+    return to_csv(records) if output_format == 'csv' else to_ndjson(records)
+
+
+def parse_ndjson(lines):
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError as exc:
+                raise TransferError(f'Line {number}: invalid JSON ({exc})')
+
+
+def parse_csv(lines):
+    reader = csv.DictReader(lines)
+    for record in reader:
+        # Empty cells are columns the record type doesn't have
+        yield reader.line_num, {key: value for key, value in record.items() if value != ''}
+
+
+def parse(lines, input_format):
+    return parse_csv(lines) if input_format == 'csv' else parse_ndjson(lines)
+
+
+class Importer:
+    def __init__(self, batch_size=2000):
+        self.batch_size = batch_size
+        self.ids = {record_type: {} for record_type in REFERENCED_TYPES}
+        self.counts = {record_type: 0 for record_type in RECORD_TYPES}
+        self.pending_type = None
+        self.pending = []
+
+    def run(self, records):
+        """Import (line number, record) pairs; call inside a transaction."""
+        for number, record in records:
+            record_type = record.get('type')
+            if record_type not in RECORD_TYPES:
+                raise TransferError(f'Line {number}: unknown record type {record_type!r}')
+            if 'id' not in record:
+                raise TransferError(f'Line {number}: missing id')
+            try:
+                record['id'] = int(record['id'])
+            except (TypeError, ValueError):
+                raise TransferError(f"Line {number}: invalid id {record['id']!r}")
+            if record_type == 'user' and not record.get('username'):
+                raise TransferError(f'Line {number}: missing username')
+            if record_type != self.pending_type or len(self.pending) >= self.batch_size:
+                self.flush()
+                self.pending_type = record_type
+            self.pending.append((number, record))
+        self.flush()
+        # Comments and activities went in with bulk_create
+        counters.rebuild(self.ids['feature'].values())
+        if self.counts['feature']:
+            invalidate_stats()
+        return self.counts
+
+    def flush(self):
+        if not self.pending:
+            return
+        record_type, pending = self.pending_type, self.pending
+        self.pending = []
+        if record_type == 'user':
+            self.import_users(pending)
+        else:
+            self.import_rows(record_type, pending)
+        self.counts[record_type] += len(pending)
+
+    def import_users(self, pending):
+        for number, record in pending:
+            for key in ('username', 'email'):
+                if record.get(key) is not None and not isinstance(record[key], str):
+                    raise TransferError(f'Line {number}: invalid {key} {record[key]!r}')
+        usernames = [record['username'] for _, record in pending]
+        existing = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+        new_users = []
+        for number, record in pending:
+            if record['username'] not in existing:
+                user = User(username=record['username'], email=record.get('email') or '')
+                user.set_unusable_password()
+                self.validate(number, user)
+                new_users.append(user)
+        self.bulk_create(User, new_users, pending)
+        existing.update((user.username, user.pk) for user in new_users)
+        for _, record in pending:
+            self.ids['user'][record['id']] = existing[record['username']]
+
+    def import_rows(self, record_type, pending):
+        model, columns = RECORD_TYPES[record_type]
+        change_seq = ChangeSequence.next() if model is Feature else None
+        objects = []
+        timestamps = []
+        for number, record in pending:
+            values = {}
+            for key, column in columns:
+                if key == 'id' or key not in record:
+                    continue
+                values[column] = self.convert(number, key, record[key])
+            if model is Feature:
+                values['change_seq'] = change_seq
+            obj = model(**values)
+            self.validate(number, obj)
+            objects.append(obj)
+            timestamps.append({key: values[key] for key in DATETIME_KEYS if key in values})
+        self.bulk_create(model, objects, pending)
+
+        # bulk_create stamps auto_now(_add) fields; put the exported ones back
+        fields = set().union(*timestamps)
+        if fields:
+            for obj, values in zip(objects, timestamps):
+                for key, value in values.items():
+                    setattr(obj, key, value)
+            model.objects.bulk_update(objects, list(fields))
+
+        if record_type in REFERENCED_TYPES:
+            for (_, record), obj in zip(pending, objects):
+                self.ids[record_type][record['id']] = obj.pk
+        if record_type == 'feature':
+            search.index_features(objects)
+        elif record_type == 'comment':
+            search.index_comments(objects)
+
+    def validate(self, number, obj):
+        """Check field values and choices; references were checked by convert()."""
+        # Foreign keys would each cost a query, and only point at rows this
+        # import wrote or found
+        references = [field.name for field in obj._meta.concrete_fields if field.is_relation]
+        try:
+            obj.clean_fields(exclude=references)
+        except ValidationError as exc:
+            errors = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in exc.message_dict.items())
+            raise TransferError(f'Line {number}: {errors}')
+
+    def bulk_create(self, model, objects, pending):
+        try:
+            model.objects.bulk_create(objects)
+        except DatabaseError as exc:
+            raise TransferError(f'Lines {pending[0][0]}-{pending[-1][0]}: {exc}')
+
+    def convert(self, number, key, value):
+        if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            raise TransferError(f'Line {number}: invalid {key} {value!r}')
+        if key in REFERENCES:
+            target = REFERENCES[key]
+            try:
+                return self.ids[target][int(value)]
+            except (KeyError, TypeError, ValueError):
+                raise TransferError(f'Line {number}: {key} refers to unknown {target} {value!r}')
+        if key in INTEGER_KEYS:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                raise TransferError(f'Line {number}: invalid {key} {value!r}')
+        if key in DATETIME_KEYS:
+            parsed = parse_datetime(value) if isinstance(value, str) else None
+            if parsed is None:
+                raise TransferError(f'Line {number}: invalid {key} {value!r}')
+            return parsed
+        if key in STATUS_KEYS and value not in dict(Feature.STATUS_CHOICES):
+            raise TransferError(f'Line {number}: invalid {key} {value!r}')
+        return value
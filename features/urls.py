@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'features', views.FeatureViewSet, basename='feature')
@@ -12,10 +12,25 @@ urlpatterns = [
     path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/me/', views.current_user, name='current_user'),
+    path('stream/', views.event_stream, name='event-stream'),
+    path('stream/ticket/', views.stream_ticket, name='event-stream-ticket'),
+    path('metrics/', views.prometheus_metrics, name='metrics'),
     path('features/<int:feature_pk>/comments/', 
          views.CommentViewSet.as_view({'get': 'list', 'post': 'create'}),
          name='feature-comments'),
+    path('features/<int:feature_pk>/status_changes/',
+         views.StatusChangeViewSet.as_view({'get': 'list'}),
+         name='feature-status-changes'),
     path('features/<int:feature_pk>/activities/',
          views.ActivityViewSet.as_view({'get': 'list'}),
          name='feature-activities'),
+    # Async twins of the hot read endpoints, for ASGI deployments
+    path('async/features/', async_views.feature_list, name='async-feature-list'),
+    path('async/features/<int:pk>/', async_views.feature_detail, name='async-feature-detail'),
+    path('async/features/<int:feature_pk>/comments/', async_views.comment_list,
+         name='async-feature-comments'),
+    path('async/features/<int:feature_pk>/activities/', async_views.activity_list,
+         name='async-feature-activities'),
+    path('async/auth/login/', async_views.login, name='async-login'),
+    path('async/auth/register/', async_views.register, name='async-register'),
 ]
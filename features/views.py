@@ -1,26 +1,42 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
 from rest_framework_simplejwt.tokens import RefreshToken
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Feature, Comment, StatusChange, Activity
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import cached_property
+from django.db.models import Count, Max, Prefetch, Window
+from .models import Feature, Comment, StatusChange, Activity, ChangeSequence, STATUS_TRANSITIONS
 from .serializers import (
     FeatureListSerializer, FeatureDetailSerializer, CommentSerializer,
-    StatusChangeSerializer, ActivitySerializer, UserSerializer, RegisterSerializer
+    StatusChangeSerializer, ActivitySerializer, UserSerializer, RegisterSerializer,
+    DETAIL_COLLECTIONS
 )
+from .activity import log_activity
+from .authentication import CachedJWTAuthentication, get_ticket_ttl, issue_stream_ticket, redeem_stream_ticket
+from .bulk import change_statuses, create_features, delete_features, get_items, update_features
+from .cache import CachedRetrieveMixin, invalidate_feature, invalidate_stats
+from .changes import changes_since, decode_token, encode_token, requires_resync
+from .conditional import ConditionalReadMixin
+from .filters import FeatureFilter, StableOrderingFilter, parse_id
+from .pagination import OptionalCursorPagination
+from .routing import ReplicaReadMixin
+from .search import search_features
+from .stats import get_stats
+from . import events, metrics, transfer
 from .throttling import AuthRateThrottle
 
 
-STATUS_TRANSITIONS = {
-    'proposed': ['under_discussion', 'approved'],
-    'under_discussion': ['proposed', 'approved', 'in_progress'],
-    'approved': ['in_progress', 'under_discussion'],
-    'in_progress': ['done', 'approved'],
-    'done': ['in_progress'],  # Allow reopening
-}
-
-
 @api_view(['POST'])
 @permission_classes([AllowAny])
 @throttle_classes([AuthRateThrottle])
@@ -45,18 +61,250 @@ def current_user(request):
     return Response(UserSerializer(request.user).data)
 
 
-class FeatureViewSet(viewsets.ModelViewSet):
+def header_auth(request):
+    """(user, validated token) for a JWT in the Authorization header; None if missing or invalid."""
+    try:
+        return CachedJWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def stream_ticket(request):
+    """
+    A short-lived, single-use ticket for /api/stream/?ticket=, since
+    EventSource cannot send headers. The stream closes when the access token
+    used here expires.
+    """
+    return Response({
+        'ticket': issue_stream_ticket(request.user, request.auth['exp']),
+        'expires_in': get_ticket_ttl(),
+    })
+
+
+def stream_user(request):
+    """
+    (user, expiry in epoch seconds) for a ticket in the `ticket` query
+    parameter or a JWT in the Authorization header; None if invalid.
+    """
+    if request.GET.get('ticket'):
+        return redeem_stream_ticket(request.GET['ticket'])
+    auth = header_auth(request)
+    if auth is None:
+        return None
+    user, validated_token = auth
+    return user, validated_token['exp']
+
+
+def prometheus_metrics(request):
+    """
+    Request histograms of this process in the Prometheus text format, for
+    the METRICS token when one is set and for staff users' JWTs otherwise.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    token = metrics.get_options().get('TOKEN')
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'},
+                                status=401)
+    else:
+        auth = header_auth(request)
+        user = auth[0] if auth else None
+        if user is None or not user.is_active:
+            return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'},
+                                status=401)
+        if not user.is_staff:
+            return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+async def event_stream(request):
+    """
+    Server-Sent Events stream of activities as they are written, for one
+    feature with ?feature=<id> or all of them. ASGI only: every open stream is
+    a coroutine waiting on its queue, where under WSGI it would hold a worker.
+    The stream ends when the credentials it was opened with expire.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Event streams need an ASGI server.'}, status=501)
+    auth = await sync_to_async(stream_user)(request)
+    if auth is None or not auth[0].is_active:
+        return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+    expires_at = auth[1]
+    
+    feature_id = request.GET.get('feature')
+    if feature_id is not None:
+        feature_id = parse_id(feature_id)
+        if feature_id is None:
+            return JsonResponse({'error': 'feature must be a feature id'}, status=400)
+        if not await Feature.objects.filter(pk=feature_id).aexists():
+            return JsonResponse({'detail': 'Not found.'}, status=404)
+    last_event_id = request.headers.get('Last-Event-ID', request.GET.get('last_event_id'))
+    if last_event_id is not None:
+        last_event_id = parse_id(last_event_id)
+        if last_event_id is None:
+            return JsonResponse({'error': 'Last-Event-ID must be an activity id'}, status=400)
+    
+    options = getattr(settings, 'EVENT_STREAM', {})
+    subscription = events.broker.subscribe(feature_id)
+    response = StreamingHttpResponse(
+        events.stream(
+            subscription,
+            last_event_id=last_event_id,
+            keepalive=options.get('KEEPALIVE', 15),
+            expires_at=expires_at,
+        ),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx and friends from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class FeatureViewSet(ReplicaReadMixin, ConditionalReadMixin, CachedRetrieveMixin, viewsets.ModelViewSet):
     queryset = Feature.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalCursorPagination
+    filter_backends = [FeatureFilter, StableOrderingFilter]
+    ordering_fields = ['created_at', 'priority_score', 'comment_count', 'last_activity_at']
+    ordering = ['-created_at']
+    
+    def get_list_validators(self, request):
+        # Every change to a listed row, counters included, takes a new change_seq.
+        # Validate the (pk, change_seq) pairs of the rows on the page rather
+        # than MAX(change_seq): on PostgreSQL change_seq follows transaction
+        # ids, which are not in commit order (see ChangeSequence)
+        queryset = self.filter_queryset(Feature.objects.all())
+        if self.paginator is not None and self.paginator.wants_cursor(request):
+            # Keyset pages never count the table: validate the rows on the
+            # page, plus the one after it that decides the next link
+            window = self.paginator.keyset_class().page_queryset(queryset, request)
+            return [list(window.values_list('pk', 'change_seq'))], None
+        # Page-number bodies carry the count anyway; it also catches deletes.
+        # COUNT(*) OVER () reads it in the same query as the page rows
+        queryset = queryset.annotate(total=Window(Count('pk')))
+        if self.paginator is not None:
+            queryset = self.paginator.page_number_class().page_queryset(queryset, request)
+            if queryset is None:
+                # Let the list itself answer with its 404
+                return None
+        rows = list(queryset.values_list('pk', 'change_seq', 'total'))
+        count = rows[0][2] if rows else 0
+        return [count, [row[:2] for row in rows]], None
+    
+    def get_object_validators(self, request):
+        # change_seq moves with every write to the feature, its counters and
+        # its status; comments and activities also move last_activity_at
+        state = (
+            Feature.objects.filter(pk=self.kwargs['pk'])
+            .values_list('updated_at', 'change_seq', 'last_activity_at')
+            .first()
+        )
+        if state is None:
+            return None
+        updated_at, change_seq, last_activity_at = state
+        return [updated_at, change_seq], max(updated_at, last_activity_at)
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        selected = self.get_sparse_fields()
+        if selected is None or 'created_by' in selected:
+            queryset = queryset.select_related('created_by')
+        if self.action == 'retrieve':
+            return self.with_detail_prefetches(queryset)
+        return queryset
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        selected = self.get_sparse_fields()
+        if selected is None:
+            return queryset
+        # Load only the columns behind the selected fields, plus the sort key
+        # (keyset pagination reads it back off each row)
+        columns = {'id'}
+        for name in selected:
+            if name == 'created_by':
+                columns |= {'created_by', 'created_by__id', 'created_by__username', 'created_by__email'}
+            elif name in self.model_columns:
+                columns.add(name)
+        for name in queryset.query.order_by or Feature._meta.ordering:
+            if isinstance(name, str):
+                columns.add(name.lstrip('-'))
+        return queryset.only(*columns)
+    
+    @cached_property
+    def model_columns(self):
+        return {field.name for field in Feature._meta.concrete_fields}
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return FeatureDetailSerializer
         return FeatureListSerializer
     
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        context['fields'] = self.get_sparse_fields()
+        return context
+    
+    def get_sparse_fields(self):
+        """
+        Serializer fields to return on reads, from ?fields= and ?omit=, or
+        None for all of them.
+        """
+        if hasattr(self, '_sparse_fields'):
+            return self._sparse_fields
+        self._sparse_fields = None
+        if self.request is None or self.action not in ('list', 'retrieve', 'search'):
+            return None
+        fields = self.request.query_params.get('fields')
+        omit = self.request.query_params.get('omit')
+        if fields is None and omit is None:
+            return None
+        available = self.get_serializer_class().Meta.fields
+        selected = [name for name in fields.split(',') if name] if fields is not None else list(available)
+        omitted = [name for name in omit.split(',') if name] if omit is not None else []
+        invalid = [name for name in selected + omitted if name not in available]
+        if invalid:
+            raise ValidationError({'fields': f'Unknown field(s) {invalid}. Choose from: {available}'})
+        self._sparse_fields = [name for name in selected if name not in omitted]
+        return self._sparse_fields
+    
+    def get_expand(self):
+        """Collections to embed in detail responses, from ?expand= (default: all)."""
+        raw = self.request.query_params.get('expand') if self.request else None
+        if raw is None:
+            expand = list(DETAIL_COLLECTIONS)
+        else:
+            expand = [name for name in raw.split(',') if name]
+            invalid = [name for name in expand if name not in DETAIL_COLLECTIONS]
+            if invalid:
+                raise ValidationError({'expand': f'Unknown collection(s) {invalid}. Choose from: {list(DETAIL_COLLECTIONS)}'})
+        selected = self.get_sparse_fields()
+        if selected is not None:
+            expand = [name for name in expand if name in selected]
+        return expand
+    
+    def with_detail_prefetches(self, queryset):
+        # Newest rows of each embedded collection with their users joined; one
+        # query per collection, bounded by a window function over the slice
+        limit = FeatureDetailSerializer.embed_limit + 1
+        prefetches = []
+        for name in self.get_expand():
+            _, user_field, _, _ = DETAIL_COLLECTIONS[name]
+            model = getattr(Feature, name).rel.related_model
+            recent = model.objects.select_related(user_field).order_by('-created_at', '-id')[:limit]
+            prefetches.append(Prefetch(name, queryset=recent, to_attr=f'recent_{name}'))
+        return queryset.prefetch_related(*prefetches)
+    
     def perform_create(self, serializer):
         feature = serializer.save(created_by=self.request.user)
-        Activity.objects.create(
+        log_activity(
             feature=feature,
             user=self.request.user,
             action='created',
@@ -65,13 +313,129 @@ class FeatureViewSet(viewsets.ModelViewSet):
     
     def perform_update(self, serializer):
         feature = serializer.save()
-        Activity.objects.create(
+        # UPDATE does not return the generated column, so read it back
+        feature.refresh_from_db(fields=['priority_score'])
+        log_activity(
             feature=feature,
             user=self.request.user,
             action='updated',
             description=f'Updated feature: {feature.title}'
         )
     
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked full-text search over feature text and comments."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'The q parameter is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), 100)
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        ids = search_features(query, limit=max(limit, 1))
+        features = self.get_queryset().filter(pk__in=ids)
+        rank = {pk: position for position, pk in enumerate(ids)}
+        features = sorted(features, key=lambda feature: rank[feature.pk])
+        return Response({'results': self.get_serializer(features, many=True).data})
+    
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Feature counts by status, complexity and creator, and the average
+        priority score, over every feature.
+        """
+        return Response(get_stats())
+    
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """
+        Create (POST `items`), partially update (PATCH `items` with `id`s) or
+        delete (DELETE `ids`) many features in one transaction.
+        """
+        if request.method == 'DELETE':
+            ids = delete_features(get_items(request.data, key='ids'))
+            return Response({'results': [{'id': pk, 'deleted': True} for pk in ids]})
+        items = get_items(request.data)
+        if request.method == 'POST':
+            ids = create_features(items, request.user)
+            response_status = status.HTTP_201_CREATED
+        else:
+            ids = update_features(items, request.user)
+            response_status = status.HTTP_200_OK
+        features = Feature.objects.select_related('created_by').in_bulk(ids)
+        data = self.get_serializer([features[pk] for pk in ids], many=True).data
+        return Response({'results': data}, status=response_status)
+    
+    @action(detail=False, methods=['post'], url_path='bulk/status')
+    def bulk_status(self, request):
+        """Move many features to new statuses, validated like change_status."""
+        results = change_statuses(get_items(request.data), request.user)
+        return Response({'results': results})
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Features created, updated or deleted since ?since=, the `next` token of
+        an earlier call (omit it for a full sync). Poll again with `next`
+        while `has_more` is true; a 410 means start over without a token.
+        """
+        try:
+            position = decode_token(request.query_params.get('since', ''))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid since token'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if requires_resync(position):
+            return Response(
+                {'error': 'since token predates the retained deletes; sync again without it'},
+                status=status.HTTP_410_GONE
+            )
+        try:
+            limit = min(int(request.query_params.get('limit', 500)), 1000)
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        features = Feature.objects.select_related('created_by')
+        rows, deleted, next_position, has_more = changes_since(position, max(limit, 1), features)
+        return Response({
+            'results': self.get_serializer(rows, many=True).data,
+            'deleted': deleted,
+            'next': encode_token(next_position),
+            'has_more': has_more,
+        })
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """
+        Stream the (filtered) features with their comments, status changes and
+        activities as NDJSON, or CSV with ?output=csv. Staff only: it includes
+        the usernames and emails of everyone involved.
+        """
+        output_format = request.query_params.get('output', 'ndjson')
+        if output_format not in transfer.FORMATS:
+            return Response(
+                {'error': f'output must be one of: {list(transfer.FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        records = transfer.export_records(features=self.filter_queryset(Feature.objects.all()))
+        response = StreamingHttpResponse(
+            transfer.render(records, output_format),
+            content_type=transfer.FORMATS[output_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="features.{output_format}"'
+        return response
+    
     @action(detail=True, methods=['post'])
     def change_status(self, request, pk=None):
         feature = self.get_object()
@@ -101,43 +465,81 @@ class FeatureViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        StatusChange.objects.create(
-            feature=feature,
-            changed_by=request.user,
-            from_status=old_status,
-            to_status=new_status,
-            justification=justification
-        )
+        # Optimistic concurrency: clients may say which status they saw
+        expected_status = request.data.get('from_status')
+        if expected_status and expected_status != old_status:
+            return self.status_conflict(feature.pk, expected_status)
         
-        feature.status = new_status
-        feature.save()
+        # The conditional UPDATE only succeeds if nobody moved the feature since
+        # we read it; it also takes the row lock for the shortest possible time
+        with transaction.atomic():
+            updated_at = timezone.now()
+            change_seq = ChangeSequence.next()
+            updated = Feature.objects.filter(pk=feature.pk, status=old_status).update(
+                status=new_status, updated_at=updated_at, change_seq=change_seq
+            )
+            if not updated:
+                return self.status_conflict(feature.pk, old_status)
+            StatusChange.objects.create(
+                feature=feature,
+                changed_by=request.user,
+                from_status=old_status,
+                to_status=new_status,
+                justification=justification
+            )
+            log_activity(
+                feature=feature,
+                user=request.user,
+                action='status_changed',
+                description=f'Changed status from {old_status} to {new_status}: {justification}'
+            )
+            # update() skips post_save, so drop cached reads explicitly
+            invalidate_feature(feature.pk)
+            invalidate_stats()
         
-        Activity.objects.create(
-            feature=feature,
-            user=request.user,
-            action='status_changed',
-            description=f'Changed status from {old_status} to {new_status}: {justification}'
+        if request.query_params.get('response') == 'minimal':
+            return Response({'id': feature.pk, 'status': new_status, 'updated_at': updated_at})
+        feature = self.with_detail_prefetches(Feature.objects.select_related('created_by')).get(pk=feature.pk)
+        return Response(FeatureDetailSerializer(feature, context=self.get_serializer_context()).data)
+    
+    def status_conflict(self, pk, expected_status):
+        current = Feature.objects.filter(pk=pk).values_list('status', flat=True).first()
+        return Response(
+            {
+                'error': f'Status changed concurrently: expected "{expected_status}", found "{current}"',
+                'status': current,
+            },
+            status=status.HTTP_409_CONFLICT
         )
-        
-        return Response(FeatureDetailSerializer(feature).data)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+def collection_validators(model, feature_id):
+    state = model.objects.filter(feature_id=feature_id).aggregate(count=Count('pk'), newest=Max('pk'))
+    return [state['count'], state['newest']], None
+
+
+class CommentViewSet(ReplicaReadMixin, ConditionalReadMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalCursorPagination
+    
+    def get_list_validators(self, request):
+        feature_id = self.kwargs.get('feature_pk')
+        return collection_validators(Comment, feature_id) if feature_id else None
     
     def get_queryset(self):
         feature_id = self.kwargs.get('feature_pk')
+        queryset = Comment.objects.select_related('author')
         if feature_id:
-            return Comment.objects.filter(feature_id=feature_id)
-        return Comment.objects.all()
+            return queryset.filter(feature_id=feature_id)
+        return queryset
     
     def perform_create(self, serializer):
         feature_id = self.kwargs.get('feature_pk')
         feature = Feature.objects.get(pk=feature_id)
         comment = serializer.save(author=self.request.user, feature=feature)
         
-        Activity.objects.create(
+        log_activity(
             feature=feature,
             user=self.request.user,
             action='commented',
@@ -145,12 +547,31 @@ class CommentViewSet(viewsets.ModelViewSet):
         )
 
 
-class ActivityViewSet(viewsets.ReadOnlyModelViewSet):
+class ActivityViewSet(ReplicaReadMixin, ConditionalReadMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ActivitySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalCursorPagination
+    
+    def get_list_validators(self, request):
+        feature_id = self.kwargs.get('feature_pk')
+        return collection_validators(Activity, feature_id) if feature_id else None
+    
+    def get_queryset(self):
+        feature_id = self.kwargs.get('feature_pk')
+        queryset = Activity.objects.select_related('user')
+        if feature_id:
+            return queryset.filter(feature_id=feature_id)
+        return queryset
+
+
+class StatusChangeViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = StatusChangeSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = OptionalCursorPagination
     
     def get_queryset(self):
         feature_id = self.kwargs.get('feature_pk')
+        queryset = StatusChange.objects.select_related('changed_by')
         if feature_id:
-            return Activity.objects.filter(feature_id=feature_id)
-        return Activity.objects.all()
+            return queryset.filter(feature_id=feature_id)
+        return queryset
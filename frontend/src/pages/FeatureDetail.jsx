@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { useParams, useNavigate, Link } from "react-router-dom";
-import { featuresApi, commentsApi } from "../services/api";
+import { featuresApi, commentsApi, eventsApi } from "../services/api";
 import { useAuth } from "../context/AuthContext";
 import { useToast } from "../context/ToastContext";
 import CommentThread from "../components/CommentThread";
@@ -27,6 +27,11 @@ const FeatureDetail = () => {
     fetchFeature();
   }, [id]);
 
+  useEffect(() => {
+    // Live updates: reload quietly whenever anyone logs activity here
+    return eventsApi.stream(id, () => refreshFeature());
+  }, [id]);
+
   const fetchFeature = async () => {
     setError(null);
     setLoading(true);
@@ -41,12 +46,23 @@ const FeatureDetail = () => {
     }
   };
 
+  const refreshFeature = async () => {
+    try {
+      const response = await featuresApi.getOne(id);
+      setFeature(response.data);
+    } catch (err) {
+      console.error("Failed to refresh feature:", err);
+    }
+  };
+
   const handleStatusChange = async (newStatus, justification) => {
     try {
+      // Sending the status we saw lets the server reject a concurrent move
       const response = await featuresApi.changeStatus(
         id,
         newStatus,
         justification,
+        feature.status,
       );
       setFeature(response.data);
       setShowStatusModal(false);
@@ -54,6 +70,7 @@ const FeatureDetail = () => {
     } catch (err) {
       const errorMsg = err.response?.data?.error || "Failed to change status";
       toast.error(errorMsg);
+      if (err.response?.status === 409) fetchFeature();
       console.error("Failed to change status:", err);
       throw err; // Re-throw so modal can show error
     }
@@ -7,6 +7,16 @@ import EmptyState from "../components/EmptyState";
 import SearchInput from "../components/SearchInput";
 import FeatureCard from "../components/FeatureCard";
 
+// Filtering, search and sorting run on the server so they cover every
+// feature, not just the page that has been fetched
+const SORT_ORDERING = {
+  newest: "-created_at",
+  oldest: "created_at",
+  priority: "-priority_score",
+  discussed: "-comment_count",
+  active: "-last_activity_at",
+};
+
 const FeatureList = () => {
   const [features, setFeatures] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -14,17 +24,41 @@ const FeatureList = () => {
   const [filter, setFilter] = useState("all");
   const [sortBy, setSortBy] = useState("newest");
   const [searchQuery, setSearchQuery] = useState("");
+  const [hasLoaded, setHasLoaded] = useState(false);
+  const [stats, setStats] = useState(null);
 
   useEffect(() => {
     fetchFeatures();
+  }, [filter, sortBy, searchQuery]);
+
+  useEffect(() => {
+    fetchStats();
   }, []);
 
+  // Totals over every feature, not just the fetched page
+  const fetchStats = async () => {
+    try {
+      const response = await featuresApi.getStats();
+      setStats(response.data);
+    } catch (err) {
+      console.error("Failed to fetch stats:", err);
+    }
+  };
+
   const fetchFeatures = async () => {
     setError(null);
     setLoading(true);
     try {
-      const response = await featuresApi.getAll();
+      // Cards never show these long text fields, so skip them on the wire
+      const params = {
+        ordering: SORT_ORDERING[sortBy],
+        omit: "expected_value,affected_users",
+      };
+      if (filter !== "all") params.status = filter;
+      if (searchQuery) params.search = searchQuery;
+      const response = await featuresApi.getAll(params);
       setFeatures(response.data.results || response.data);
+      setHasLoaded(true);
     } catch (err) {
       setError("Failed to load features. Please try again.");
       console.error("Failed to fetch features:", err);
@@ -33,33 +67,10 @@ const FeatureList = () => {
     }
   };
 
-  const filteredFeatures = features
-    .filter((f) => filter === "all" || f.status === filter)
-    .filter((f) => {
-      if (!searchQuery) return true;
-      const query = searchQuery.toLowerCase();
-      return (
-        f.title.toLowerCase().includes(query) ||
-        f.business_problem.toLowerCase().includes(query) ||
-        f.created_by.username.toLowerCase().includes(query)
-      );
-    })
-    .sort((a, b) => {
-      if (sortBy === "priority") return b.priority_score - a.priority_score;
-      if (sortBy === "oldest")
-        return new Date(a.created_at) - new Date(b.created_at);
-      return new Date(b.created_at) - new Date(a.created_at);
-    });
-
-  // Calculate stats
-  const stats = {
-    total: features.length,
-    proposed: features.filter((f) => f.status === "proposed").length,
-    inProgress: features.filter((f) => f.status === "in_progress").length,
-    done: features.filter((f) => f.status === "done").length,
-  };
+  const isFiltered = filter !== "all" || searchQuery !== "";
 
-  if (loading) {
+  // Keep the filter bar mounted while later queries load
+  if (loading && !hasLoaded) {
     return <LoadingSpinner text="Loading features..." />;
   }
 
@@ -77,7 +88,7 @@ const FeatureList = () => {
       </div>
 
       {/* Stats */}
-      {features.length > 0 && (
+      {stats && stats.total > 0 && (
         <div className="stat-counter">
           <div className="stat-item">
             <span className="stat-value">{stats.total}</span>
@@ -85,19 +96,19 @@ const FeatureList = () => {
           </div>
           <div className="stat-item">
             <span className="stat-value" style={{ color: "#3b82f6" }}>
-              {stats.proposed}
+              {stats.by_status.proposed}
             </span>
             <span className="stat-label">Proposed</span>
           </div>
           <div className="stat-item">
             <span className="stat-value" style={{ color: "#8b5cf6" }}>
-              {stats.inProgress}
+              {stats.by_status.in_progress}
             </span>
             <span className="stat-label">In Progress</span>
           </div>
           <div className="stat-item">
             <span className="stat-value" style={{ color: "#10b981" }}>
-              {stats.done}
+              {stats.by_status.done}
             </span>
             <span className="stat-label">Done</span>
           </div>
@@ -131,12 +142,14 @@ const FeatureList = () => {
               <option value="newest">Newest First</option>
               <option value="oldest">Oldest First</option>
               <option value="priority">Priority Score</option>
+              <option value="discussed">Most Discussed</option>
+              <option value="active">Recently Active</option>
             </select>
           </div>
         </div>
       </div>
 
-      {features.length === 0 ? (
+      {features.length === 0 && !isFiltered ? (
         <EmptyState
           icon="🚀"
           title="No features yet"
@@ -144,7 +157,7 @@ const FeatureList = () => {
           actionText="+ New Feature"
           actionLink="/features/new"
         />
-      ) : filteredFeatures.length === 0 ? (
+      ) : features.length === 0 ? (
         <EmptyState
           icon="🔍"
           title="No matches found"
@@ -157,7 +170,7 @@ const FeatureList = () => {
         />
       ) : (
         <div className="grid grid-2">
-          {filteredFeatures.map((feature) => (
+          {features.map((feature) => (
             <FeatureCard key={feature.id} feature={feature} />
           ))}
         </div>
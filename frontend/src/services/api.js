@@ -45,13 +45,23 @@ api.interceptors.response.use(
 );
 
 export const featuresApi = {
-  getAll: () => api.get('/api/features/'),
+  getAll: (params) => api.get('/api/features/', { params }),
   getOne: (id) => api.get(`/api/features/${id}/`),
+  getStats: () => api.get('/api/features/stats/'),
+  getChanges: (since, limit) => api.get('/api/features/changes/', { params: { since, limit } }),
   create: (data) => api.post('/api/features/', data),
   update: (id, data) => api.patch(`/api/features/${id}/`, data),
   delete: (id) => api.delete(`/api/features/${id}/`),
-  changeStatus: (id, status, justification) =>
-    api.post(`/api/features/${id}/change_status/`, { status, justification }),
+  changeStatus: (id, status, justification, fromStatus) =>
+    api.post(`/api/features/${id}/change_status/`, {
+      status,
+      justification,
+      from_status: fromStatus,
+    }),
+  bulkCreate: (items) => api.post('/api/features/bulk/', { items }),
+  bulkUpdate: (items) => api.patch('/api/features/bulk/', { items }),
+  bulkChangeStatus: (items) => api.post('/api/features/bulk/status/', { items }),
+  bulkDelete: (ids) => api.delete('/api/features/bulk/', { data: { ids } }),
 };
 
 export const commentsApi = {
@@ -63,4 +73,106 @@ export const activitiesApi = {
   getAll: (featureId) => api.get(`/api/features/${featureId}/activities/`),
 };
 
+const STREAM_RETRY_MS = 3000;
+const STREAM_MAX_RETRY_MS = 60000;
+
+// Only network errors and server errors are worth retrying: 4xx means the
+// request itself is refused and 501 means the server cannot stream at all
+// (it is not running under ASGI).
+const isRetryable = (status) => status === undefined || (status >= 500 && status !== 501);
+
+// Calls onEvent with a MessageEvent per Server-Sent Event in the body.
+const readEvents = async (body, onEvent) => {
+  const reader = body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += value.replace(/\r\n?/g, '\n');
+    let end;
+    while ((end = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      let type = 'message';
+      let id = '';
+      const data = [];
+      for (const line of block.split('\n')) {
+        const colon = line.indexOf(':');
+        if (colon === 0) continue;
+        const field = colon === -1 ? line : line.slice(0, colon);
+        const content = colon === -1 ? '' : line.slice(colon + 1).replace(/^ /, '');
+        if (field === 'event') type = content;
+        else if (field === 'id') id = content;
+        else if (field === 'data') data.push(content);
+      }
+      if (data.length) {
+        onEvent(new MessageEvent(type, { data: data.join('\n'), lastEventId: id }));
+      }
+    }
+  }
+};
+
+export const eventsApi = {
+  // Every connection opens with a fresh single-use ticket, since the stream
+  // is a plain GET. The server ends the stream when the access token behind
+  // the ticket expires; reconnects resume after the last event seen. Read
+  // with fetch rather than EventSource, which hides the response status.
+  stream: (featureId, onActivity) => {
+    const controller = new AbortController();
+    let retry = null;
+    let failures = 0;
+    let lastEventId = null;
+
+    const reconnect = (delay) => {
+      if (!controller.signal.aborted) {
+        retry = setTimeout(connect, delay);
+      }
+    };
+
+    const backoff = () => {
+      reconnect(Math.min(STREAM_RETRY_MS * 2 ** failures, STREAM_MAX_RETRY_MS));
+      failures += 1;
+    };
+
+    const connect = async () => {
+      let status;
+      try {
+        const ticket = await api.post('/api/stream/ticket/');
+        const params = new URLSearchParams({ feature: featureId, ticket: ticket.data.ticket });
+        if (lastEventId) {
+          params.set('last_event_id', lastEventId);
+        }
+        const response = await fetch(`/api/stream/?${params}`, {
+          headers: { Accept: 'text/event-stream' },
+          signal: controller.signal,
+        });
+        status = response.status;
+        if (!response.ok) {
+          if (isRetryable(status)) backoff();
+          return;
+        }
+        failures = 0;
+        await readEvents(response.body, (event) => {
+          lastEventId = event.lastEventId || lastEventId;
+          if (event.type === 'activity') {
+            onActivity(event);
+          }
+        });
+        // The server closed the stream (its credentials expired): reopen it
+        reconnect(STREAM_RETRY_MS);
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        status = status ?? error.response?.status;
+        if (status === 200 || isRetryable(status)) backoff();
+      }
+    };
+
+    connect();
+    return () => {
+      controller.abort();
+      clearTimeout(retry);
+    };
+  },
+};
+
 export default api;